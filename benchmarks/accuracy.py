@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Pigeon70 SSTV - Accuracy versus CPU sweep
+Runs every decoder mode over simulated channels across a range of SNRs and
+reports PSNR/SSIM against the source image next to decode time.
+
+Run from the repository root:
+    python benchmarks/accuracy.py -o accuracy.json
+    python benchmarks/accuracy.py --presets awgn hf-fading --snr 20 10 5 0
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import IMAGES
+from sstv_channel import PRESETS
+
+# BT.601 luma weights, for SSIM on the brightness the eye is most sensitive to
+LUMA = np.array([0.299, 0.587, 0.114])
+
+# Engines, one per decoder mode, and encoded source frames owned by each worker
+_worker_engines = None
+_worker_frames = {}
+
+
+def psnr(decoded, reference):
+    """Peak signal-to-noise ratio in dB over all pixels and channels"""
+    error = np.mean(np.square(decoded.astype(np.float64) - reference.astype(np.float64)))
+    return float('inf') if error == 0 else 10 * np.log10(255.0 ** 2 / error)
+
+
+def ssim(decoded, reference, sigma=1.5):
+    """Mean structural similarity of the luma planes (Wang et al. 2004, Gaussian window)"""
+    x = decoded.astype(np.float64) @ LUMA
+    y = reference.astype(np.float64) @ LUMA
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(plane):
+        return ndimage.gaussian_filter(plane, sigma, truncate=3.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    var_x = blur(x * x) - mu_x ** 2
+    var_y = blur(y * y) - mu_y ** 2
+    cov = blur(x * y) - mu_x * mu_y
+    index = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(np.mean(index))
+
+
+def _init_worker(modes):
+    """Pool initializer: build one engine per decoder mode, plus a float64 encoder"""
+    global _worker_engines
+    from sstv_engine import Pigeon70Engine
+    _worker_engines = {mode: Pigeon70Engine(demod=mode[0], dtype=mode[1]) for mode in modes}
+    _worker_engines[None] = Pigeon70Engine(dtype='float64')
+
+
+def _source_frame(image_name):
+    """Encoder output for a corpus image, synthesized once per worker"""
+    if image_name not in _worker_frames:
+        encoder = _worker_engines[None]
+        _worker_frames[image_name] = encoder.synthesize_frame(IMAGES[image_name]())
+    return _worker_frames[image_name]
+
+
+def run_point(image_name, preset, snr_db, seed):
+    """Simulate one channel realisation and decode it with every mode; returns one record per mode"""
+    reference = IMAGES[image_name]()
+    encoder = _worker_engines[None]
+    audio = PRESETS[preset].with_snr(snr_db).apply(_source_frame(image_name), encoder.SAMPLE_RATE, seed)
+
+    records = []
+    for mode, sstv in _worker_engines.items():
+        if mode is None:
+            continue
+        received = audio.astype(sstv.work_dtype)
+        wall, cpu = time.perf_counter(), time.process_time()
+        img, info = sstv.decode_samples(received)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        decoded = np.asarray(img)
+        records.append({
+            'image': image_name, 'preset': preset, 'snr_db': snr_db, 'seed': seed,
+            'demod': mode[0], 'dtype': mode[1],
+            'psnr_db': round(psnr(decoded, reference), 2),
+            'ssim': round(ssim(decoded, reference), 4),
+            'decode_s': round(wall, 4),
+            'decode_cpu_s': round(cpu, 4),
+            'sync_hit_rate': info['sync_hit_rate'],
+            'vis_found': info['vis_found'],
+        })
+    return records
+
+
+def report(records, modes):
+    """Print a PSNR/SSIM table per preset and the median decode cost of each mode"""
+    for preset in dict.fromkeys(r['preset'] for r in records):
+        print(f"\n{preset}: {PRESETS[preset]!r}")
+        print(f"{'SNR dB':>7s}" + ''.join(f"{d + '/' + t:>20s}" for d, t in modes))
+        for snr_db in sorted({r['snr_db'] for r in records}, reverse=True):
+            row = f"{snr_db:7g}"
+            for demod, dtype in modes:
+                points = [r for r in records if r['preset'] == preset and r['snr_db'] == snr_db
+                          and r['demod'] == demod and r['dtype'] == dtype]
+                row += (f"{np.mean([r['psnr_db'] for r in points]):11.1f} dB "
+                        f"{np.mean([r['ssim'] for r in points]):5.3f}")
+            print(row)
+
+    print(f"\n{'mode':20s} {'decode ms':>10s} {'cpu ms':>10s}")
+    for demod, dtype in modes:
+        points = [r for r in records if r['demod'] == demod and r['dtype'] == dtype]
+        print(f"{demod + '/' + dtype:20s} {np.median([r['decode_s'] for r in points]) * 1e3:10.0f} "
+              f"{np.median([r['decode_cpu_s'] for r in points]) * 1e3:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pigeon70 SSTV decoder accuracy versus CPU sweep')
+    parser.add_argument('--images', nargs='+', choices=sorted(IMAGES), default=['photo'],
+                        help='Corpus images to send (default: photo)')
+    parser.add_argument('--presets', nargs='+', choices=list(PRESETS), default=list(PRESETS),
+                        help='Channel presets to simulate (default: all)')
+    parser.add_argument('--snr', nargs='+', type=float, default=[30, 20, 15, 10, 5, 0],
+                        help='Signal-to-noise ratios in dB (default: 30 20 15 10 5 0)')
+    parser.add_argument('--demod', nargs='+', choices=['bank', 'fm'], default=['bank', 'fm'],
+                        help='Demodulators to compare (default: both)')
+    parser.add_argument('--dtype', nargs='+', choices=['float32', 'float64', 'int16'], default=['float32'],
+                        help='Engine sample formats to compare (default: float32)')
+    parser.add_argument('--seeds', type=int, default=1,
+                        help='Noise and fading realisations per point, averaged (default: 1)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Worker processes (default: all CPU cores)')
+    parser.add_argument('-o', '--output', help='Write every record to this JSON file')
+    args = parser.parse_args()
+
+    modes = [(demod, dtype) for demod in args.demod for dtype in args.dtype]
+    points = [(image_name, preset, snr_db, seed) for image_name in args.images for preset in args.presets
+              for snr_db in args.snr for seed in range(args.seeds)]
+    jobs = args.jobs or os.cpu_count() or 1
+
+    # Each decode is timed inside its worker; workers share the machine, so use -j 1 for the cleanest timings
+    started = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(modes,)) as pool:
+        for point_records in pool.map(run_point, *zip(*points)):
+            records.extend(point_records)
+    print(f"{len(points)} channel realisations x {len(modes)} modes in {time.perf_counter() - started:.0f} s "
+          f"on {jobs} workers")
+    report(records, modes)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'modes': modes, 'records': records}, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Pigeon70 SSTV - Encode/decode benchmarks
+Measures throughput, per-stage latency, memory and accuracy over a synthetic
+corpus, writes JSON and optionally checks the results against a baseline.
+
+Run from the repository root:
+    python benchmarks/bench_sstv.py -o results.json
+    python benchmarks/bench_sstv.py --baseline baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import CHANNELS, IMAGES
+
+# Metrics checked against a baseline: name -> kind of threshold. Timings are
+# compared on their best run, which is the least sensitive to machine load
+COMPARED_METRICS = {
+    'encode_min_s': 'time',
+    'decode_min_s': 'time',
+    'vis_min_s': 'time',
+    'sync_min_s': 'time',
+    'demod_min_s': 'time',
+    'encode_alloc_mb': 'memory',
+    'decode_alloc_mb': 'memory',
+    'peak_rss_mb': 'memory',
+    'mean_abs_error': 'error',
+}
+
+
+def timed(function, *args):
+    """Call function(*args); returns (result, elapsed seconds)"""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def traced_peak(function, *args):
+    """Peak bytes allocated while function(*args) runs, as seen by tracemalloc"""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def decode_stages(sstv, audio):
+    """The decode pipeline one stage at a time, as decode_samples runs it; returns (pixels, seconds per stage)"""
+    (vis_index, _), vis_s = timed(sstv.detect_vis, audio)
+    started = time.perf_counter()
+    sync_indices, _ = sstv.build_sync_index(audio)
+    start_index = vis_index + int(sstv.DURATION_VIS * sstv.SAMPLE_RATE) if vis_index != -1 else 0
+    if vis_index == -1 and len(sync_indices):
+        start_index = int(sync_indices[0])
+    first_sync, period, _ = sstv.fit_timing(sync_indices, start_index)
+    sync_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sync_positions = first_sync + np.arange(sstv.HEIGHT) * period
+    frequencies = sstv.demodulate_lines(audio, sync_positions, period / sstv.line_period())
+    pixels = sstv.frequency_to_pixel(frequencies).reshape(sstv.HEIGHT, sstv.WIDTH, 3)
+    demod_s = time.perf_counter() - started
+    return pixels, {'vis_s': vis_s, 'sync_s': sync_s, 'demod_s': demod_s}
+
+
+def received(sstv, channel, encoded):
+    """Encoded samples as the decoder would read them from a file, after the channel"""
+    if np.issubdtype(encoded.dtype, np.integer):
+        encoded = encoded.astype(sstv.work_dtype) / np.iinfo(encoded.dtype).max
+    return CHANNELS[channel](encoded.astype(sstv.work_dtype, copy=False))
+
+
+def run_case(image_name, channel, demod, dtype, repeat, kernels='auto'):
+    """Benchmark one corpus case in the current process; returns its metrics"""
+    from sstv_engine import Pigeon70Engine
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    sstv = Pigeon70Engine(demod=demod, dtype=dtype, kernels=kernels)
+    img = IMAGES[image_name]()
+
+    # Warm-up run: builds cached tables so every timed run is steady-state
+    audio = received(sstv, channel, sstv.synthesize_frame(img))
+    sstv.decode_samples(audio)
+
+    timings = {'encode_s': [], 'decode_s': [], 'vis_s': [], 'sync_s': [], 'demod_s': []}
+    for _ in range(repeat):
+        encoded, encode_s = timed(sstv.synthesize_frame, img)
+        audio = received(sstv, channel, encoded)
+        del encoded
+        _, decode_s = timed(sstv.decode_samples, audio)
+        pixels, stages = decode_stages(sstv, audio)
+        timings['encode_s'].append(encode_s)
+        timings['decode_s'].append(decode_s)
+        for stage, seconds in stages.items():
+            timings[stage].append(seconds)
+
+    metrics = {}
+    for name, values in timings.items():
+        metrics[name] = round(statistics.median(values), 5)
+        metrics[name.replace('_s', '_min_s')] = round(min(values), 5)
+
+    duration = len(audio) / sstv.SAMPLE_RATE
+    metrics['audio_s'] = round(duration, 3)
+    metrics['encode_rtf'] = round(duration / metrics['encode_s'], 1)
+    metrics['decode_rtf'] = round(duration / metrics['decode_s'], 1)
+    metrics['encode_alloc_mb'] = round(traced_peak(sstv.synthesize_frame, img) / 2 ** 20, 2)
+    metrics['decode_alloc_mb'] = round(traced_peak(sstv.decode_samples, audio) / 2 ** 20, 2)
+    metrics['mean_abs_error'] = round(float(np.mean(np.abs(pixels.astype(int) - img.astype(int)))), 3)
+    metrics['baseline_rss_mb'] = round(baseline_rss, 1)
+    metrics['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return metrics
+
+
+def run_isolated(*case):
+    """Run a case in a fresh interpreter so its peak RSS is its own"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_case, *case).result()
+
+
+def environment():
+    """Machine and library versions the results were measured on"""
+    import scipy
+    import sstv_kernels
+    numba_version = None
+    if sstv_kernels.available():
+        import numba
+        numba_version = numba.__version__
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'numba': numba_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, thresholds):
+    """Compare each case against the baseline; returns a list of regression messages"""
+    regressions = []
+    for name, metrics in results['cases'].items():
+        old = baseline['cases'].get(name)
+        if old is None:
+            print(f"  {name}: not in baseline")
+            continue
+        for metric, kind in COMPARED_METRICS.items():
+            if metric not in metrics or metric not in old:
+                continue
+            new_value, old_value = metrics[metric], old[metric]
+            if kind == 'error':
+                # Accuracy is compared in absolute pixel levels
+                change = new_value - old_value
+                worse = change > thresholds['error']
+                text = f"{old_value:.3f} -> {new_value:.3f} ({change:+.3f} levels)"
+            else:
+                change = new_value / old_value - 1 if old_value else 0.0
+                worse = change > thresholds[kind]
+                text = f"{old_value:.4g} -> {new_value:.4g} ({change:+.1%})"
+            if worse:
+                regressions.append(f"{name} {metric}: {text}")
+                print(f"  REGRESSION {name} {metric}: {text}")
+            elif kind != 'error' and change < -thresholds[kind]:
+                print(f"  improved   {name} {metric}: {text}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pigeon70 SSTV encode/decode benchmarks')
+    parser.add_argument('--images', nargs='+', choices=sorted(IMAGES), default=sorted(IMAGES),
+                        help='Corpus images to run (default: all)')
+    parser.add_argument('--channels', nargs='+', choices=sorted(CHANNELS), default=sorted(CHANNELS),
+                        help='Channel conditions to run (default: all)')
+    parser.add_argument('--demod', nargs='+', choices=['bank', 'fm'], default=['bank', 'fm'],
+                        help='Demodulators to run (default: both)')
+    parser.add_argument('--dtype', nargs='+', choices=['float32', 'float64', 'int16'], default=['float32'],
+                        help='Engine sample formats to run (default: float32)')
+    parser.add_argument('--kernels', choices=['auto', 'numpy', 'numba'], default='auto',
+                        help='Decoder kernels: numba-compiled or numpy (default: auto, numba when installed)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case; medians are reported (default: 3)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Smoke run: photo image, clean channel, bank demodulator, one repeat')
+    parser.add_argument('-o', '--output', help='Write results JSON to this file')
+    parser.add_argument('--baseline', help='Compare against a results JSON from an earlier run')
+    parser.add_argument('--time-threshold', type=float, default=0.15,
+                        help='Allowed relative slowdown before a timing counts as a regression (default: 0.15)')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='Allowed relative growth of memory metrics (default: 0.10)')
+    parser.add_argument('--error-threshold', type=float, default=0.5,
+                        help='Allowed increase of mean pixel error, in levels (default: 0.5)')
+    args = parser.parse_args()
+    if args.quick:
+        args.images, args.channels, args.demod, args.repeat = ['photo'], ['clean'], ['bank'], 1
+
+    results = {'environment': environment(), 'repeat': args.repeat, 'kernels': args.kernels, 'cases': {}}
+    for image_name in args.images:
+        for channel in args.channels:
+            for demod in args.demod:
+                for dtype in args.dtype:
+                    name = f"{image_name}/{channel}/{demod}/{dtype}"
+                    metrics = run_isolated(image_name, channel, demod, dtype, args.repeat, args.kernels)
+                    results['cases'][name] = metrics
+                    print(f"{name:34s} encode {metrics['encode_s'] * 1e3:7.1f} ms "
+                          f"decode {metrics['decode_s'] * 1e3:7.1f} ms ({metrics['decode_rtf']:.0f}x real time) "
+                          f"vis/sync/demod {metrics['vis_s'] * 1e3:.0f}/{metrics['sync_s'] * 1e3:.0f}/"
+                          f"{metrics['demod_s'] * 1e3:.0f} ms  rss {metrics['peak_rss_mb']:.0f} MB  "
+                          f"error {metrics['mean_abs_error']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.baseline}:")
+        thresholds = {'time': args.time_threshold, 'memory': args.memory_threshold,
+                      'error': args.error_threshold}
+        regressions = compare(results, baseline, thresholds)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond threshold")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
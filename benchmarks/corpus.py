@@ -0,0 +1,71 @@
+"""
+Pigeon70 SSTV - Benchmark corpus
+Deterministic synthetic test images and channel conditions
+"""
+
+import numpy as np
+
+from sstv_channel import awgn
+
+WIDTH = 320
+HEIGHT = 240
+
+
+def gradient():
+    """Horizontal red, vertical green and diagonal blue ramps"""
+    x = np.linspace(0, 255, WIDTH)[None, :]
+    y = np.linspace(0, 255, HEIGHT)[:, None]
+    img = np.empty((HEIGHT, WIDTH, 3))
+    img[..., 0] = x
+    img[..., 1] = y
+    img[..., 2] = (x + y) / 2
+    return img.astype(np.uint8)
+
+
+def bars():
+    """Eight full-saturation colour bars"""
+    colours = np.array([[255, 255, 255], [255, 255, 0], [0, 255, 255], [0, 255, 0],
+                        [255, 0, 255], [255, 0, 0], [0, 0, 255], [0, 0, 0]], dtype=np.uint8)
+    return np.repeat(np.repeat(colours[None], HEIGHT, axis=0), WIDTH // 8, axis=1)
+
+
+def photo(seed=1):
+    """Photo-like scene: smooth overlapping blobs with fine texture and a few sharp edges"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    img = np.zeros((HEIGHT, WIDTH, 3))
+    for _ in range(12):
+        cx, cy = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        radius = rng.uniform(20, 120)
+        blob = np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * radius ** 2))
+        img += blob[..., None] * rng.uniform(0, 200, 3)
+    img[HEIGHT // 2:, WIDTH // 3:2 * WIDTH // 3] *= 0.4
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def noise(seed=2):
+    """Independent uniform noise on every pixel and channel (worst case for the demodulator)"""
+    return np.random.default_rng(seed).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def checker():
+    """One-pixel black and white checkerboard"""
+    board = ((np.indices((HEIGHT, WIDTH)).sum(axis=0) % 2) * 255).astype(np.uint8)
+    return np.repeat(board[..., None], 3, axis=2)
+
+
+IMAGES = {
+    'gradient': gradient,
+    'bars': bars,
+    'photo': photo,
+    'noise': noise,
+    'checker': checker,
+}
+
+
+# Channel conditions: name -> function(audio) applied before decoding
+CHANNELS = {
+    'clean': lambda audio: audio,
+    'snr20': lambda audio: awgn(audio, 20, rng=0),
+}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Pigeon70 SSTV - Import time budget
+Runs `real_sstv.py decode` under `python -X importtime` and checks the total
+import time, and the modules it must never load, against import_budget.json.
+A single decode uses the numpy kernels unless asked otherwise, so numba is on
+the forbidden list.
+
+Run from the repository root:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --update
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / 'import_budget.json'
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import IMAGES
+
+# Modules a plain decode has no use for; loading any of them is a regression
+# whatever the total time
+FORBIDDEN = ('matplotlib', 'sounddevice', 'tkinter', 'scipy.signal', 'sstv_batch', 'numba')
+
+# The measured decode
+COMMAND = ('real_sstv.py', 'decode')
+
+# Budget written by --update, relative to the measured time
+HEADROOM = 1.5
+
+# One line of -X importtime output: self and cumulative microseconds, then the
+# module name indented two spaces per nesting level
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def parse_importtime(text):
+    """Return ({module: cumulative µs}, total µs) from -X importtime output"""
+    modules = {}
+    total = 0
+    for line in text.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules[name] = cumulative
+        if indent == 0:
+            # Top-level imports cover everything nested under them
+            total += cumulative
+    return modules, total
+
+
+def measure(recording, runs):
+    """Best total import time of `runs` decodes, with the modules loaded by the best one"""
+    best = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            command = [sys.executable, '-X', 'importtime', str(ROOT / COMMAND[0]), *COMMAND[1:],
+                       str(recording), '-o', os.path.join(tmp, 'decoded.png'), '--no-cache']
+            result = subprocess.run(command, capture_output=True, text=True, cwd=tmp)
+            if result.returncode != 0:
+                sys.exit(f"Decode failed:\n{result.stderr[-2000:]}")
+            modules, total = parse_importtime(result.stderr)
+            if best is None or total < best[1]:
+                best = modules, total
+    return best
+
+
+def environment():
+    """Interpreter and library versions the budget was measured with"""
+    import numpy
+    import scipy
+    return {
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pigeon70 SSTV decode import time budget')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Decodes to run; the fastest import total counts (default: 5)')
+    parser.add_argument('--update', action='store_true',
+                        help=f'Record the measured time, and a budget {HEADROOM}x above it, in {BUDGET_FILE.name}')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Slowest top-level imports to list (default: 10)')
+    args = parser.parse_args()
+
+    from sstv_engine import Pigeon70Engine
+    import soundfile as sf
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A real frame, so every import made on the way to a decoded image is counted
+        recording = Path(tmp) / 'frame.wav'
+        sstv = Pigeon70Engine(dtype='int16')
+        sf.write(recording, sstv.encode_frame(IMAGES['photo']()), sstv.SAMPLE_RATE, subtype='PCM_16')
+        modules, total = measure(recording, args.runs)
+
+    total_ms = total / 1000
+    print(f"{' '.join(COMMAND)}: {total_ms:.0f} ms of imports (best of {args.runs})")
+    top = sorted(((us, name) for name, us in modules.items() if '.' not in name), reverse=True)
+    for us, name in top[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    loaded = [name for name in FORBIDDEN if name in modules]
+
+    if args.update:
+        budget = {'command': ' '.join(COMMAND), 'measured_ms': round(total_ms),
+                  'budget_ms': round(total_ms * HEADROOM), 'forbidden': list(FORBIDDEN),
+                  'environment': environment()}
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"Budget saved to: {BUDGET_FILE}")
+        if loaded:
+            print(f"Warning: forbidden modules loaded: {', '.join(loaded)}")
+        return
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+    failures = []
+    if total_ms > budget['budget_ms']:
+        failures.append(f"{total_ms:.0f} ms exceeds the {budget['budget_ms']} ms budget "
+                        f"(recorded at {budget['measured_ms']} ms)")
+    loaded = [name for name in budget['forbidden'] if name in modules]
+    if loaded:
+        failures.append(f"forbidden modules loaded: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"  REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"Within budget ({budget['budget_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,237 +7,71 @@ Full-featured GUI for Arch Linux with encoder/decoder testing
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
 from PIL import Image, ImageTk
-import threading
-import time
+import queue
 import os
 import sys
-from pathlib import Path
 
-class Pigeon70SSTV:
-    def __init__(self):
-        # Pigeon70 specifications
-        self.WIDTH = 320
-        self.HEIGHT = 240
-        self.SAMPLE_RATE = 44100
-        
-        # Frequency mapping
-        self.FREQ_VIS = 1900
-        self.FREQ_SYNC = 1200
-        self.FREQ_SEPARATOR = 1500
-        self.FREQ_MIN = 1500
-        self.FREQ_MAX = 2300
-        
-        # Timing specifications
-        self.DURATION_VIS = 0.3
-        self.DURATION_SYNC = 0.01
-        self.DURATION_SEPARATOR = 0.01
-        self.DURATION_PIXEL = (0.295 - 0.02) / 960
-        
-        # Audio state
-        self.is_transmitting = False
-        self.is_receiving = False
-        self.current_audio = None
+from sstv_engine import Pigeon70Engine
+from sstv_jobs import FINISHED_STATES, PRIORITY_INTERACTIVE, PRIORITY_LIVE, JobCancelled, JobManager
+from sstv_stats import Stats
+from sstv_stream import array_blocks, encode_blocks, receive_stream, transmit_stream
+
+# Background worker threads; a third request waits in the queue
+JOB_WORKERS = 2
+
+# Finished jobs kept in the jobs list
+JOB_HISTORY = 6
+
+# Highest rate at which queued worker events are applied to the widgets
+PREVIEW_FPS = 30
+
+class Pigeon70SSTV(Pigeon70Engine):
+    """Pigeon70 engine with the GUI's progress reporting
+
+    Errors are reported through progress_callback and turn into a None
+    result; cancellation (sstv_jobs.JobCancelled) is passed on to the job.
+    """
+
+    def encode_image(self, image_input, progress_callback=None, cancel=None):
+        """Encode image to SSTV audio signal
         
-    def pixel_to_frequency(self, pixel_value):
-        return self.FREQ_MIN + (pixel_value / 255) * (self.FREQ_MAX - self.FREQ_MIN)
-    
-    def frequency_to_pixel(self, frequency):
-        if frequency < self.FREQ_MIN:
-            return 0
-        if frequency > self.FREQ_MAX:
-            return 255
-        return int(((frequency - self.FREQ_MIN) / (self.FREQ_MAX - self.FREQ_MIN)) * 255)
-    
-    def generate_tone(self, frequency, duration):
-        samples = int(duration * self.SAMPLE_RATE)
-        t = np.linspace(0, duration, samples, False)
-        return np.sin(2 * np.pi * frequency * t)
-    
-    def encode_image(self, image_input, progress_callback=None):
-        """Encode image to SSTV audio signal"""
+        A cancel token (sstv_jobs.CancelToken) is checked between stages.
+        """
         try:
             # Handle both file path and PIL Image object
-            if isinstance(image_input, str):
-                # Load from file path
-                img = Image.open(image_input).convert('RGB')
-            else:
-                # Use PIL Image object directly
-                img = image_input.convert('RGB')
+            img_array = self.prepare_image(image_input)
+            if cancel:
+                cancel.check()
             
-            # Resize image
-            img = img.resize((self.WIDTH, self.HEIGHT))
-            img_array = np.array(img)
-            
-            # Calculate timing
-            line_time = self.DURATION_SYNC + self.DURATION_SEPARATOR + (960 * self.DURATION_PIXEL)
-            total_duration = self.DURATION_VIS + (self.HEIGHT * line_time)
-            total_samples = int(total_duration * self.SAMPLE_RATE)
-            
-            # Create audio buffer
-            audio_buffer = np.zeros(total_samples)
-            sample_index = 0
-            
-            # Generate VIS code
             if progress_callback:
-                progress_callback(0, "Generating VIS code...")
-            vis_tone = self.generate_tone(self.FREQ_VIS, self.DURATION_VIS)
-            audio_buffer[sample_index:sample_index + len(vis_tone)] = vis_tone
-            sample_index += len(vis_tone)
-            
-            # Process each line
-            for y in range(self.HEIGHT):
-                if progress_callback:
-                    progress = (y / self.HEIGHT) * 100
-                    progress_callback(progress, f"Processing line {y + 1}/{self.HEIGHT}")
-                
-                # Sync pulse
-                sync_tone = self.generate_tone(self.FREQ_SYNC, self.DURATION_SYNC)
-                audio_buffer[sample_index:sample_index + len(sync_tone)] = sync_tone
-                sample_index += len(sync_tone)
-                
-                # Separator pulse
-                separator_tone = self.generate_tone(self.FREQ_SEPARATOR, self.DURATION_SEPARATOR)
-                audio_buffer[sample_index:sample_index + len(separator_tone)] = separator_tone
-                sample_index += len(separator_tone)
-                
-                # Process each pixel in the line
-                for x in range(self.WIDTH):
-                    r, g, b = img_array[y, x]
-                    
-                    # Generate tones for R, G, B values
-                    r_tone = self.generate_tone(self.pixel_to_frequency(r), self.DURATION_PIXEL)
-                    g_tone = self.generate_tone(self.pixel_to_frequency(g), self.DURATION_PIXEL)
-                    b_tone = self.generate_tone(self.pixel_to_frequency(b), self.DURATION_PIXEL)
-                    
-                    # Add tones to buffer
-                    audio_buffer[sample_index:sample_index + len(r_tone)] = r_tone
-                    sample_index += len(r_tone)
-                    audio_buffer[sample_index:sample_index + len(g_tone)] = g_tone
-                    sample_index += len(g_tone)
-                    audio_buffer[sample_index:sample_index + len(b_tone)] = b_tone
-                    sample_index += len(b_tone)
-            
-            # Normalize audio
-            audio_buffer = audio_buffer / np.max(np.abs(audio_buffer)) * 0.8
+                progress_callback(0, "Synthesizing audio...")
+            audio_buffer = self.encode_frame(img_array)
             
             if progress_callback:
                 progress_callback(100, "Encoding complete!")
             
             return audio_buffer
             
+        except JobCancelled:
+            raise
         except Exception as e:
             if progress_callback:
                 progress_callback(0, f"Encoding error: {str(e)}")
             return None
     
-    def detect_frequency(self, audio_segment):
-        """Detect dominant frequency using FFT"""
-        try:
-            # Use FFT for frequency detection
-            fft = np.fft.fft(audio_segment)
-            freqs = np.fft.fftfreq(len(audio_segment), 1/self.SAMPLE_RATE)
-            
-            # Find peak in relevant frequency range
-            mask = (freqs >= 1000) & (freqs <= 2500)
-            if not np.any(mask):
-                return 1500  # Default frequency
-            
-            peak_idx = np.argmax(np.abs(fft[mask]))
-            return freqs[mask][peak_idx]
-        except:
-            return 1500  # Default on error
-    
-    def find_vis_code(self, audio_buffer):
-        """Find VIS code in audio buffer"""
-        vis_samples = int(self.DURATION_VIS * self.SAMPLE_RATE)
-        search_limit = min(len(audio_buffer) - vis_samples, int(2 * self.SAMPLE_RATE))
-        
-        for i in range(0, search_limit, int(0.01 * self.SAMPLE_RATE)):
-            segment = audio_buffer[i:i + vis_samples]
-            frequency = self.detect_frequency(segment)
-            
-            if abs(frequency - self.FREQ_VIS) < 100:
-                return i
-        
-        return -1
-    
-    def find_sync_pulse(self, audio_buffer, start_index):
-        """Find sync pulse in audio buffer"""
-        sync_samples = int(self.DURATION_SYNC * self.SAMPLE_RATE)
-        search_range = int(0.3 * self.SAMPLE_RATE)
-        
-        for i in range(start_index, min(start_index + search_range, len(audio_buffer) - sync_samples), int(0.001 * self.SAMPLE_RATE)):
-            segment = audio_buffer[i:i + sync_samples]
-            frequency = self.detect_frequency(segment)
-            
-            if abs(frequency - self.FREQ_SYNC) < 150:
-                return i
+    def decode_audio(self, audio_buffer, progress_callback=None, rows_callback=None, cancel=None):
+        """Decode SSTV audio signal to image
         
-        return -1
-    
-    def decode_audio(self, audio_buffer, progress_callback=None):
-        """Decode SSTV audio signal to image"""
+        rows_callback(start, rows) receives each block of decoded lines for the
+        live preview; see Pigeon70Engine.decode_samples.
+        """
         try:
-            # Find VIS code
-            if progress_callback:
-                progress_callback(0, "Searching for VIS code...")
-            
-            vis_index = self.find_vis_code(audio_buffer)
-            if vis_index == -1:
-                if progress_callback:
-                    progress_callback(0, "No VIS code found, starting from beginning")
-                start_index = 0
-            else:
-                start_index = vis_index + int(self.DURATION_VIS * self.SAMPLE_RATE)
-                if progress_callback:
-                    progress_callback(5, f"VIS code found at {vis_index/self.SAMPLE_RATE:.2f}s")
-            
-            # Create image
-            image_data = np.zeros((self.HEIGHT, self.WIDTH, 3), dtype=np.uint8)
-            current_index = start_index
-            
-            # Decode each line
-            for y in range(self.HEIGHT):
-                if progress_callback:
-                    progress = 5 + (y / self.HEIGHT) * 90
-                    progress_callback(progress, f"Decoding line {y + 1}/{self.HEIGHT}")
-                
-                # Find sync pulse
-                sync_index = self.find_sync_pulse(audio_buffer, current_index)
-                if sync_index == -1:
-                    sync_index = current_index
-                else:
-                    current_index = sync_index
-                
-                # Skip separator
-                current_index += int(self.DURATION_SEPARATOR * self.SAMPLE_RATE)
-                
-                # Decode pixels
-                for x in range(self.WIDTH):
-                    for color_idx in range(3):
-                        pixel_samples = int(self.DURATION_PIXEL * self.SAMPLE_RATE)
-                        
-                        if current_index + pixel_samples >= len(audio_buffer):
-                            break
-                        
-                        segment = audio_buffer[current_index:current_index + pixel_samples]
-                        frequency = self.detect_frequency(segment)
-                        pixel_value = self.frequency_to_pixel(frequency)
-                        
-                        image_data[y, x, color_idx] = pixel_value
-                        current_index += pixel_samples
-                    
-                    if current_index + pixel_samples >= len(audio_buffer):
-                        break
-            
-            if progress_callback:
-                progress_callback(100, "Decoding complete!")
-            
-            return Image.fromarray(image_data)
+            image, _ = self.decode_samples(audio_buffer, progress_callback, rows_callback, cancel)
+            return image
             
+        except JobCancelled:
+            raise
         except Exception as e:
             if progress_callback:
                 progress_callback(0, f"Decoding error: {str(e)}")
@@ -247,10 +81,25 @@ class SSTVDesktopApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Pigeon70 SSTV Desktop")
-        self.root.geometry("1000x700")
+        self.root.geometry("1000x820")
         
-        # Initialize SSTV engine
+        # Initialize SSTV engine, reporting the time of each processing stage
         self.sstv = Pigeon70SSTV()
+        self.stats = Stats()
+        self.stats.subscribe(self.on_stats_event)
+        self.sstv.stats = self.stats
+        self.stage_times = {}
+        
+        # Worker threads never touch widgets: they post events here, and the
+        # Tk thread applies them at most PREVIEW_FPS times a second
+        self.events = queue.SimpleQueue()
+        
+        # Background work runs as jobs on a bounded pool; their status events
+        # reach the Tk thread through the same queue
+        self.jobs = JobManager(JOB_WORKERS)
+        self.jobs.subscribe(self.events.put)
+        self.job_handlers = {}
+        self.finished_jobs = []
         
         # Variables
         self.current_image = None
@@ -262,6 +111,9 @@ class SSTVDesktopApp:
         
         # Check audio devices
         self.check_audio_devices()
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.pump_events()
     
     def create_widgets(self):
         # Main frame
@@ -328,6 +180,11 @@ class SSTVDesktopApp:
                                      wraplength=200)
         self.status_label.grid(row=12, column=0, sticky=(tk.W, tk.E), pady=5)
         
+        # Stage timings from the engine's instrumentation
+        self.stats_var = tk.StringVar(value="")
+        ttk.Label(left_frame, textvariable=self.stats_var, wraplength=200,
+                  font=('TkDefaultFont', 8)).grid(row=13, column=0, sticky=(tk.W, tk.E))
+        
         # Right panel - Images
         right_frame = ttk.LabelFrame(main_frame, text="Images", padding="10")
         right_frame.grid(row=1, column=1, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -349,27 +206,88 @@ class SSTVDesktopApp:
         self.decoded_image_label = ttk.Label(decoded_frame, text="No decoded image")
         self.decoded_image_label.grid(row=0, column=0)
         
+        # Persistent full-size preview that decoded rows are pasted into as they arrive
+        self.preview = Image.new('RGB', (self.sstv.WIDTH, self.sstv.HEIGHT))
+        self.preview_photo = ImageTk.PhotoImage(self.preview)
+        self.preview_dirty = False
+        
         # Audio info
         audio_frame = ttk.LabelFrame(main_frame, text="Audio Information", padding="10")
         audio_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
         
         self.audio_info_var = tk.StringVar(value="No audio loaded")
         ttk.Label(audio_frame, textvariable=self.audio_info_var).grid(row=0, column=0, sticky=tk.W)
+        
+        # Background jobs, one row each
+        jobs_frame = ttk.LabelFrame(main_frame, text="Jobs", padding="10")
+        jobs_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        jobs_frame.columnconfigure(0, weight=1)
+        
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=('status', 'progress', 'message'), height=4)
+        self.jobs_tree.heading('#0', text="Job")
+        self.jobs_tree.heading('status', text="Status")
+        self.jobs_tree.heading('progress', text="Progress")
+        self.jobs_tree.heading('message', text="Message")
+        self.jobs_tree.column('#0', width=100, stretch=False)
+        self.jobs_tree.column('status', width=80, stretch=False)
+        self.jobs_tree.column('progress', width=70, stretch=False, anchor=tk.E)
+        self.jobs_tree.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        ttk.Button(jobs_frame, text="Cancel Job", 
+                  command=self.cancel_jobs).grid(row=0, column=1, sticky=tk.N, padx=(10, 0))
     
     def check_audio_devices(self):
         """Check available audio devices"""
         try:
+            import sounddevice as sd
             devices = sd.query_devices()
             self.status_var.set(f"Audio devices found: {len(devices)}")
         except Exception as e:
             self.status_var.set(f"Audio error: {str(e)}")
             messagebox.showerror("Audio Error", f"Could not access audio devices:\n{str(e)}")
     
-    def update_status(self, progress, message):
-        """Update progress bar and status"""
-        self.progress_var.set(progress)
-        self.status_var.set(message)
-        self.root.update_idletasks()
+    def on_stats_event(self, event):
+        """Forward engine stage events to the Tk thread"""
+        if event['type'] == 'stage':
+            self.events.put(event)
+    
+    def post_rows(self, start, rows):
+        """Send decoded (n, WIDTH, 3) pixel rows starting at line `start` to the preview"""
+        self.events.put({'type': 'rows', 'start': start, 'rows': rows})
+    
+    def pump_events(self):
+        """Apply every queued worker event, then repaint what changed; reschedules itself"""
+        stages_changed = False
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event['type']
+            if kind == 'job':
+                self.show_job(event)
+            elif kind == 'stage':
+                self.stage_times[event['stage']] = event['wall']
+                stages_changed = True
+            elif kind == 'rows':
+                strip = Image.fromarray(np.ascontiguousarray(event['rows']))
+                self.preview.paste(strip, (0, event['start']))
+                self.preview_dirty = True
+            elif kind == 'preview':
+                self.preview.paste(event['image'].convert('RGB').resize(self.preview.size))
+                self.preview_dirty = True
+            elif kind == 'preview_reset':
+                self.preview.paste((0, 0, 0), (0, 0) + self.preview.size)
+                self.preview_dirty = True
+        
+        if stages_changed:
+            self.stats_var.set("  ".join(f"{stage} {wall * 1e3:.0f} ms"
+                                         for stage, wall in self.stage_times.items()))
+        if self.preview_dirty:
+            self.preview_photo.paste(self.preview)
+            self.decoded_image_label.configure(image=self.preview_photo, text="")
+            self.preview_dirty = False
+        self.root.after(1000 // PREVIEW_FPS, self.pump_events)
     
     def load_image(self):
         """Load image file"""
@@ -395,108 +313,162 @@ class SSTVDesktopApp:
         
         if file_path:
             try:
-                audio_data, sample_rate = sf.read(file_path)
-                if sample_rate != self.sstv.SAMPLE_RATE:
-                    messagebox.showwarning("Sample Rate", 
-                                         f"Audio sample rate is {sample_rate} Hz, expected {self.sstv.SAMPLE_RATE} Hz")
+                # Recordings at other rates are resampled to the engine's rate
+                audio_data, sample_rate = self.sstv.load_audio(file_path)
                 
                 self.current_audio = audio_data
-                duration = len(audio_data) / sample_rate
-                self.audio_info_var.set(f"Loaded: {os.path.basename(file_path)} ({duration:.1f}s)")
+                duration = len(audio_data) / self.sstv.SAMPLE_RATE
+                resampled = f", resampled from {sample_rate} Hz" if sample_rate != self.sstv.SAMPLE_RATE else ""
+                self.audio_info_var.set(f"Loaded: {os.path.basename(file_path)} ({duration:.1f}s{resampled})")
                 self.status_var.set("Audio loaded successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not load audio:\n{str(e)}")
     
+    def run_job(self, name, work, on_done=None, priority=PRIORITY_INTERACTIVE, key=None, group=None):
+        """Run work(job) in the background; on_done(result) is applied on the Tk thread if it succeeds
+        
+        A request matching an unfinished job's key joins that job instead of
+        starting another; a request in a group cancels the group's older jobs.
+        """
+        job = self.jobs.submit(name, work, priority, key, group)
+        if on_done is not None:
+            self.job_handlers.setdefault(job.id, on_done)
+        return job
+    
+    def cancel_jobs(self):
+        """Cancel the selected jobs, or every unfinished job if none is selected"""
+        selection = self.jobs_tree.selection()
+        if not selection:
+            self.jobs.cancel()
+        for iid in selection:
+            self.jobs.cancel(int(iid))
+    
+    def show_job(self, event):
+        """Update a job's row in the jobs list and mirror it on the status line"""
+        iid = str(event['id'])
+        values = (event['status'], f"{event['progress']:.0f}%", event.get('error') or event['message'])
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert('', 'end', iid=iid, text=event['name'], values=values)
+        
+        self.progress_var.set(event['progress'])
+        if event['status'] == 'cancelled':
+            self.status_var.set(f"{event['name']} cancelled")
+        elif event['status'] == 'failed':
+            self.status_var.set(f"{event['name']} failed: {event['error']}")
+        elif event['message']:
+            self.status_var.set(event['message'])
+        
+        if event['status'] in FINISHED_STATES:
+            self.finished_jobs.append(iid)
+            while len(self.finished_jobs) > JOB_HISTORY:
+                self.jobs_tree.delete(self.finished_jobs.pop(0))
+            on_done = self.job_handlers.pop(event['id'], None)
+            if on_done is not None and event['status'] == 'done':
+                on_done(event['result'])
+    
+    def on_close(self):
+        """Stop every job before the window goes away"""
+        self.jobs.shutdown(cancel=True, wait=False)
+        self.root.destroy()
+    
     def encode_image(self):
         """Encode image to audio"""
         if self.current_image is None:
             messagebox.showwarning("No Image", "Please load an image first")
             return
+        image = self.current_image
         
-        def encode_thread():
-            try:
-                self.current_audio = self.sstv.encode_image(self.current_image, self.update_status)
-                if self.current_audio is not None:
-                    duration = len(self.current_audio) / self.sstv.SAMPLE_RATE
-                    self.audio_info_var.set(f"Encoded audio ({duration:.1f}s)")
-                    self.status_var.set("Encoding complete!")
-                else:
-                    self.status_var.set("Encoding failed!")
-            except Exception as e:
-                self.status_var.set(f"Encoding error: {str(e)}")
+        def encode(job):
+            audio = self.sstv.encode_image(image, job.report, job.token)
+            if audio is None:
+                raise RuntimeError(job.message)
+            return audio
         
-        threading.Thread(target=encode_thread, daemon=True).start()
+        self.run_job("Encode", encode, self.on_encoded, key=('encode', id(image)), group='encode')
+    
+    def on_encoded(self, audio):
+        self.current_audio = audio
+        duration = len(audio) / self.sstv.SAMPLE_RATE
+        self.audio_info_var.set(f"Encoded audio ({duration:.1f}s)")
     
     def decode_audio(self):
         """Decode audio to image"""
         if self.current_audio is None:
             messagebox.showwarning("No Audio", "Please load audio first")
             return
+        audio = self.current_audio
         
-        def decode_thread():
-            try:
-                self.current_decoded_image = self.sstv.decode_audio(self.current_audio, self.update_status)
-                if self.current_decoded_image is not None:
-                    self.display_image(self.current_decoded_image, self.decoded_image_label)
-                    self.status_var.set("Decoding complete!")
-                else:
-                    self.status_var.set("Decoding failed!")
-            except Exception as e:
-                self.status_var.set(f"Decoding error: {str(e)}")
+        def decode(job):
+            self.events.put({'type': 'preview_reset'})
+            image = self.sstv.decode_audio(audio, job.report, self.post_rows, job.token)
+            if image is None:
+                raise RuntimeError(job.message)
+            return image
         
-        threading.Thread(target=decode_thread, daemon=True).start()
+        # A newer decode replaces an older one rather than racing it
+        self.run_job("Decode", decode, self.on_decoded, key=('decode', id(audio)), group='decode')
+    
+    def on_decoded(self, image):
+        self.current_decoded_image = image
     
     def transmit_audio(self):
         """Transmit audio through speakers"""
-        if self.current_audio is None:
-            messagebox.showwarning("No Audio", "Please encode audio first")
+        if self.current_audio is None and self.current_image is None:
+            messagebox.showwarning("No Audio", "Please load an image or audio first")
             return
+        audio, image = self.current_audio, self.current_image
         
-        def transmit_thread():
+        def transmit(job):
+            job.report(None, "Transmitting...")
+            self.sstv.is_transmitting = True
             try:
-                self.status_var.set("Transmitting...")
-                self.sstv.is_transmitting = True
-                sd.play(self.current_audio, self.sstv.SAMPLE_RATE)
-                sd.wait()
-                self.sstv.is_transmitting = False
-                self.status_var.set("Transmission complete!")
-            except Exception as e:
+                # Stream blocks to the sound card; an image that has not been
+                # encoded yet is encoded on the fly, line by line
+                if audio is not None:
+                    blocks = array_blocks(audio)
+                else:
+                    blocks = encode_blocks(self.sstv, self.sstv.prepare_image(image))
+                transmit_stream(self.sstv, blocks, stop_event=job.token)
+            finally:
                 self.sstv.is_transmitting = False
-                self.status_var.set(f"Transmission error: {str(e)}")
+            job.token.check()
+            job.report(100, "Transmission complete!")
         
-        threading.Thread(target=transmit_thread, daemon=True).start()
+        self.run_job("Transmit", transmit, priority=PRIORITY_LIVE, key='transmit')
     
     def receive_audio(self):
         """Receive audio from microphone"""
-        def receive_thread():
+        def receive(job):
+            job.report(None, "Listening for SSTV frames (75 seconds)...")
+            self.sstv.is_receiving = True
             try:
-                self.status_var.set("Recording for 75 seconds...")
-                self.sstv.is_receiving = True
-                
-                # Record audio
-                duration = 75
-                audio_data = sd.rec(int(duration * self.sstv.SAMPLE_RATE), 
-                                  samplerate=self.sstv.SAMPLE_RATE, channels=1)
-                sd.wait()
-                
-                self.sstv.is_receiving = False
-                self.current_audio = audio_data.flatten()
-                
-                # Auto-decode
-                self.status_var.set("Decoding received audio...")
-                self.current_decoded_image = self.sstv.decode_audio(self.current_audio, self.update_status)
-                
-                if self.current_decoded_image is not None:
-                    self.display_image(self.current_decoded_image, self.decoded_image_label)
-                    self.status_var.set("Reception and decoding complete!")
-                else:
-                    self.status_var.set("Reception complete, but decoding failed")
-                    
-            except Exception as e:
+                # Decode live, line by line, until the first frame completes
+                for event in receive_stream(self.sstv, duration=75, stop_event=job.token):
+                    if event['type'] == 'vis':
+                        self.events.put({'type': 'preview_reset'})
+                        job.report(0, f"VIS code detected (confidence {event['confidence']:.2f})")
+                    elif event['type'] == 'line':
+                        self.post_rows(event['line'], event['pixels'][None])
+                        job.report((event['line'] + 1) / self.sstv.HEIGHT * 100,
+                                   f"Receiving line {event['line'] + 1}/{self.sstv.HEIGHT}")
+                    elif event['type'] == 'lost':
+                        job.report(0, "Signal lost, listening for next frame...")
+                    elif event['type'] == 'frame':
+                        self.events.put({'type': 'preview', 'image': event['image']})
+                        job.report(100, "Reception and decoding complete!")
+                        return event['image']
+            finally:
                 self.sstv.is_receiving = False
-                self.status_var.set(f"Reception error: {str(e)}")
+            job.token.check()
+            job.report(None, "Reception complete, no frame received")
         
-        threading.Thread(target=receive_thread, daemon=True).start()
+        self.run_job("Receive", receive, self.on_received, priority=PRIORITY_LIVE, key='receive')
+    
+    def on_received(self, image):
+        if image is not None:
+            self.current_decoded_image = image
     
     def generate_test_image(self):
         """Generate a test pattern"""
@@ -521,34 +493,23 @@ class SSTVDesktopApp:
         """Run full encode/decode test"""
         if self.current_image is None:
             self.generate_test_image()
+        image = self.current_image
         
-        def test_thread():
-            try:
-                self.status_var.set("Running full test cycle...")
-                
-                # Encode
-                self.update_status(0, "Encoding test image...")
-                audio = self.sstv.encode_image(self.current_image, self.update_status)
-                
-                if audio is None:
-                    self.status_var.set("Test failed at encoding stage")
-                    return
-                
-                # Decode
-                self.update_status(0, "Decoding audio...")
-                decoded = self.sstv.decode_audio(audio, self.update_status)
-                
-                if decoded is not None:
-                    self.current_decoded_image = decoded
-                    self.display_image(decoded, self.decoded_image_label)
-                    self.status_var.set("Full test cycle complete!")
-                else:
-                    self.status_var.set("Test failed at decoding stage")
-                    
-            except Exception as e:
-                self.status_var.set(f"Test error: {str(e)}")
-        
-        threading.Thread(target=test_thread, daemon=True).start()
+        def test(job):
+            job.report(0, "Encoding test image...")
+            audio = self.sstv.encode_image(image, job.report, job.token)
+            if audio is None:
+                raise RuntimeError("Test failed at encoding stage")
+            
+            job.report(0, "Decoding audio...")
+            self.events.put({'type': 'preview_reset'})
+            decoded = self.sstv.decode_audio(audio, job.report, self.post_rows, job.token)
+            if decoded is None:
+                raise RuntimeError("Test failed at decoding stage")
+            job.report(100, "Full test cycle complete!")
+            return decoded
+        
+        self.run_job("Full test", test, self.on_decoded, key=('test', id(image)), group='decode')
     
     def display_image(self, image, label_widget):
         """Display image in label widget"""
@@ -4,233 +4,110 @@ Pigeon70 SSTV - Real Desktop Implementation
 For actual amateur radio SSTV transmission and reception
 """
 
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
-from PIL import Image
 import argparse
+import json
+import sys
 import time
-import threading
-from scipy import signal
-import matplotlib.pyplot as plt
+from pathlib import Path
+
+from sstv_engine import DEMOD_MODES, FRAME_LINES, POOL_KINDS, SAMPLE_DTYPES, SAMPLE_RATE, Pigeon70Engine
+from sstv_kernels import KERNEL_MODES
+from sstv_stats import Stats
+
+# Sound card, file and worker-pool modules are imported by the commands that
+# use them, so `decode` never loads sounddevice and help text prints at once
+# (see benchmarks/import_budget.py)
+
+
+class Pigeon70SSTV(Pigeon70Engine):
+    """Pigeon70 engine with console reporting, sound files and the sound card"""
 
-class Pigeon70SSTV:
-    def __init__(self):
-        # Pigeon70 specifications
-        self.WIDTH = 320
-        self.HEIGHT = 240
-        self.SAMPLE_RATE = 44100
-        
-        # Frequency mapping
-        self.FREQ_VIS = 1900      # VIS code frequency
-        self.FREQ_SYNC = 1200     # Sync pulse frequency
-        self.FREQ_SEPARATOR = 1500 # Separator pulse frequency
-        self.FREQ_MIN = 1500      # Minimum pixel frequency
-        self.FREQ_MAX = 2300      # Maximum pixel frequency
-        
-        # Timing specifications
-        self.DURATION_VIS = 0.3        # VIS code duration (300ms)
-        self.DURATION_SYNC = 0.01      # Sync pulse duration (10ms)
-        self.DURATION_SEPARATOR = 0.01 # Separator pulse duration (10ms)
-        self.DURATION_PIXEL = (0.295 - 0.02) / 960  # Pixel tone duration
-        
-        # Audio settings
-        self.audio_device = None
-        self.is_transmitting = False
-        self.is_receiving = False
-        
-    def pixel_to_frequency(self, pixel_value):
-        """Convert pixel value (0-255) to frequency (1500-2300 Hz)"""
-        return self.FREQ_MIN + (pixel_value / 255) * (self.FREQ_MAX - self.FREQ_MIN)
-    
-    def frequency_to_pixel(self, frequency):
-        """Convert frequency (1500-2300 Hz) to pixel value (0-255)"""
-        if frequency < self.FREQ_MIN:
-            return 0
-        if frequency > self.FREQ_MAX:
-            return 255
-        return int(((frequency - self.FREQ_MIN) / (self.FREQ_MAX - self.FREQ_MIN)) * 255)
-    
-    def generate_tone(self, frequency, duration):
-        """Generate a sine wave tone"""
-        samples = int(duration * self.SAMPLE_RATE)
-        t = np.linspace(0, duration, samples, False)
-        return np.sin(2 * np.pi * frequency * t)
-    
     def encode_image(self, image_path, output_wav=None):
         """Encode image to SSTV audio signal"""
         print(f"Loading image: {image_path}")
         
         # Load and resize image
-        img = Image.open(image_path).convert('RGB')
-        img = img.resize((self.WIDTH, self.HEIGHT))
-        img_array = np.array(img)
+        img_array = self.prepare_image(image_path)
         
         print(f"Image size: {img_array.shape}")
         
-        # Calculate timing
         line_time = self.DURATION_SYNC + self.DURATION_SEPARATOR + (960 * self.DURATION_PIXEL)
-        total_duration = self.DURATION_VIS + (self.HEIGHT * line_time)
-        total_samples = int(total_duration * self.SAMPLE_RATE)
-        
-        print(f"Total duration: {total_duration:.1f} seconds")
+        print(f"Total duration: {self.frame_duration():.1f} seconds")
         print(f"Line time: {line_time:.3f} seconds")
         
-        # Create audio buffer
-        audio_buffer = np.zeros(total_samples)
-        sample_index = 0
-        
-        # Generate VIS code
-        print("Generating VIS code...")
-        vis_tone = self.generate_tone(self.FREQ_VIS, self.DURATION_VIS)
-        audio_buffer[sample_index:sample_index + len(vis_tone)] = vis_tone
-        sample_index += len(vis_tone)
-        
-        # Process each line
-        for y in range(self.HEIGHT):
-            if y % 50 == 0:
-                print(f"Processing line {y + 1}/{self.HEIGHT}")
-            
-            # Sync pulse
-            sync_tone = self.generate_tone(self.FREQ_SYNC, self.DURATION_SYNC)
-            audio_buffer[sample_index:sample_index + len(sync_tone)] = sync_tone
-            sample_index += len(sync_tone)
-            
-            # Separator pulse
-            separator_tone = self.generate_tone(self.FREQ_SEPARATOR, self.DURATION_SEPARATOR)
-            audio_buffer[sample_index:sample_index + len(separator_tone)] = separator_tone
-            sample_index += len(separator_tone)
-            
-            # Process each pixel in the line
-            for x in range(self.WIDTH):
-                r, g, b = img_array[y, x]
-                
-                # Generate tones for R, G, B values
-                r_tone = self.generate_tone(self.pixel_to_frequency(r), self.DURATION_PIXEL)
-                g_tone = self.generate_tone(self.pixel_to_frequency(g), self.DURATION_PIXEL)
-                b_tone = self.generate_tone(self.pixel_to_frequency(b), self.DURATION_PIXEL)
-                
-                # Add tones to buffer
-                audio_buffer[sample_index:sample_index + len(r_tone)] = r_tone
-                sample_index += len(r_tone)
-                audio_buffer[sample_index:sample_index + len(g_tone)] = g_tone
-                sample_index += len(g_tone)
-                audio_buffer[sample_index:sample_index + len(b_tone)] = b_tone
-                sample_index += len(b_tone)
-        
-        # Normalize audio
-        audio_buffer = audio_buffer / np.max(np.abs(audio_buffer)) * 0.8
+        print("Generating tone track...")
+        audio_buffer = self.encode_frame(img_array)
         
         # Save to file if requested
         if output_wav:
+            import soundfile as sf
             sf.write(output_wav, audio_buffer, self.SAMPLE_RATE)
             print(f"Audio saved to: {output_wav}")
         
         return audio_buffer
     
-    def detect_frequency(self, audio_segment):
-        """Detect dominant frequency in audio segment using FFT"""
-        # Use FFT for frequency detection
-        fft = np.fft.fft(audio_segment)
-        freqs = np.fft.fftfreq(len(audio_segment), 1/self.SAMPLE_RATE)
+    def encode_to_file(self, image_path, output_wav, blocksize=4096):
+        """Encode image straight to a sound file, one block at a time"""
+        from sstv_stream import encode_blocks, write_blocks
+        print(f"Loading image: {image_path}")
+        img_array = self.prepare_image(image_path)
         
-        # Find peak in relevant frequency range
-        mask = (freqs >= 1000) & (freqs <= 2500)
-        peak_idx = np.argmax(np.abs(fft[mask]))
-        return freqs[mask][peak_idx]
+        blocks = encode_blocks(self, img_array, blocksize)
+        samples = write_blocks(output_wav, blocks, self.SAMPLE_RATE)
+        print(f"Audio saved to: {output_wav} ({samples / self.SAMPLE_RATE:.1f} seconds)")
     
     def find_vis_code(self, audio_buffer):
         """Find VIS code in audio buffer"""
-        vis_samples = int(self.DURATION_VIS * self.SAMPLE_RATE)
-        
-        # Search first 2 seconds
-        search_limit = min(len(audio_buffer) - vis_samples, int(2 * self.SAMPLE_RATE))
+        index, confidence = self.detect_vis(audio_buffer)
         
-        for i in range(0, search_limit, int(0.01 * self.SAMPLE_RATE)):  # 10ms steps
-            segment = audio_buffer[i:i + vis_samples]
-            frequency = self.detect_frequency(segment)
-            
-            if abs(frequency - self.FREQ_VIS) < 50:  # 50Hz tolerance
-                print(f"VIS code found at {i/self.SAMPLE_RATE:.2f}s (frequency: {frequency:.1f}Hz)")
-                return i
-        
-        print("VIS code not found")
-        return -1
-    
-    def find_sync_pulse(self, audio_buffer, start_index):
-        """Find sync pulse in audio buffer"""
-        sync_samples = int(self.DURATION_SYNC * self.SAMPLE_RATE)
-        search_range = int(0.3 * self.SAMPLE_RATE)  # 300ms search window
-        
-        for i in range(start_index, min(start_index + search_range, len(audio_buffer) - sync_samples), int(0.001 * self.SAMPLE_RATE)):  # 1ms steps
-            segment = audio_buffer[i:i + sync_samples]
-            frequency = self.detect_frequency(segment)
-            
-            if abs(frequency - self.FREQ_SYNC) < 100:  # 100Hz tolerance
-                return i
-        
-        return -1
+        if index == -1:
+            print("VIS code not found")
+        else:
+            print(f"VIS code found at {index/self.SAMPLE_RATE:.4f}s (confidence: {confidence:.2f})")
+        return index
     
-    def decode_audio(self, audio_path, output_image=None):
-        """Decode SSTV audio signal to image"""
-        print(f"Loading audio: {audio_path}")
-        
-        # Load audio
-        audio_buffer, sample_rate = sf.read(audio_path)
-        if sample_rate != self.SAMPLE_RATE:
-            print(f"Warning: Sample rate mismatch. Expected {self.SAMPLE_RATE}, got {sample_rate}")
-        
-        print(f"Audio length: {len(audio_buffer)/sample_rate:.1f} seconds")
-        
-        # Find VIS code
-        vis_index = self.find_vis_code(audio_buffer)
-        if vis_index == -1:
-            print("No VIS code found, starting from beginning")
-            start_index = 0
+    def decode_audio(self, audio_path, output_image=None, lines=None, cache=None):
+        """Decode SSTV audio signal to image
+        
+        lines=(start, end) decodes just those lines. With a FrameCache, a
+        recording already analysed with the same settings is rendered from the
+        cache without being read; otherwise the whole frame is analysed and
+        stored, so any later range renders from the cache.
+        """
+        analysis = None
+        if cache is not None:
+            from sstv_cache import file_digest
+            with self.stats.timer('cache_load'):
+                key = cache.key(self, file_digest(audio_path))
+                analysis = cache.load(key)
+            self.stats.count('cache_hits' if analysis is not None else 'cache_misses')
+        
+        if analysis is not None:
+            print(f"Using cached analysis of {audio_path}")
         else:
-            start_index = vis_index + int(self.DURATION_VIS * self.SAMPLE_RATE)
-        
-        # Create image
-        image_data = np.zeros((self.HEIGHT, self.WIDTH, 3), dtype=np.uint8)
-        current_index = start_index
-        
-        # Decode each line
-        for y in range(self.HEIGHT):
-            if y % 50 == 0:
-                print(f"Decoding line {y + 1}/{self.HEIGHT}")
+            print(f"Loading audio: {audio_path}")
             
-            # Find sync pulse
-            sync_index = self.find_sync_pulse(audio_buffer, current_index)
-            if sync_index == -1:
-                print(f"Sync pulse not found for line {y}")
-                # Use estimated position
-                sync_index = current_index
-            else:
-                current_index = sync_index
+            # Load audio
+            audio_buffer, sample_rate = self.load_audio(audio_path)
+            if sample_rate != self.SAMPLE_RATE:
+                print(f"Resampled from {sample_rate} Hz to {self.SAMPLE_RATE} Hz")
             
-            # Skip separator
-            current_index += int(self.DURATION_SEPARATOR * self.SAMPLE_RATE)
+            print(f"Audio length: {len(audio_buffer)/self.SAMPLE_RATE:.1f} seconds")
             
-            # Decode pixels
-            for x in range(self.WIDTH):
-                for color_idx in range(3):  # R, G, B
-                    pixel_samples = int(self.DURATION_PIXEL * self.SAMPLE_RATE)
-                    
-                    if current_index + pixel_samples >= len(audio_buffer):
-                        break
-                    
-                    segment = audio_buffer[current_index:current_index + pixel_samples]
-                    frequency = self.detect_frequency(segment)
-                    pixel_value = self.frequency_to_pixel(frequency)
-                    
-                    image_data[y, x, color_idx] = pixel_value
-                    current_index += pixel_samples
-                
-                if current_index + pixel_samples >= len(audio_buffer):
-                    break
-        
-        # Create and save image
-        img = Image.fromarray(image_data)
+            print("Decoding frame...")
+            analysis = self.analyze_samples(audio_buffer, lines=None if cache is not None else lines)
+            if cache is not None:
+                cache.store(key, analysis)
+        
+        img, stats = self.render_frame(analysis, lines)
+        if stats['vis_found']:
+            print(f"VIS code found at {stats['vis_index']/self.SAMPLE_RATE:.4f}s (confidence: {stats['vis_confidence']:.2f})")
+        else:
+            print("No VIS code found, starting from first sync pulse")
+        print(f"Line clock fitted to {stats['sync_used']} of {stats['sync_pulses']} sync pulses "
+              f"(skew {stats['skew_ppm']:+.0f} ppm)")
+        if 'lines' in stats:
+            print(f"Lines {stats['lines'][0]}-{stats['lines'][1]} of {self.HEIGHT}")
         
         if output_image:
             img.save(output_image)
@@ -244,6 +121,7 @@ class Pigeon70SSTV:
         self.is_transmitting = True
         
         try:
+            import sounddevice as sd
             sd.play(audio_buffer, self.SAMPLE_RATE)
             sd.wait()  # Wait until audio is finished
         except Exception as e:
@@ -252,12 +130,28 @@ class Pigeon70SSTV:
             self.is_transmitting = False
             print("Transmission complete")
     
+    def transmit_image(self, image_path, blocksize=4096):
+        """Encode and transmit an image, starting playback as soon as the first block is ready"""
+        print("Starting transmission...")
+        self.is_transmitting = True
+        
+        try:
+            from sstv_stream import encode_blocks, transmit_stream
+            blocks = encode_blocks(self, self.prepare_image(image_path), blocksize)
+            transmit_stream(self, blocks, blocksize)
+        except Exception as e:
+            print(f"Transmission error: {e}")
+        finally:
+            self.is_transmitting = False
+            print("Transmission complete")
+    
     def receive_audio(self, duration=75):
         """Receive audio from microphone"""
         print(f"Starting reception for {duration} seconds...")
         self.is_receiving = True
         
         try:
+            import sounddevice as sd
             # Record audio
             audio_buffer = sd.rec(int(duration * self.SAMPLE_RATE), 
                                 samplerate=self.SAMPLE_RATE, 
@@ -273,44 +167,327 @@ class Pigeon70SSTV:
         finally:
             self.is_receiving = False
 
+def encode_batch_command(args):
+    """Encode every matching image on a process pool, one 16-bit sound file per input"""
+    from sstv_batch import IMAGE_EXTENSIONS, encode_batch, expand_inputs
+    inputs = expand_inputs(args.input, IMAGE_EXTENSIONS)
+    if not inputs:
+        print("No input images found")
+        return
+    output_dir = Path(args.output or 'encoded')
+    print(f"Encoding {len(inputs)} image(s) into {output_dir}/ ...")
+    
+    started = time.perf_counter()
+    encoded = 0
+    audio_seconds = 0.0
+    for record in encode_batch(inputs, output_dir, args.format, jobs=args.jobs,
+                               sample_rate=args.sample_rate):
+        if record['ok']:
+            encoded += 1
+            audio_seconds += record['duration']
+            print(f"[{record['index'] + 1}/{len(inputs)}] {record['input']} -> {record['output']} "
+                  f"({record['seconds']:.2f}s)")
+        else:
+            print(f"[{record['index'] + 1}/{len(inputs)}] {record['input']} FAILED: {record['error']}")
+    elapsed = time.perf_counter() - started
+    print(f"Batch complete! {encoded}/{len(inputs)} encoded in {elapsed:.1f}s "
+          f"({encoded / elapsed:.2f} frames/s, {audio_seconds / elapsed:.0f}x real time)")
+
+def decode_batch_command(args):
+    """Decode every matching recording on a process pool, one image per input"""
+    from sstv_batch import decode_batch, expand_inputs
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        print("No input recordings found")
+        return
+    output_dir = Path(args.output or 'decoded')
+    print(f"Decoding {len(inputs)} recording(s) into {output_dir}/ ...")
+    
+    started = time.perf_counter()
+    decoded = 0
+    for record in decode_batch(inputs, output_dir, args.summary, jobs=args.jobs, demod=args.demod,
+                               dtype=args.dtype, sample_rate=args.sample_rate, kernels=args.kernels):
+        if record['ok']:
+            decoded += 1
+            vis = 'VIS' if record['vis_found'] else 'no VIS'
+            print(f"[{record['index'] + 1}/{len(inputs)}] {record['input']} -> {record['output']} "
+                  f"({record['seconds']:.2f}s, {vis}, sync {record['sync_hit_rate']:.0%})")
+        else:
+            print(f"[{record['index'] + 1}/{len(inputs)}] {record['input']} FAILED: {record['error']}")
+    elapsed = time.perf_counter() - started
+    print(f"Batch complete! {decoded}/{len(inputs)} decoded in {elapsed:.1f}s")
+
+def scan_command(sstv, args):
+    """Index every VIS leader in a long recording, then decode each frame it starts"""
+    import soundfile as sf
+    from sstv_batch import decode_frames
+    from sstv_stream import scan_leaders
+    output_dir = Path(args.output or f"{Path(args.input).stem}_frames")
+    index_path = output_dir / 'index.json'
+    info = sf.info(args.input)
+    # Leaders are found block by block, so the scan works at the recording's own rate
+    sstv = sstv.at_rate(info.samplerate)
+    source = {'input': str(Path(args.input).resolve()), 'size': Path(args.input).stat().st_size,
+              'mtime': Path(args.input).stat().st_mtime}
+    
+    # Reuse the leader index from an earlier run on the same, unchanged file
+    index = None
+    if index_path.exists() and not args.rescan:
+        with open(index_path) as f:
+            index = json.load(f)
+        if {key: index.get(key) for key in source} != source:
+            index = None
+    if index is None:
+        print(f"Scanning {args.input} ({info.duration:.1f} seconds) for VIS leaders...")
+        started = time.perf_counter()
+        index = dict(source, sample_rate=info.samplerate, frames=scan_leaders(sstv, args.input))
+        print(f"Found {len(index['frames'])} leader(s) in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"Using {len(index['frames'])} leader(s) from {index_path}")
+    
+    started = time.perf_counter()
+    for record in decode_frames(args.input, index['frames'], output_dir, jobs=args.jobs,
+                                demod=args.demod, dtype=args.dtype, sample_rate=sstv.SAMPLE_RATE,
+                                kernels=args.kernels):
+        frame = index['frames'][record['frame'] - 1]
+        frame.update({key: record[key] for key in ('output', 'ok', 'error', 'sync_hit_rate', 'skew_ppm')
+                      if key in record})
+        if record['ok']:
+            print(f"Frame {record['frame']} at {frame['time']:.1f}s -> {record['output']} "
+                  f"(sync {record['sync_hit_rate']:.0%}, tone offset {frame.get('frequency_offset', 0):+.1f} Hz)")
+        else:
+            print(f"Frame {record['frame']} at {frame['time']:.1f}s FAILED: {record['error']}")
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    print(f"Scan complete! {len(index['frames'])} frame(s) decoded in {time.perf_counter() - started:.1f}s, "
+          f"index saved to: {index_path}")
+
+def beacon_command(args):
+    """Send a list of images on a schedule from the library of rendered frames, through one audio stream"""
+    from sstv_batch import IMAGE_EXTENSIONS, expand_inputs
+    from sstv_beacon import FrameLibrary, beacon_schedule, beacon_stream
+    images = expand_inputs(args.input, IMAGE_EXTENSIONS)
+    if not images:
+        print("No input images found")
+        return
+    library = FrameLibrary(args.library, args.sample_rate)
+    
+    if args.render_only:
+        for image in images:
+            _, cached = library.frame(image)
+            print(f"{image}: {'already in library' if cached else 'rendered'}")
+        print(f"Library: {library.directory}")
+        return
+    
+    cycles = 'until interrupted' if args.cycles == 0 else f"{args.cycles} time(s)"
+    spacing = f"every {args.interval:g} s" if args.interval else "back to back"
+    print(f"Beacon: {len(images)} image(s), {spacing}, {cycles}")
+    sent = 0
+    try:
+        schedule = beacon_schedule(library, images, args.cycles, args.interval)
+        for event in beacon_stream(library.encoder.SAMPLE_RATE, schedule):
+            if event['type'] == 'ready':
+                print(f"Prepared {event['name']} ({'from library' if event['cached'] else 'rendered'})")
+            elif event['type'] == 'frame':
+                sent += 1
+                print(f"[{event['time']:7.1f}s] Transmitting {event['name']} (cycle {event['cycle'] + 1})")
+            elif event['type'] == 'underrun':
+                print(f"Audio underrun, sent {event['samples']} samples of silence")
+            elif event['type'] == 'error':
+                print(f"Beacon error: {event['error']}")
+    except KeyboardInterrupt:
+        print("Beacon stopped")
+    print(f"Beacon complete! {sent} frame(s) transmitted")
+
+def save_frames(sstv, events, output):
+    """Report streaming decoder events and save each frame (output, output_2, ...); returns the frame count"""
+    frames = 0
+    for event in events:
+        if event['type'] == 'vis':
+            print(f"VIS code detected (confidence: {event['confidence']:.2f})")
+        elif event['type'] == 'line' and event['line'] % 50 == 0:
+            print(f"Received line {event['line'] + 1}/{sstv.HEIGHT}")
+        elif event['type'] == 'lost':
+            print(f"Signal lost at line {event['line']}, waiting for next frame")
+        elif event['type'] == 'overrun':
+            print(f"Audio overrun, dropped {event['samples']} samples")
+        elif event['type'] == 'frame':
+            frames += 1
+            path = output if frames == 1 else output.with_name(f"{output.stem}_{frames}{output.suffix}")
+            event['image'].save(path)
+            partial = '' if event['lines'] == sstv.HEIGHT else f" (partial, {event['lines']} lines)"
+            print(f"Image saved to: {path}{partial}")
+    return frames
+
+def stream_decoder(args):
+    """Decoder factory for streamed decoding: the sync-search decoder, or the block pipeline with --pipeline"""
+    if args.pipeline:
+        from sstv_pipeline import decoding_pipeline
+        return decoding_pipeline
+    from sstv_stream import StreamingDecoder
+    return StreamingDecoder
+
+def default_kernels(args):
+    """Kernel mode when --kernels is not given: numba only where the run repays loading it"""
+    # Loading numba takes about 0.45 s, as long as it saves on a single frame
+    if args.mode == 'decode' and not args.stream:
+        return 'numpy'
+    return 'auto'
+
+def line_range(text):
+    """Parse START-END into a (start, end) line range for --lines"""
+    try:
+        start, end = (int(part) for part in text.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START-END, got '{text}'")
+    if not 0 <= start < end:
+        raise argparse.ArgumentTypeError(f"empty or negative line range '{text}'")
+    if end > FRAME_LINES:
+        raise argparse.ArgumentTypeError(f"line range '{text}' runs past the frame's {FRAME_LINES} lines")
+    return start, end
+
 def main():
     parser = argparse.ArgumentParser(description='Pigeon70 SSTV Encoder/Decoder')
-    parser.add_argument('mode', choices=['encode', 'decode', 'transmit', 'receive'], 
+    parser.add_argument('mode', choices=['encode', 'decode', 'transmit', 'receive', 'scan', 'beacon', 'encode-batch', 'decode-batch'], 
                        help='Operation mode')
-    parser.add_argument('input', help='Input file (image for encode, audio for decode)')
-    parser.add_argument('-o', '--output', help='Output file')
+    parser.add_argument('input', nargs='+',
+                       help='Input file (image for encode, audio for decode); files, directories or globs for beacon and batch modes')
+    parser.add_argument('-o', '--output', help='Output file (output directory for scan and batch modes)')
     parser.add_argument('-d', '--duration', type=int, default=75, 
-                       help='Reception duration in seconds (default: 75)')
+                       help='Listen for new frames for this many seconds; a frame in progress is always completed (default: 75)')
+    parser.add_argument('--demod', choices=DEMOD_MODES, default='bank',
+                       help='Pixel demodulator: per-tone correlator bank or whole-buffer FM discriminator (default: bank)')
+    parser.add_argument('--dtype', choices=SAMPLE_DTYPES, default='float32',
+                       help='Sample format: float32 halves memory against float64; int16 encodes straight to 16-bit samples (default: float32)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                       help='Workers: processes for scan and batch modes, line-decoding workers for decode (default: one per CPU, 1 for decode)')
+    parser.add_argument('--pool', choices=POOL_KINDS, default='thread',
+                       help='Worker pool for parallel line decoding in decode (default: thread)')
+    parser.add_argument('--sample-rate', type=int, default=SAMPLE_RATE, metavar='HZ',
+                       help='Engine sample rate: encode, encode-batch, transmit and beacon output, and the rate decode and decode-batch '
+                            'resample recordings to; 11025 decodes about 4x faster with --demod fm (default: 44100)')
+    parser.add_argument('--kernels', choices=KERNEL_MODES,
+                       help='Sync search and pixel averaging kernels: numba-compiled loops or numpy; auto uses numba '
+                            'when it is installed (default: numpy for decode of one file, auto for --stream, scan, '
+                            'receive and the batch modes)')
+    parser.add_argument('--summary', help='JSON-lines summary for decode-batch (default: OUTPUT/summary.jsonl)')
+    parser.add_argument('--stream', action='store_true',
+                       help='decode: read the file block by block with bounded memory and save every frame in it')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='decode --stream and receive: decode through the block pipeline (AGC, FM discriminator, '
+                            'sync detector, pixel slicer), which holds up better in noise and mistuning '
+                            'but blurs clean signals slightly')
+    parser.add_argument('--lines', type=line_range, metavar='START-END',
+                       help='decode: decode only lines START up to END (exclusive), e.g. 100-140')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='decode: neither read nor write the cache of analysed recordings')
+    parser.add_argument('--cache-dir', help='decode: cache directory (default: $XDG_CACHE_HOME/pigeon70)')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                       help='decode: evict least recently used cache entries beyond this size (default: 256)')
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                       help='beacon: start a frame every SECONDS, silent in between (default: back to back)')
+    parser.add_argument('--cycles', type=int, default=1,
+                       help='beacon: times to send the whole list, 0 for until interrupted (default: 1)')
+    parser.add_argument('--library', help='beacon: directory of rendered frames (default: $XDG_CACHE_HOME/pigeon70/frames)')
+    parser.add_argument('--render-only', action='store_true',
+                       help='beacon: render any frames missing from the library, then exit without transmitting')
+    parser.add_argument('--rescan', action='store_true',
+                       help='scan: search for VIS leaders again even if OUTPUT/index.json matches the input')
+    parser.add_argument('--format', choices=['flac', 'wav'], default='flac',
+                       help='16-bit audio format written by encode-batch (default: flac)')
+    
+    parser.add_argument('--stats', choices=['text', 'json'],
+                       help='Print stage timings, counters and sync jitter to stderr when done')
+    parser.add_argument('--profile', metavar='FILE',
+                       help='Run under cProfile, dump the profile to FILE and print the top functions')
     
     args = parser.parse_args()
+    if args.mode not in ('beacon', 'encode-batch', 'decode-batch'):
+        if len(args.input) != 1:
+            parser.error(f"{args.mode} takes exactly one input file")
+        args.input = args.input[0]
+    if args.kernels is None:
+        args.kernels = default_kernels(args)
+    
+    stats = Stats() if args.stats else None
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run_command(args, stats)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to: {args.profile}")
+            import pstats
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        if stats:
+            report = json.dumps(stats.summary(), indent=2) if args.stats == 'json' else stats.format()
+            print(report, file=sys.stderr)
+
+def run_command(args, stats=None):
+    """Run the selected mode; stats collects instrumentation from this process"""
+    if args.mode == 'encode-batch':
+        encode_batch_command(args)
+        return
+    if args.mode == 'decode-batch':
+        decode_batch_command(args)
+        return
+    if args.mode == 'beacon':
+        beacon_command(args)
+        return
     
-    sstv = Pigeon70SSTV()
+    sstv = Pigeon70SSTV(demod=args.demod, jobs=args.jobs or 1, pool=args.pool, dtype=args.dtype, stats=stats,
+                        sample_rate=args.sample_rate, kernels=args.kernels)
     
     if args.mode == 'encode':
-        audio = sstv.encode_image(args.input, args.output)
+        if args.output:
+            # Stream blocks to the file; the whole signal is never held in memory
+            sstv.encode_to_file(args.input, args.output)
+        else:
+            audio = sstv.encode_image(args.input)
         print("Encoding complete!")
         
     elif args.mode == 'decode':
-        image = sstv.decode_audio(args.input, args.output)
-        print("Decoding complete!")
+        if args.stream:
+            # Block by block with bounded memory, saving every frame in the recording
+            import soundfile as sf
+            from sstv_stream import file_stream
+            info = sf.info(args.input)
+            if info.samplerate != sstv.SAMPLE_RATE:
+                # Blocks are decoded as they are read, at the recording's own rate
+                print(f"Decoding at the recording's {info.samplerate} Hz")
+                sstv = sstv.at_rate(info.samplerate)
+            print(f"Streaming {args.input} ({info.duration:.1f} seconds)...")
+            frames = save_frames(sstv, file_stream(sstv, args.input, make_decoder=stream_decoder(args)),
+                                 Path(args.output or 'decoded.png'))
+            print(f"Decoding complete! {frames} frame(s) decoded")
+        else:
+            cache = None
+            if not args.no_cache:
+                from sstv_cache import FrameCache
+                cache = FrameCache(args.cache_dir, args.cache_size * 2 ** 20)
+            image = sstv.decode_audio(args.input, args.output, args.lines, cache)
+            print("Decoding complete!")
+        
+    elif args.mode == 'scan':
+        scan_command(sstv, args)
         
     elif args.mode == 'transmit':
-        audio = sstv.encode_image(args.input)
-        sstv.transmit_audio(audio)
+        sstv.transmit_image(args.input)
         
     elif args.mode == 'receive':
-        audio = sstv.receive_audio(args.duration)
-        if audio is not None:
-            # Save received audio
-            if args.output:
-                sf.write(args.output, audio, sstv.SAMPLE_RATE)
-                print(f"Received audio saved to: {args.output}")
-            
-            # Decode received audio
-            temp_wav = "temp_received.wav"
-            sf.write(temp_wav, audio, sstv.SAMPLE_RATE)
-            image = sstv.decode_audio(temp_wav, args.output)
-            print("Reception and decoding complete!")
+        # Decode live, line by line, saving every frame as soon as it completes
+        from sstv_stream import receive_stream
+        print(f"Listening for SSTV frames for {args.duration} seconds...")
+        frames = save_frames(sstv, receive_stream(sstv, duration=args.duration, make_decoder=stream_decoder(args)),
+                             Path(args.output or 'received.png'))
+        print(f"Reception complete! {frames} frame(s) decoded")
 
 if __name__ == "__main__":
     main()
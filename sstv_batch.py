@@ -0,0 +1,309 @@
+"""
+Pigeon70 SSTV - Batch processing
+Multi-core encoding and decoding of many files on a process pool
+"""
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from sstv_dsp import SINE_TABLE_BITS, sine_table, synthesize_table
+from sstv_engine import SAMPLE_RATE
+from sstv_stream import STREAM_AMPLITUDE
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# Engine and shared tables owned by each worker process, set up once by the pool initializer
+_worker_sstv = None
+_worker_blocks = None
+_worker_tables = None
+
+
+def expand_inputs(patterns, extensions=AUDIO_EXTENSIONS):
+    """Expand files, directories and glob patterns into a sorted, de-duplicated file list"""
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = [p for p in path.iterdir() if p.suffix.lower() in extensions]
+        elif glob.has_magic(pattern):
+            matches = [Path(p) for p in glob.glob(pattern, recursive=True)]
+        else:
+            matches = [path]
+        files.extend(sorted(matches))
+
+    seen = set()
+    unique = []
+    for path in files:
+        key = path.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def output_paths(inputs, output_dir, suffix):
+    """One output file per input, named after its stem; clashing stems get a numeric suffix"""
+    used = set()
+    outputs = []
+    for path in inputs:
+        name = f"{path.stem}{suffix}"
+        count = 1
+        while name in used:
+            count += 1
+            name = f"{path.stem}_{count}{suffix}"
+        used.add(name)
+        outputs.append(Path(output_dir) / name)
+    return outputs
+
+
+def _init_decode_worker(demod, dtype, sample_rate, kernels):
+    """Pool initializer: build the engine and its tables once per worker process"""
+    global _worker_sstv
+    from sstv_engine import Pigeon70Engine
+    _worker_sstv = Pigeon70Engine(demod=demod, dtype=dtype, sample_rate=sample_rate, kernels=kernels)
+
+
+def _decode_file(input_path, output_path):
+    """Decode one recording in a worker; any failure is reported in the record, never raised"""
+    started = time.perf_counter()
+    record = {'input': str(input_path), 'output': None, 'ok': False}
+    try:
+        audio_buffer, sample_rate = _worker_sstv.load_audio(input_path)
+        record['sample_rate'] = sample_rate
+        record['duration'] = round(len(audio_buffer) / _worker_sstv.SAMPLE_RATE, 2)
+
+        img, stats = _worker_sstv.decode_samples(audio_buffer)
+        del audio_buffer
+        img.save(output_path)
+        record.update(stats)
+        record.update(output=str(output_path), ok=True)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def _run_pool(worker, tasks, jobs, max_pending, initializer, initargs):
+    """Run worker(*task) for each task on a process pool, yielding (index, record) as tasks finish
+
+    At most `max_pending` tasks are submitted at once, so the task list is
+    consumed lazily and finished records never pile up.
+    """
+    tasks = enumerate(tasks)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        pending = {}
+
+        def submit_next():
+            for index, task in tasks:
+                pending[pool.submit(worker, *task)] = index
+                return True
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # A crashed worker process; the task itself never raises
+                    record = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                yield index, record
+                submit_next()
+
+
+def decode_batch(inputs, output_dir, summary_path=None, jobs=None, demod='bank', dtype='float32',
+                 max_pending=None, sample_rate=SAMPLE_RATE, kernels='auto'):
+    """Decode many recordings in parallel, yielding one summary record per file as it finishes
+
+    Only file paths cross the process boundary; each worker loads its own audio, and
+    at most `max_pending` files (default twice the worker count) are in flight at once,
+    so memory stays bounded however many inputs there are. Records are yielded in
+    completion order and appended to `summary_path` as JSON lines. Recordings
+    are resampled to `sample_rate` and decoded at that rate. `kernels` is
+    the engine's kernel mode; compiled kernels are loaded once per worker and
+    reused for every file it decodes.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = Path(summary_path) if summary_path else output_dir / 'summary.jsonl'
+
+    tasks = zip(inputs, output_paths(inputs, output_dir, '.png'))
+    with open(summary_path, 'w') as summary:
+        for index, record in _run_pool(_decode_file, tasks, jobs, max_pending or 2 * jobs,
+                                       _init_decode_worker, (demod, dtype, sample_rate, kernels)):
+            record.setdefault('input', str(inputs[index]))
+            record['index'] = index
+            summary.write(json.dumps(record) + '\n')
+            summary.flush()
+            yield record
+
+
+def _decode_segment(input_path, start, frames, output_path):
+    """Decode one frame of a long recording in a worker, reading only its own stretch of audio"""
+    started = time.perf_counter()
+    record = {'output': None, 'ok': False}
+    try:
+        with sf.SoundFile(input_path) as source:
+            source.seek(start)
+            audio_buffer = source.read(frames, dtype=_worker_sstv.work_dtype.name, always_2d=True)[:, 0]
+        img, stats = _worker_sstv.decode_samples(audio_buffer)
+        del audio_buffer
+        img.save(output_path)
+        if stats['vis_found']:
+            # -1 means no leader was found and stays as is
+            stats['vis_index'] += start
+        record.update(stats)
+        record.update(output=str(output_path), ok=True)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def decode_frames(input_path, leaders, output_dir, jobs=None, demod='bank', dtype='float32', margin=0.5,
+                  max_pending=None, sample_rate=SAMPLE_RATE, kernels='auto'):
+    """Decode every frame of a long recording in parallel, one per leader from scan_leaders
+
+    Frame n is written to output_dir/frame_NNN.png. Each worker reads just
+    its frame plus `margin` seconds either side, so memory use does not
+    depend on the length of the recording. Yields one record per frame, in
+    completion order. Leader offsets and the decode are at `sample_rate`,
+    which must be the recording's own rate.
+    """
+    from sstv_engine import Pigeon70Engine
+
+    sstv = Pigeon70Engine(sample_rate=sample_rate)
+    jobs = jobs or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Room for the leader, every line and the largest clock skew the decoder accepts
+    pad = int(margin * sstv.SAMPLE_RATE)
+    frame_samples = int(sstv.DURATION_VIS * sstv.SAMPLE_RATE + sstv.HEIGHT * sstv.line_period() * 1.02)
+    tasks = [(str(input_path), max(0, leader['offset'] - pad), frame_samples + 2 * pad,
+              output_dir / f"frame_{number:03d}.png") for number, leader in enumerate(leaders, 1)]
+    for index, record in _run_pool(_decode_segment, tasks, jobs, max_pending or 2 * jobs,
+                                   _init_decode_worker, (demod, dtype, sample_rate, kernels)):
+        record['frame'] = index + 1
+        yield record
+
+
+class SharedTables:
+    """Numpy arrays published once in shared memory for pool workers
+
+    The owner creates the blocks, sees them through `arrays` and unlinks them
+    on close; workers attach by name through `spec` and get zero-copy views.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            view = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+            view[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+            self.arrays[name] = view
+
+    @staticmethod
+    def attach(spec, writeable=False):
+        """Map every table in `spec`; returns (blocks, arrays), keep the blocks alive while in use
+
+        Views are read-only unless `writeable` is set, for outputs that workers fill in.
+        """
+        blocks = []
+        arrays = {}
+        for name, (block_name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype, buffer=block.buf)
+            array.flags.writeable = writeable
+            blocks.append(block)
+            arrays[name] = array
+        return blocks, arrays
+
+    def close(self):
+        # Views must be released before their blocks can be closed
+        self.arrays = {}
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def encoder_tables(sstv, bits=SINE_TABLE_BITS):
+    """Tables shared by every encode: the int16 sine table and the frame's tone layout"""
+    return {
+        'sine': sine_table(bits, STREAM_AMPLITUDE * 32767, np.int16),
+        'counts': sstv.tone_counts(),
+    }
+
+
+def _init_encode_worker(spec, sample_rate):
+    """Pool initializer: build the engine at the tables' rate and attach the shared encoder tables"""
+    global _worker_sstv, _worker_blocks, _worker_tables
+    from sstv_engine import Pigeon70Engine
+    _worker_sstv = Pigeon70Engine(sample_rate=sample_rate)
+    _worker_blocks, _worker_tables = SharedTables.attach(spec)
+
+
+def _encode_file(input_path, output_path):
+    """Encode one image to a 16-bit sound file in a worker; failures are reported, never raised"""
+    started = time.perf_counter()
+    record = {'input': str(input_path), 'output': None, 'ok': False}
+    try:
+        img_array = _worker_sstv.prepare_image(input_path)
+        frequencies = _worker_sstv.tone_frequencies(img_array)
+        samples, _ = synthesize_table(frequencies, _worker_tables['counts'], _worker_tables['sine'],
+                                      _worker_sstv.SAMPLE_RATE)
+        sf.write(output_path, samples, _worker_sstv.SAMPLE_RATE, subtype='PCM_16')
+        record.update(output=str(output_path), ok=True, samples=len(samples),
+                      duration=round(len(samples) / _worker_sstv.SAMPLE_RATE, 2))
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def encode_batch(inputs, output_dir, audio_format='flac', jobs=None, max_pending=None,
+                 sample_rate=SAMPLE_RATE):
+    """Encode many images in parallel to 16-bit WAV or FLAC, yielding one record per image
+
+    The sine table and tone layout are built once and shared with every worker
+    through shared memory instead of being rebuilt per task. Every file is
+    written at `sample_rate`.
+    """
+    from sstv_engine import Pigeon70Engine
+
+    jobs = jobs or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = zip(inputs, output_paths(inputs, output_dir, f'.{audio_format}'))
+    with SharedTables(encoder_tables(Pigeon70Engine(sample_rate=sample_rate))) as tables:
+        for index, record in _run_pool(_encode_file, tasks, jobs, max_pending or 2 * jobs,
+                                       _init_encode_worker, (tables.spec, sample_rate)):
+            record.setdefault('input', str(inputs[index]))
+            record['index'] = index
+            yield record
@@ -0,0 +1,215 @@
+"""
+Pigeon70 SSTV - Beacon transmission
+Library of pre-rendered frames and gapless, scheduled playback through one
+persistent output stream
+"""
+
+import hashlib
+import itertools
+import os
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from sstv_cache import default_directory, file_digest, samples_digest
+from sstv_dsp import SINE_TABLE_BITS
+from sstv_engine import SAMPLE_RATE, Pigeon70Engine
+
+# Bumped whenever the rendering of a stored frame changes
+FRAME_VERSION = 1
+
+# int16 samples per 4 KiB page; prefetching reads one sample from each page
+PAGE_SAMPLES = 2048
+
+
+class FrameLibrary:
+    """Encoded frames stored as int16 .npy files and memory-mapped for playback
+
+    A frame is keyed by the image's content hash plus every encoder setting,
+    so each image is rendered once and later transmissions map the stored
+    samples straight from disk.
+    """
+
+    def __init__(self, directory=None, sample_rate=SAMPLE_RATE):
+        self.directory = Path(directory) if directory else default_directory() / 'frames'
+        self.encoder = Pigeon70Engine(dtype='int16', sample_rate=sample_rate)
+
+    def key(self, digest):
+        """Frame key for an image with content hash `digest`"""
+        encoder = self.encoder
+        params = (FRAME_VERSION, digest, encoder.SAMPLE_RATE, encoder.WIDTH, encoder.HEIGHT,
+                  float(encoder.line_period()), SINE_TABLE_BITS)
+        return hashlib.blake2b(repr(params).encode(), digest_size=16).hexdigest()
+
+    def path(self, key):
+        return self.directory / f"{key}.npy"
+
+    def frame(self, image_input):
+        """Memory-mapped int16 samples of an image's frame, rendered and stored on first use
+
+        image_input is a path or a PIL Image. Returns (samples, cached).
+        """
+        if isinstance(image_input, (str, Path)):
+            digest = file_digest(image_input)
+        else:
+            digest = samples_digest(self.encoder.prepare_image(image_input))
+        path = self.path(self.key(digest))
+
+        cached = path.exists()
+        if not cached:
+            samples = self.encoder.encode_frame(self.encoder.prepare_image(image_input))
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            # Write aside and rename, so a player never maps a partial frame
+            partial = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+            with open(partial, 'wb') as f:
+                np.save(f, samples)
+            os.replace(partial, path)
+        return np.load(path, mmap_mode='r'), cached
+
+
+def beacon_schedule(library, images, cycles=1, interval=None):
+    """Yield the playout items of a beacon: every image in turn, `cycles` times (forever if 0)
+
+    Each item is a dict with 'type' ('frame' or 'silence'), 'samples' (None
+    for silence) and 'length'. With interval (seconds), frames start on
+    interval boundaries, the gaps filled with silence; a frame longer than
+    the interval is followed straight away by the next. Frames are rendered
+    or mapped as the schedule is consumed, so callers can do it ahead of time.
+    """
+    slot = int(round(interval * library.encoder.SAMPLE_RATE)) if interval else 0
+    rounds = itertools.count() if cycles == 0 else range(cycles)
+    gap = 0
+    for cycle in rounds:
+        for image in images:
+            samples, cached = library.frame(image)
+            if gap > 0:
+                yield {'type': 'silence', 'samples': None, 'length': gap}
+            yield {'type': 'frame', 'name': str(image), 'cycle': cycle, 'cached': cached,
+                   'samples': samples, 'length': len(samples)}
+            gap = slot - len(samples)
+
+
+class Playout:
+    """Sample cursor over a queue of playout items, for an output stream callback
+
+    fill() only slices and copies, so it is safe in a real-time callback.
+    Items follow each other with no gap: a callback buffer that spans the
+    end of one item is completed from the next. A None item ends playout.
+    """
+
+    def __init__(self, pending, events, sample_rate):
+        self.pending = pending
+        self.events = events
+        self.sample_rate = sample_rate
+        self.item = None
+        self.position = 0
+        self.played = 0
+
+    def start(self, item):
+        self.item = item
+        self.position = 0
+        if item is not None and item['type'] == 'frame':
+            self.events.put({'type': 'frame', 'name': item['name'], 'cycle': item['cycle'],
+                             'time': self.played / self.sample_rate})
+
+    def fill(self, out):
+        """Fill `out` with the next samples; returns False once the last item has played"""
+        filled = 0
+        while filled < len(out):
+            if self.item is None:
+                try:
+                    next_item = self.pending.get_nowait()
+                except queue.Empty:
+                    # Prefetch fell behind: send silence rather than stall the device
+                    out[filled:] = 0
+                    self.events.put({'type': 'underrun', 'samples': len(out) - filled})
+                    self.played += len(out) - filled
+                    return True
+                if next_item is None:
+                    out[filled:] = 0
+                    return False
+                self.start(next_item)
+
+            take = min(len(out) - filled, self.item['length'] - self.position)
+            if self.item['samples'] is None:
+                out[filled:filled + take] = 0
+            else:
+                out[filled:filled + take] = self.item['samples'][self.position:self.position + take]
+            filled += take
+            self.position += take
+            self.played += take
+            if self.position == self.item['length']:
+                self.item = None
+        return True
+
+
+def beacon_stream(sample_rate, items, device=None, blocksize=4096, prefetch=1, stop_event=None):
+    """Play items back to back through one int16 output stream, yielding events as they happen
+
+    A background thread takes items from `items` (rendering or mapping each
+    frame and paging it in) and keeps up to `prefetch` of them ready while
+    the current one plays. The device opens once the first item is ready and
+    stays open until the schedule ends or stop_event is set. Events: 'ready'
+    when a frame has been prepared, 'frame' when it starts playing (time in
+    seconds of output since playback began), 'underrun' and 'error'.
+    """
+    # Only live transmission needs an audio device
+    import sounddevice as sd
+
+    pending = queue.Queue(maxsize=prefetch)
+    events = queue.SimpleQueue()
+    finished = threading.Event()
+
+    def offer(item):
+        # Give up once playback has ended or been stopped
+        while not finished.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if item['samples'] is not None:
+                    # Touch every page now, so the callback never waits on the disk
+                    np.sum(item['samples'][::PAGE_SAMPLES], dtype=np.int64)
+                    events.put({'type': 'ready', 'name': item['name'], 'cached': item['cached']})
+                if not offer(item):
+                    return
+        except Exception as e:
+            events.put({'type': 'error', 'error': f"{type(e).__name__}: {e}"})
+        offer(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    # Open the device once the first item is ready, so playback starts clean
+    playout = Playout(pending, events, sample_rate)
+    first = pending.get()
+    while not events.empty():
+        yield events.get()
+    if first is None:
+        return
+    playout.start(first)
+
+    def callback(outdata, frames, time_info, status):
+        if not playout.fill(outdata[:, 0]):
+            raise sd.CallbackStop
+
+    try:
+        with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16', blocksize=blocksize,
+                             device=device, callback=callback, finished_callback=finished.set):
+            while not finished.wait(0.05):
+                while not events.empty():
+                    yield events.get()
+                if stop_event is not None and stop_event.is_set():
+                    break
+    finally:
+        finished.set()
+    while not events.empty():
+        yield events.get()
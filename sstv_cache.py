@@ -0,0 +1,111 @@
+"""
+Pigeon70 SSTV - Decode cache
+Content-addressed, size-bounded store of demodulated frames, so re-rendering
+a recording skips the file load, sync search and demodulation
+"""
+
+import hashlib
+import os
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# Bumped whenever the layout or meaning of a cached analysis changes
+CACHE_VERSION = 1
+
+# A full frame's analysis is about 1 MB, so this holds a few hundred frames
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+# Bytes hashed per read
+HASH_BLOCK = 1 << 20
+
+
+def default_directory():
+    """Per-user cache directory, under XDG_CACHE_HOME when it is set"""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'pigeon70'
+
+
+def file_digest(path):
+    """Content hash of a file, so a recording is recognised whatever its name"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def samples_digest(audio_buffer):
+    """Content hash of a sample buffer and its dtype"""
+    audio_buffer = np.ascontiguousarray(audio_buffer)
+    digest = hashlib.blake2b(audio_buffer.dtype.str.encode(), digest_size=16)
+    digest.update(audio_buffer.view(np.uint8))
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """Analyses from Pigeon70Engine.analyze_samples, one uncompressed .npz per entry
+
+    An entry is keyed by the audio's content hash plus every engine setting
+    that changes the analysis, so an edited file or a different demodulator
+    simply misses. Loading an entry marks it used; whenever a store takes the
+    directory past max_bytes, the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory) if directory else default_directory()
+        self.max_bytes = max_bytes
+
+    def key(self, sstv, digest):
+        """Entry key for audio with content hash `digest`, analysed by engine `sstv`"""
+        params = (CACHE_VERSION, digest, sstv.demod, sstv.work_dtype.name, sstv.SAMPLE_RATE,
+                  sstv.WIDTH, sstv.HEIGHT, float(sstv.line_period()))
+        return hashlib.blake2b(repr(params).encode(), digest_size=16).hexdigest()
+
+    def path(self, key):
+        return self.directory / f"{key}.npz"
+
+    def load(self, key):
+        """The cached analysis for key, or None if there is none or it cannot be read"""
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                analysis = {name: data[name] for name in data.files}
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+        return analysis
+
+    def store(self, key, analysis):
+        """Save an analysis under key, then evict down to max_bytes"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+
+        # Write aside and rename, so readers never see a partial entry
+        partial = path.with_name(f"{key}.{os.getpid()}.tmp")
+        with open(partial, 'wb') as f:
+            np.savez(f, **analysis)
+        os.replace(partial, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes; returns how many went"""
+        entries = []
+        for path in self.directory.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,135 @@
+"""
+Pigeon70 SSTV - Channel simulator
+Vectorized radio channel impairments for testing decoders without a radio
+"""
+
+import numpy as np
+from scipy import signal
+
+from sstv_dsp import TWO_PI, analytic_signal
+
+# Rate at which fading gains are generated before interpolation to audio rate;
+# far above any Doppler spread an HF channel shows
+FADING_RATE = 200.0
+
+# Scattered paths summed by the fading model
+FADING_PATHS = 16
+
+
+def awgn(audio, snr_db, rng=None, bandwidth=None, sample_rate=None):
+    """Add white Gaussian noise at the given signal-to-noise ratio
+
+    SNR is measured over the whole sample bandwidth, or over `bandwidth` Hz
+    when given (with `sample_rate`), the way receivers quote S/N in their
+    passband. `rng` is a numpy Generator or a seed.
+    """
+    rng = np.random.default_rng(rng)
+    power = np.mean(np.square(audio, dtype=np.float64))
+    sigma = np.sqrt(power / 10 ** (snr_db / 10))
+    if bandwidth is not None:
+        # White noise spreads over sample_rate / 2; scale it so `bandwidth` holds the ratio
+        sigma *= np.sqrt(sample_rate / 2 / bandwidth)
+    return (audio + rng.normal(0, sigma, len(audio))).astype(audio.dtype)
+
+
+def frequency_offset(audio, offset_hz, sample_rate):
+    """Shift every component by offset_hz, like a mistuned SSB receiver"""
+    analytic = analytic_signal(np.asarray(audio, dtype=np.float64), sample_rate)
+    analytic *= np.exp(1j * (TWO_PI * offset_hz / sample_rate) * np.arange(len(audio)))
+    return analytic.real.astype(audio.dtype)
+
+
+def clock_skew(audio, skew_ppm):
+    """Resample as if recorded by a sound card whose clock runs skew_ppm fast
+
+    A fast receiver clock takes more samples per second, so every tone lasts
+    longer in samples and sits lower in frequency. Interpolation is linear,
+    which is accurate to well under 1% for SSTV tones at audio sample rates.
+    """
+    ratio = 1 + skew_ppm * 1e-6
+    positions = np.arange(int(len(audio) * ratio)) / ratio
+    return np.interp(positions, np.arange(len(audio)), audio).astype(audio.dtype)
+
+
+def fading_gain(length, sample_rate, doppler_hz, k_factor=0.0, rng=None):
+    """Complex gain of a flat Rician fading channel, one value per sample
+
+    Sum-of-sinusoids (Clarke) model: FADING_PATHS scattered paths with random
+    arrival angles and phases, plus a steady path holding k_factor times their
+    power (k_factor=0 is Rayleigh fading). Mean power is one. Gains are made at
+    FADING_RATE and interpolated, so the cost is independent of the path count.
+    """
+    rng = np.random.default_rng(rng)
+    t = np.arange(int(np.ceil(length / sample_rate * FADING_RATE)) + 2) / FADING_RATE
+    angles = rng.uniform(0, TWO_PI, FADING_PATHS)
+    phases = rng.uniform(0, TWO_PI, FADING_PATHS)
+    scattered = np.exp(1j * (TWO_PI * doppler_hz * np.cos(angles)[:, None] * t + phases[:, None]))
+    gain = scattered.sum(axis=0) / np.sqrt(FADING_PATHS * (1 + k_factor))
+    gain += np.sqrt(k_factor / (1 + k_factor))
+
+    audio_t = np.arange(length) / sample_rate
+    return np.interp(audio_t, t, gain.real) + 1j * np.interp(audio_t, t, gain.imag)
+
+
+def fade(audio, sample_rate, doppler_hz, k_factor=0.0, rng=None):
+    """Apply flat fading: amplitude and phase wander at the Doppler spread"""
+    analytic = analytic_signal(np.asarray(audio, dtype=np.float64), sample_rate)
+    analytic *= fading_gain(len(audio), sample_rate, doppler_hz, k_factor, rng)
+    return analytic.real.astype(audio.dtype)
+
+
+def band_limit(audio, sample_rate, low=300.0, high=2700.0, order=6):
+    """Causal Butterworth band-pass, like a receiver's IF filter"""
+    sos = signal.butter(order, (low, high), btype='bandpass', fs=sample_rate, output='sos')
+    return signal.sosfilt(sos, audio).astype(audio.dtype)
+
+
+class Channel:
+    """A radio path between the encoder's output and the decoder's input
+
+    Impairments are applied in the order a real signal meets them: fading and
+    mistuning on the way, noise at the receiver, the receiver's filter, and
+    finally the sound card's clock. Anything left at None or zero is skipped.
+    """
+
+    def __init__(self, snr_db=None, offset_hz=0.0, skew_ppm=0.0, doppler_hz=0.0, k_factor=0.0,
+                 band=None):
+        self.snr_db = snr_db
+        self.offset_hz = offset_hz
+        self.skew_ppm = skew_ppm
+        self.doppler_hz = doppler_hz
+        self.k_factor = k_factor
+        self.band = band
+
+    def with_snr(self, snr_db):
+        """The same channel at another signal-to-noise ratio"""
+        return Channel(snr_db, self.offset_hz, self.skew_ppm, self.doppler_hz, self.k_factor, self.band)
+
+    def apply(self, audio, sample_rate, seed=0):
+        """Pass audio through the channel; the same seed gives the same noise and fading"""
+        fading_rng, noise_rng = (np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(2))
+        if self.doppler_hz:
+            audio = fade(audio, sample_rate, self.doppler_hz, self.k_factor, fading_rng)
+        if self.offset_hz:
+            audio = frequency_offset(audio, self.offset_hz, sample_rate)
+        if self.snr_db is not None:
+            bandwidth = self.band[1] - self.band[0] if self.band else None
+            audio = awgn(audio, self.snr_db, noise_rng, bandwidth, sample_rate)
+        if self.band:
+            audio = band_limit(audio, sample_rate, *self.band)
+        if self.skew_ppm:
+            audio = clock_skew(audio, self.skew_ppm)
+        return audio
+
+    def __repr__(self):
+        return (f"Channel(snr_db={self.snr_db}, offset_hz={self.offset_hz}, skew_ppm={self.skew_ppm}, "
+                f"doppler_hz={self.doppler_hz}, k_factor={self.k_factor}, band={self.band})")
+
+
+# Named channel conditions, before noise; combine with .with_snr()
+PRESETS = {
+    'awgn': Channel(),
+    'ssb': Channel(band=(300.0, 2700.0)),
+    'mistuned': Channel(offset_hz=25.0, skew_ppm=200.0, band=(300.0, 2700.0)),
+    'hf-fading': Channel(offset_hz=10.0, skew_ppm=100.0, doppler_hz=0.5, k_factor=1.0, band=(300.0, 2700.0)),
+}
@@ -0,0 +1,545 @@
+"""
+Pigeon70 SSTV - Shared DSP kernels
+Vectorized numpy building blocks used by the encoder and decoder
+"""
+
+import numpy as np
+
+TWO_PI = 2 * np.pi
+
+# Samples synthesized per float64 block when the output is narrower
+SYNTH_BLOCK = 1 << 16
+
+# Phase resolution of sine tables for synthesize_table; 2**18 entries keep the
+# table error below one 16-bit step
+SINE_TABLE_BITS = 18
+
+# Resampling filter: windowed-sinc zero crossings either side of the centre,
+# at the lower of the two rates, and its Kaiser window shape
+RESAMPLE_ZEROS = 10
+RESAMPLE_BETA = 5.0
+
+# Output samples computed per matrix product while resampling
+RESAMPLE_BLOCK = 1 << 15
+
+
+def frequency_track(frequencies, counts):
+    """Expand per-tone frequencies into a per-sample instantaneous-frequency track"""
+    return np.repeat(np.asarray(frequencies, dtype=np.float64), counts)
+
+
+def synthesize(track, sample_rate, phase=0.0, dtype=np.float64):
+    """Integrate a frequency track into a phase-continuous sine wave
+
+    Returns (samples, end_phase). The phase of sample n is the integral of
+    every frequency before it, so tone changes never restart the waveform and
+    consecutive calls can be chained by passing end_phase back in. Phase is
+    always accumulated in float64; only the output samples are in `dtype`,
+    and narrower outputs are built in blocks so no full-length float64
+    intermediate is allocated.
+    """
+    if np.dtype(dtype) != np.float64:
+        samples = np.empty(len(track), dtype=dtype)
+        for start in range(0, len(track), SYNTH_BLOCK):
+            samples[start:start + SYNTH_BLOCK], phase = synthesize(track[start:start + SYNTH_BLOCK],
+                                                                   sample_rate, phase)
+        return samples, phase
+
+    step = TWO_PI / sample_rate
+
+    # Running phase: sum of all previous frequencies, computed in place
+    samples = np.cumsum(track, dtype=np.float64)
+    end_phase = (phase + samples[-1] * step) % TWO_PI if len(samples) else phase
+    samples -= track
+    samples *= step
+    samples += phase
+    np.sin(samples, out=samples)
+    return samples, end_phase
+
+
+def sine_table(bits, amplitude=1.0, dtype=np.float64):
+    """One cycle of a sine wave sampled at 2**bits phases, for table synthesis"""
+    table = amplitude * np.sin(TWO_PI * np.arange(1 << bits) / (1 << bits))
+    if np.issubdtype(dtype, np.integer):
+        table = np.rint(table)
+    return table.astype(dtype)
+
+
+def synthesize_table(frequencies, counts, table, sample_rate, phase=0):
+    """Phase-continuous synthesis through a 32-bit phase accumulator and a sine table
+
+    Produces the same waveform as synthesize(frequency_track(...)) to within
+    the table's phase resolution, in the table's dtype. The accumulator wraps
+    modulo 2**32, so phase never loses precision however long the signal is.
+    Returns (samples, end_phase) like synthesize(), with the phase as an
+    accumulator value; chained calls give exactly the samples of one call.
+    """
+    bits = int(np.log2(len(table)))
+    increments = np.rint(np.asarray(frequencies, dtype=np.float64) / sample_rate * 2.0 ** 32)
+    increments = np.repeat(increments.astype(np.int64).astype(np.uint32), counts)
+
+    # Exclusive running sum from the start phase, so the first sample is at it
+    accumulator = np.cumsum(increments, dtype=np.uint32)
+    end_phase = (phase + int(accumulator[-1])) % (1 << 32) if len(accumulator) else phase
+    accumulator -= increments
+    accumulator += np.uint32(phase)
+    accumulator >>= 32 - bits
+    return table[accumulator], end_phase
+
+
+class ToneBank:
+    """Bank of least-squares sinusoid correlators for short, fixed-length windows
+
+    Each candidate frequency is fitted with a cosine/sine pair, and the fitted
+    power is normalized by the pair's Gram matrix. Unlike a plain DFT bin this
+    cancels leakage from the negative-frequency image, so the peak stays on the
+    true tone even when a window holds only one or two cycles. The basis is
+    held in `dtype`, so float32 windows are projected without upcasting.
+    """
+
+    def __init__(self, frequencies, window, sample_rate, dtype=np.float64):
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)
+        self.window = window
+        self.step = self.frequencies[1] - self.frequencies[0]
+
+        omega = TWO_PI * self.frequencies / sample_rate
+        phase = np.outer(np.arange(window), omega)
+        cos = np.cos(phase)
+        sin = np.sin(phase)
+        self.basis = np.concatenate((cos, sin), axis=1).astype(dtype)
+
+        # Inverse 2x2 Gram matrix for every candidate frequency
+        cc = np.sum(cos * cos, axis=0)
+        ss = np.sum(sin * sin, axis=0)
+        cs = np.sum(cos * sin, axis=0)
+        det = cc * ss - cs * cs
+        self.inv_cc = ss / det
+        self.inv_ss = cc / det
+        self.inv_cs = -cs / det
+
+    def power(self, windows):
+        """Fitted tone power for every (window, candidate) pair"""
+        k = len(self.frequencies)
+        proj = windows @ self.basis
+        a = proj[:, :k]
+        b = proj[:, k:]
+        return a * a * self.inv_cc + 2 * a * b * self.inv_cs + b * b * self.inv_ss
+
+    def estimate(self, windows):
+        """Estimate the dominant frequency of each row of a (N, window) array"""
+        power = self.power(windows)
+        peak = np.argmax(power, axis=1)
+
+        # Parabolic interpolation between the peak and its neighbours
+        rows = np.arange(len(power))
+        inner = np.clip(peak, 1, len(self.frequencies) - 2)
+        left = power[rows, inner - 1]
+        centre = power[rows, inner]
+        right = power[rows, inner + 1]
+        denom = left - 2 * centre + right
+        offset = np.zeros(len(power))
+        np.divide(0.5 * (left - right), denom, out=offset, where=denom < 0)
+        offset = np.where(peak == inner, np.clip(offset, -0.5, 0.5), 0.0)
+        return self.frequencies[peak] + offset * self.step
+
+
+def gather_windows(audio, starts, window):
+    """Return audio[s:s + window] for every start as a (len(starts), window) array
+
+    The windows are picked from a zero-copy strided view of the buffer, so
+    only the selected samples are copied. Starts must be in range.
+    """
+    view = np.lib.stride_tricks.sliding_window_view(audio, window)
+    return view[np.asarray(starts, dtype=np.int64)]
+
+
+def fast_length(n):
+    """Smallest length >= n whose only prime factors are 2, 3 and 5"""
+    best = 1 << max(0, (n - 1).bit_length())
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # Smallest power of two taking p35 to at least n
+            candidate = p35 << max(0, (-(-n // p35) - 1).bit_length())
+            best = min(best, candidate)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def resample_filter(up, down, zeros=RESAMPLE_ZEROS, beta=RESAMPLE_BETA):
+    """Kaiser-windowed sinc low-pass for resampling by up/down, at the upsampled rate
+
+    The cutoff is the lower of the two Nyquist frequencies and the gain is
+    one, the same design as scipy.signal.resample_poly's default.
+    """
+    rate = max(up, down)
+    half = zeros * rate
+    taps = np.arange(-half, half + 1)
+    return np.sinc(taps / rate) * np.kaiser(2 * half + 1, beta) / rate
+
+
+def resample(audio, up, down):
+    """Resample a buffer by the rational factor up/down with a polyphase filter
+
+    Equivalent to zero-stuffing by up, low-pass filtering and keeping every
+    down-th sample, but only the filter taps that meet real input samples are
+    ever applied: each output sample is one short dot product with one of
+    the filter's `up` phases. Outputs sharing a phase read evenly strided
+    input windows, so each phase is a single matrix-vector product over a
+    zero-copy window view. The output is aligned with the input (no filter
+    delay), has ceil(len * up / down) samples and keeps the input's float
+    dtype.
+    """
+    audio = np.asarray(audio)
+    if not np.issubdtype(audio.dtype, np.floating):
+        audio = audio.astype(np.float64)
+    g = np.gcd(up, down)
+    up, down = up // g, down // g
+    if up == down:
+        return audio.copy()
+
+    h = resample_filter(up, down)
+    half = len(h) // 2
+    taps = -(-len(h) // up)
+
+    # phases[p, j] = up * h[p + j * up], reversed so it lines up with an input window
+    phases = np.zeros(taps * up)
+    phases[:len(h)] = h * up
+    phases = phases.reshape(taps, up).T[:, ::-1].astype(audio.dtype)
+
+    # Output n sits at n * down + half on the filtered, upsampled axis; it
+    # reads input samples base - taps + 1 .. base through phase p
+    length = -(-len(audio) * up // down)
+    padded = np.zeros(taps - 1 + (length * down + half) // up + taps + 1, dtype=audio.dtype)
+    padded[taps - 1:taps - 1 + len(audio)] = audio
+    windows = np.lib.stride_tricks.sliding_window_view(padded, taps)
+
+    out = np.empty(length, dtype=audio.dtype)
+    for r in range(min(up, length)):
+        p, base = divmod(r * down + half, up)[::-1]
+        strided = out[r::up]
+        for start in range(0, len(strided), RESAMPLE_BLOCK):
+            stop = min(len(strided), start + RESAMPLE_BLOCK)
+            strided[start:stop] = windows[base + start * down:base + (stop - 1) * down + 1:down] @ phases[p]
+    return out
+
+
+def analytic_signal(audio, sample_rate, band=None):
+    """Analytic signal of a whole buffer via one FFT
+
+    With band=(low, high) every component outside that range is dropped as
+    well, giving a band-limited analytic signal at no extra cost. float32
+    input stays in single precision (complex64) throughout.
+    """
+    import scipy.fft
+
+    n = len(audio)
+    n_fft = fast_length(n)
+    spectrum = scipy.fft.fft(audio, n_fft)
+    freqs = np.fft.fftfreq(n_fft, 1 / sample_rate)
+
+    # Keep positive frequencies only, doubled to preserve amplitude
+    gain = np.where(freqs > 0, 2.0, 0.0)
+    gain[0] = 1.0
+    if band is not None:
+        gain[(freqs < band[0]) | (freqs > band[1])] = 0.0
+    spectrum *= gain
+    return scipy.fft.ifft(spectrum, overwrite_x=True)[:n]
+
+
+def instantaneous_frequency(analytic, sample_rate):
+    """Per-sample frequency from the phase step into each analytic sample"""
+    step = np.angle(analytic[1:] * np.conj(analytic[:-1]))
+    step *= sample_rate / TWO_PI
+    return np.concatenate((step[:1], step))
+
+
+def span_means(values, starts, ends, fill=0.0):
+    """Mean of values over [start, end) for every (start, end) pair
+
+    Uses cumulative-sum differencing, so the cost is one pass over values
+    regardless of how many spans are requested. Empty spans and spans running
+    outside the buffer get the fill value.
+    """
+    csum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    starts, ends = np.broadcast_arrays(np.asarray(starts, dtype=np.int64),
+                                       np.asarray(ends, dtype=np.int64))
+    valid = (starts >= 0) & (ends <= len(values)) & (ends > starts)
+
+    means = np.full(starts.shape, fill, dtype=np.float64)
+    means[valid] = (csum[ends[valid]] - csum[starts[valid]]) / (ends[valid] - starts[valid])
+    return means
+
+
+def peak_frequency(audio, sample_rate, low, high):
+    """Frequency of the strongest spectral peak between low and high Hz, to a small fraction of a bin"""
+    audio = np.asarray(audio, dtype=np.float64)
+    n = fast_length(4 * len(audio))
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio)), n))
+    resolution = sample_rate / n
+    first = max(1, int(np.ceil(low / resolution)))
+    last = min(len(spectrum) - 2, int(high / resolution))
+    k = first + int(np.argmax(spectrum[first:last + 1]))
+
+    # Parabolic interpolation on the log magnitude of the Hann-windowed peak
+    left, centre, right = np.log(spectrum[k - 1:k + 2] + 1e-300)
+    denom = left - 2 * centre + right
+    offset = 0.5 * (left - right) / denom if denom < 0 else 0.0
+    return (k + offset) * resolution
+
+
+def tone_correlation(audio, frequency, length, sample_rate):
+    """Matched-filter score of every window against a fixed tone
+
+    The buffer is cross-correlated once, by FFT, with a complex exponential of
+    the given frequency and length, so the result does not depend on the
+    tone's phase. Scores are normalized by the local signal energy: a clean
+    tone scores about 1.0 and unrelated audio scores near 0. Entry i covers
+    audio[i:i + length]. float32 input is transformed in single precision.
+    """
+    import scipy.fft
+
+    n = len(audio)
+    if n < length:
+        return np.zeros(0)
+    n_fft = fast_length(n + length - 1)
+    template = np.exp(-1j * TWO_PI * frequency * np.arange(length) / sample_rate)
+    spectrum = scipy.fft.fft(audio, n_fft)
+    spectrum *= np.conj(scipy.fft.fft(np.conj(template), n_fft))
+    correlation = np.abs(scipy.fft.ifft(spectrum, overwrite_x=True)[:n - length + 1])
+
+    # Energy of each window, by cumulative-sum differencing
+    csum = np.concatenate(([0.0], np.cumsum(np.square(audio, dtype=np.float64))))
+    energy = csum[length:] - csum[:-length]
+
+    score = np.zeros_like(correlation)
+    floor = 1e-12 * length
+    np.divide(correlation, np.sqrt(energy * (length / 2)), out=score, where=energy > floor)
+    return score
+
+
+def pick_peaks(score, threshold, min_distance):
+    """Local maxima of score above threshold, at least min_distance apart
+
+    Returns (indices, values) sorted by index. Each contiguous run above the
+    threshold yields its highest point; runs closer than min_distance are
+    merged, keeping the stronger peak.
+    """
+    above = np.concatenate(([False], score >= threshold, [False]))
+    edges = np.flatnonzero(above[1:] != above[:-1])
+
+    indices = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        peak = start + int(np.argmax(score[start:end]))
+        if indices and peak - indices[-1] < min_distance:
+            if score[peak] > score[indices[-1]]:
+                indices[-1] = peak
+            continue
+        indices.append(peak)
+
+    indices = np.asarray(indices, dtype=np.int64)
+    return indices, score[indices]
+
+
+class ToneEnvelope:
+    """Streaming tone envelope at one frequency (sliding Goertzel)
+
+    For every input sample, reports the tone amplitude in the window ending
+    at that sample, and its purity: the share of the window's energy that
+    belongs to the tone (about 1.0 for a clean tone, near 0 for anything
+    else). Only the last window - 1 samples are carried between chunks, so
+    memory does not depend on how much audio is processed.
+    """
+
+    def __init__(self, frequency, window, sample_rate):
+        self.window = window
+        self.omega = TWO_PI * frequency / sample_rate
+        self.reset()
+
+    def reset(self):
+        """Forget all previous audio"""
+        self.phase = 0.0
+        self.mixed_tail = np.zeros(self.window - 1, dtype=np.complex128)
+        self.energy_tail = np.zeros(self.window - 1)
+
+    def process(self, chunk):
+        """Return (purity, amplitude) of the window ending at each sample of chunk"""
+        chunk = np.asarray(chunk, dtype=np.float64)
+        n = len(chunk)
+        mixed = chunk * np.exp(-1j * (self.phase + self.omega * np.arange(n)))
+        self.phase = (self.phase + self.omega * n) % TWO_PI
+
+        # Window sums by cumulative-sum differencing over tail + chunk
+        mixed = np.concatenate((self.mixed_tail, mixed))
+        energy = np.concatenate((self.energy_tail, np.square(chunk)))
+        if self.window > 1:
+            self.mixed_tail = mixed[-(self.window - 1):]
+            self.energy_tail = energy[-(self.window - 1):]
+        mixed_sum = np.cumsum(mixed)
+        energy_sum = np.cumsum(energy)
+        mixed_sum[self.window:] -= mixed_sum[:-self.window].copy()
+        energy_sum[self.window:] -= energy_sum[:-self.window].copy()
+        magnitude = np.abs(mixed_sum[self.window - 1:])
+        energy_sum = energy_sum[self.window - 1:]
+
+        purity = np.zeros(n)
+        np.divide(magnitude ** 2, energy_sum * (self.window / 2), out=purity,
+                  where=energy_sum > 1e-12 * self.window)
+        np.minimum(purity, 1.0, out=purity)
+        return purity, magnitude * (2 / self.window)
+
+
+class LeaderDetector:
+    """Incremental detector for a steady tone of known duration (the VIS leader)
+
+    Feed audio chunks of any size to process(). Once enough of the tone has
+    been seen it returns (start, confidence): start is the fractional sample
+    index (counted from the first chunk) where the tone began, and confidence
+    is the mean purity over the tone so far. Runs of high purity find the
+    tone; its start is then placed where the tone amplitude reaches half of
+    its plateau, i.e. where the tone fills half the window, which does not
+    depend on what preceded it. Short dips caused by noise are bridged and
+    each tone is reported once.
+
+    Decisions lag the input by one window so that the amplitude on both
+    sides of an edge is always available.
+    """
+
+    def __init__(self, frequency, duration, sample_rate, window, threshold=0.2,
+                 min_fraction=0.95, max_gap=None):
+        self.envelope = ToneEnvelope(frequency, window, sample_rate)
+        self.window = window
+        self.threshold = threshold
+        self.min_samples = min_fraction * duration * sample_rate
+        self.max_gap = window // 2 if max_gap is None else max_gap
+        self.reset()
+
+    def reset(self):
+        """Return to idle, forgetting any partial tone"""
+        self.envelope.reset()
+        self.offset = 0
+        self.pending_purity = np.zeros(0)
+        self.amplitude_tail = np.zeros(self.window)
+        self.pending_amplitude = np.zeros(0)
+        self.run_active = False
+        self.run_end = 0
+        self.run_edge_region = None
+        self.run_edge_base = 0
+        self.run_purity = 0.0
+        self.run_amplitude = 0.0
+        self.run_count = 0
+        self.run_reported = False
+
+    def run_start(self):
+        """Fractional start of the current run, from its half-amplitude crossing"""
+        half = 0.5 * self.run_amplitude / self.run_count
+        region = self.run_edge_region
+        below = np.flatnonzero(region < half)
+        if len(below) == 0:
+            crossing = 0.0
+        elif below[-1] == len(region) - 1:
+            crossing = float(len(region) - 1)
+        else:
+            i = below[-1]
+            crossing = i + (half - region[i]) / (region[i + 1] - region[i])
+        # The window ending at the crossing is half filled by the tone
+        return self.run_edge_base + crossing + 1 - self.window / 2
+
+    def process(self, chunk):
+        """Consume a chunk; returns (start, confidence) when a tone is long enough, else None"""
+        purity, amplitude = self.envelope.process(chunk)
+        purity = np.concatenate((self.pending_purity, purity))
+        amplitude = np.concatenate((self.amplitude_tail, self.pending_amplitude, amplitude))
+
+        # Only examine samples with a full window of amplitude after them
+        ready = max(0, len(purity) - self.window)
+        self.pending_purity = purity[ready:]
+        self.pending_amplitude = amplitude[self.window + ready:]
+        self.amplitude_tail = amplitude[ready:self.window + ready]
+        purity = purity[:ready]
+
+        above = np.concatenate(([False], purity >= self.threshold, [False]))
+        edges = np.flatnonzero(above[1:] != above[:-1])
+        detection = None
+
+        for first, last in zip(edges[::2], edges[1::2]):
+            if not (self.run_active and self.offset + first - self.run_end <= self.max_gap):
+                # New run: keep the amplitude one window either side of its edge
+                self.run_active = True
+                self.run_edge_region = amplitude[first:first + 2 * self.window].copy()
+                self.run_edge_base = self.offset + first - self.window
+                self.run_purity = 0.0
+                self.run_amplitude = 0.0
+                self.run_count = 0
+                self.run_reported = False
+            self.run_end = self.offset + last
+            self.run_purity += float(np.sum(purity[first:last]))
+            self.run_amplitude += float(np.sum(amplitude[self.window + first:self.window + last]))
+            self.run_count += last - first
+
+            if self.run_reported or detection is not None:
+                continue
+            start = self.run_start()
+            if self.run_end - start - self.window / 2 >= self.min_samples:
+                self.run_reported = True
+                detection = (start, self.run_purity / self.run_count)
+
+        self.offset += ready
+        return detection
+
+
+def fit_line_clock(sync_indices, anchor, nominal_period, lines, tolerance, max_skew=0.02):
+    """Fit sync position = first + line * period to detected sync pulses
+
+    Sync pulses are numbered by a grid search over the clock skew (up to
+    max_skew either way) and over a few candidate positions for line 0 near
+    the anchor, keeping the combination that explains the most pulses within
+    tolerance samples. The inliers are then fitted by least squares, which
+    averages out per-pulse jitter and measures the TX/RX sample-clock ratio.
+
+    Returns (first, period, inliers), inliers being a boolean mask over
+    sync_indices. With fewer than two usable pulses the nominal clock
+    anchored at anchor is returned.
+    """
+    all_syncs = np.asarray(sync_indices, dtype=np.float64)
+    inliers = np.zeros(len(all_syncs), dtype=bool)
+
+    # Only pulses that can belong to this frame take part
+    span = (lines - 0.5) * nominal_period * (1 + max_skew)
+    in_frame = (all_syncs >= anchor - nominal_period / 2) & (all_syncs <= anchor + span)
+    syncs = all_syncs[in_frame]
+    if len(syncs) < 2:
+        return float(anchor), float(nominal_period), inliers
+
+    # Candidate positions for line 0: the anchor and pulses within half a line of it
+    near = syncs[np.abs(syncs - anchor) <= nominal_period / 2][:3]
+    anchors = np.concatenate(([anchor], near))
+
+    # Skew step small enough that the last line drifts less than the tolerance
+    steps = max(1, int(np.ceil(max_skew * nominal_period * lines / tolerance)))
+    periods = nominal_period * (1 + np.linspace(-max_skew, max_skew, 2 * steps + 1))
+
+    offsets = syncs[None, None, :] - anchors[:, None, None]
+    numbers = np.rint(offsets / periods[None, :, None])
+    residual = np.abs(offsets - numbers * periods[None, :, None])
+    matched = (residual <= tolerance) & (numbers >= 0) & (numbers < lines)
+    counts = matched.sum(axis=2)
+    best_anchor, best_period = np.unravel_index(np.argmax(counts), counts.shape)
+    if counts[best_anchor, best_period] < 2:
+        return float(anchor), float(nominal_period), inliers
+
+    # Least-squares fit on the matched pulses, refined once
+    used = matched[best_anchor, best_period]
+    numbers = numbers[best_anchor, best_period]
+    for _ in range(2):
+        period, first = np.polyfit(numbers[used], syncs[used], 1)
+        residual = np.abs(syncs - first - numbers * period)
+        refined = (residual <= tolerance) & (numbers >= 0) & (numbers < lines)
+        if refined.sum() < 2:
+            break
+        used = refined
+
+    inliers[np.flatnonzero(in_frame)[used]] = True
+    return float(first), float(period), inliers
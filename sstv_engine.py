@@ -0,0 +1,526 @@
+"""
+Pigeon70 SSTV - Core engine
+Mode timing, encoder and decoder shared by the command line and desktop apps
+
+Only numpy and Pillow are imported up front. soundfile, scipy, numba and
+the worker pools are imported when first needed, so tools that build on the
+engine start quickly and never load what they do not use.
+"""
+
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from sstv_dsp import (SINE_TABLE_BITS, LeaderDetector, ToneBank, analytic_signal, fit_line_clock,
+                      frequency_track, gather_windows, instantaneous_frequency, resample, sine_table,
+                      synthesize, synthesize_table)
+from sstv_kernels import kernel_set
+from sstv_stats import NULL_STATS
+
+# Pixel demodulators: correlator bank per tone, or whole-buffer FM discriminator
+DEMOD_MODES = ('bank', 'fm')
+SAMPLE_DTYPES = ('float32', 'float64', 'int16')
+POOL_KINDS = ('thread', 'process')
+
+# Lines in a Pigeon70 frame; partial decodes are bounded by it
+FRAME_LINES = 240
+
+# Default engine rate. Any rate with its Nyquist frequency above the pixel
+# band works; 11025 Hz decodes about four times faster with --demod fm
+SAMPLE_RATE = 44100
+
+# Extra samples around a range of lines demodulated on its own, so the FM
+# discriminator's band-pass settles before the first pixel and after the last
+MARGIN_SAMPLES = 4096
+
+# Lines demodulated per block when a decode reports rows or can be
+# cancelled; about 30 ms of work per block
+BLOCK_LINES = 16
+
+
+def line_ranges(lines, jobs):
+    """Split `lines` into up to `jobs` contiguous, nearly equal (start, end) ranges"""
+    bounds = np.linspace(0, lines, min(jobs, lines) + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def demodulate_range(sstv, audio_buffer, sync_positions, scale, start, end):
+    """Pixel frequencies of lines [start, end), demodulated from just the audio they span"""
+    period = sstv.line_period() * scale
+    lo = max(0, int(np.floor(sync_positions[start])) - MARGIN_SAMPLES)
+    hi = min(len(audio_buffer), int(np.ceil(sync_positions[end - 1] + period)) + MARGIN_SAMPLES)
+    return sstv.demodulate_lines(audio_buffer[lo:hi], np.asarray(sync_positions[start:end]) - lo, scale)
+
+
+class Pigeon70Engine:
+    """Pigeon70 encoder and decoder working on sample arrays
+
+    Front ends subclass it to add their own file, sound card and progress
+    handling; batch and parallel workers use it as is.
+    """
+
+    def __init__(self, demod='bank', jobs=1, pool='thread', dtype='float32', stats=None,
+                 sample_rate=SAMPLE_RATE, kernels='auto'):
+        if demod not in DEMOD_MODES:
+            raise ValueError(f"Unknown demodulator '{demod}', expected one of {DEMOD_MODES}")
+        if dtype not in SAMPLE_DTYPES:
+            raise ValueError(f"Unknown sample dtype '{dtype}', expected one of {SAMPLE_DTYPES}")
+        if pool not in POOL_KINDS:
+            raise ValueError(f"Unknown pool '{pool}', expected one of {POOL_KINDS}")
+
+        # Pigeon70 specifications
+        self.WIDTH = 320
+        self.HEIGHT = FRAME_LINES
+        self.SAMPLE_RATE = int(sample_rate)
+
+        # Frequency mapping
+        self.FREQ_VIS = 1900      # VIS code frequency
+        self.FREQ_SYNC = 1200     # Sync pulse frequency
+        self.FREQ_SEPARATOR = 1500 # Separator pulse frequency
+        self.FREQ_MIN = 1500      # Minimum pixel frequency
+        self.FREQ_MAX = 2300      # Maximum pixel frequency
+
+        # Timing specifications
+        self.DURATION_VIS = 0.3        # VIS code duration (300ms)
+        self.DURATION_SYNC = 0.01      # Sync pulse duration (10ms)
+        self.DURATION_SEPARATOR = 0.01 # Separator pulse duration (10ms)
+        self.DURATION_PIXEL = (0.295 - 0.02) / 960  # Pixel tone duration
+
+        if self.SAMPLE_RATE <= 2 * self.FREQ_MAX:
+            raise ValueError(f"Sample rate {self.SAMPLE_RATE} Hz is too low for tones up to {self.FREQ_MAX} Hz")
+
+        # Tone boundaries in samples, derived once per sample rate
+        self._timing = {}
+
+        # Audio settings
+        self.audio_device = None
+        self.is_transmitting = False
+        self.is_receiving = False
+
+        # Pixel demodulator and its precomputed tables, keyed by window length and rate
+        self.demod = demod
+        self._tone_banks = {}
+
+        # Workers for intra-frame parallel line decoding (1 decodes inline)
+        self.jobs = jobs
+        self.pool = pool
+
+        # Sample format: encoded audio is produced in `dtype`; decoding works in
+        # float32 unless float64 is asked for (int16 is for storage and transport)
+        self.dtype = np.dtype(dtype)
+        self.work_dtype = np.dtype(np.float64 if dtype == 'float64' else np.float32)
+        self._sine_table = None
+
+        # Sync correlation, peak picking and span averaging: numba-compiled
+        # loops when numba is installed (or asked for), else the numpy versions
+        self.kernels = kernel_set(kernels)
+
+        # Instrumentation; disabled unless a Stats collector is given
+        self.stats = stats if stats is not None else NULL_STATS
+
+    def at_rate(self, sample_rate):
+        """An engine with the same settings working at another sample rate (self if it already is)"""
+        if sample_rate == self.SAMPLE_RATE:
+            return self
+        return type(self)(self.demod, self.jobs, self.pool, self.dtype.name, self.stats, sample_rate,
+                          self.kernels.mode)
+
+    def pixel_to_frequency(self, pixel_value):
+        """Convert pixel value (0-255) to frequency (1500-2300 Hz)"""
+        return self.FREQ_MIN + (pixel_value / 255) * (self.FREQ_MAX - self.FREQ_MIN)
+
+    def frequency_to_pixel(self, frequency):
+        """Convert frequency (1500-2300 Hz) to pixel value (0-255), for scalars or arrays"""
+        scaled = (np.asarray(frequency, dtype=np.float64) - self.FREQ_MIN) / (self.FREQ_MAX - self.FREQ_MIN) * 255
+        pixels = np.clip(scaled, 0, 255).astype(np.uint8)
+        return int(pixels) if pixels.ndim == 0 else pixels
+
+    def generate_tone(self, frequency, duration):
+        """Generate a sine wave tone"""
+        samples = int(duration * self.SAMPLE_RATE)
+        t = np.linspace(0, duration, samples, False)
+        return np.sin(2 * np.pi * frequency * t)
+
+    def _timing_table(self, name, build):
+        """Read-only timing table `name` at the engine's sample rate, built on first use"""
+        key = (name, self.SAMPLE_RATE)
+        if key not in self._timing:
+            table = build()
+            table.flags.writeable = False
+            self._timing[key] = table
+        return self._timing[key]
+
+    def line_offsets(self):
+        """Exact tone boundaries within a line, in samples from the start of its sync pulse"""
+        def build():
+            sync = self.DURATION_SYNC * self.SAMPLE_RATE
+            separator = self.DURATION_SEPARATOR * self.SAMPLE_RATE
+            pixel = self.DURATION_PIXEL * self.SAMPLE_RATE
+            return np.concatenate(([0.0, sync], sync + separator + np.arange(self.WIDTH * 3 + 1) * pixel))
+        return self._timing_table('line_offsets', build)
+
+    def line_period(self):
+        """Exact line duration in samples"""
+        return self.line_offsets()[-1]
+
+    def frame_duration(self):
+        """Nominal frame duration in seconds, VIS leader included"""
+        line_time = self.DURATION_SYNC + self.DURATION_SEPARATOR + (960 * self.DURATION_PIXEL)
+        return self.DURATION_VIS + (self.HEIGHT * line_time)
+
+    def tone_counts(self):
+        """Sample count of every tone in a frame, in transmit order; the same for every image"""
+        # Tone boundaries follow an exact fractional-sample clock, rounded to the
+        # nearest sample, so pixel tones alternate between 12 and 13 samples at
+        # 44.1 kHz and lines never drift
+        def build():
+            offsets = self.line_offsets()
+            vis_end = self.DURATION_VIS * self.SAMPLE_RATE
+            line_bounds = vis_end + np.arange(self.HEIGHT)[:, None] * offsets[-1] + offsets[:-1]
+            frame_end = vis_end + self.HEIGHT * offsets[-1]
+            boundaries = np.concatenate(([0.0], line_bounds.ravel(), [frame_end]))
+            return np.diff(np.rint(boundaries).astype(np.int64))
+        return self._timing_table('tone_counts', build)
+
+    def tone_frequencies(self, img_array):
+        """Frequency of every tone in a frame, in transmit order"""
+        # One row per line: sync, separator, then R, G, B for each pixel
+        pixels = img_array.reshape(self.HEIGHT, self.WIDTH * 3).astype(np.float64)
+        line_freqs = np.empty((self.HEIGHT, 2 + self.WIDTH * 3))
+        line_freqs[:, 0] = self.FREQ_SYNC
+        line_freqs[:, 1] = self.FREQ_SEPARATOR
+        line_freqs[:, 2:] = self.pixel_to_frequency(pixels)
+        return np.concatenate(([self.FREQ_VIS], line_freqs.ravel()))
+
+    def frame_tones(self, img_array):
+        """Return (frequencies, sample counts) of every tone in a frame, in transmit order"""
+        return self.tone_frequencies(img_array), self.tone_counts()
+
+    def prepare_image(self, image_input):
+        """Load (from a path or PIL Image) and resize an image to a (HEIGHT, WIDTH, 3) array"""
+        img = Image.open(image_input) if isinstance(image_input, (str, Path)) else image_input
+        img = img.convert('RGB').resize((self.WIDTH, self.HEIGHT))
+        return np.array(img)
+
+    def int16_sine_table(self):
+        """Sine table for synthesizing 16-bit samples, peaking at 0.8 of full scale; built on first use"""
+        if self._sine_table is None:
+            self._sine_table = sine_table(SINE_TABLE_BITS, 0.8 * 32767, np.int16)
+        return self._sine_table
+
+    def synthesize_frame(self, img_array):
+        """Synthesize a whole frame in the engine's dtype, peaking at 0.8 of full scale"""
+        frequencies, counts = self.frame_tones(img_array)
+        with self.stats.timer('synthesize'):
+            if self.dtype == np.int16:
+                # Straight to 16-bit samples through a phase accumulator and sine table
+                samples, _ = synthesize_table(frequencies, counts, self.int16_sine_table(), self.SAMPLE_RATE)
+                return samples
+
+            # Build the whole frame as one frequency track and synthesize it in a single pass
+            track = frequency_track(frequencies, counts)
+            audio_buffer, _ = synthesize(track, self.SAMPLE_RATE, dtype=self.dtype)
+            del track
+
+            # Normalize in place
+            peak = max(float(audio_buffer.max()), -float(audio_buffer.min()))
+            audio_buffer *= 0.8 / peak
+            return audio_buffer
+
+    def encode_frame(self, img_array):
+        """Synthesize a frame padded to its nominal duration"""
+        audio_buffer = self.synthesize_frame(img_array)
+        total_samples = int(round(self.frame_duration() * self.SAMPLE_RATE))
+        if len(audio_buffer) < total_samples:
+            audio_buffer = np.pad(audio_buffer, (0, total_samples - len(audio_buffer)))
+        return audio_buffer
+
+    def resample(self, audio_buffer, sample_rate):
+        """Convert samples recorded at sample_rate to the engine's rate; returned as is if they match"""
+        if sample_rate == self.SAMPLE_RATE:
+            return audio_buffer
+        ratio = Fraction(self.SAMPLE_RATE, int(sample_rate))
+        with self.stats.timer('resample'):
+            return resample(audio_buffer, ratio.numerator, ratio.denominator)
+
+    def load_audio(self, audio_path):
+        """Read a sound file in the decoder's working dtype, first channel only, at the engine's rate
+
+        Returns (samples, sample_rate) where sample_rate is the file's own
+        rate; recordings at any other rate are resampled on loading.
+        """
+        import soundfile as sf
+        audio_buffer, sample_rate = sf.read(audio_path, dtype=self.work_dtype.name, always_2d=True)
+        return self.resample(audio_buffer[:, 0], sample_rate), sample_rate
+
+    def detect_frequency(self, audio_segment):
+        """Detect dominant frequency in audio segment using FFT"""
+        # Use FFT for frequency detection
+        fft = np.fft.fft(audio_segment)
+        freqs = np.fft.fftfreq(len(audio_segment), 1/self.SAMPLE_RATE)
+
+        # Find peak in relevant frequency range
+        mask = (freqs >= 1000) & (freqs <= 2500)
+        if not np.any(mask):
+            return 1500  # Default frequency
+        peak_idx = np.argmax(np.abs(fft[mask]))
+        return freqs[mask][peak_idx]
+
+    def tone_bank(self, window):
+        """Return the pixel tone estimator for a given window length (cached)"""
+        key = (window, self.SAMPLE_RATE)
+        if key not in self._tone_banks:
+            candidates = np.arange(self.FREQ_MIN - 100, self.FREQ_MAX + 101, 10.0)
+            self._tone_banks[key] = ToneBank(candidates, window, self.SAMPLE_RATE, self.work_dtype)
+        return self._tone_banks[key]
+
+    def tone_spans(self, sync_positions, scale=1.0):
+        """Fractional (starts, ends) of every pixel tone, one row per line"""
+        offsets = self.line_offsets()[2:] * scale
+        bounds = np.asarray(sync_positions, dtype=np.float64)[:, None] + offsets
+        return bounds[:, :-1], bounds[:, 1:]
+
+    def demodulate_lines(self, audio_buffer, sync_positions, scale=1.0):
+        """Estimate every pixel tone frequency; returns a (lines, WIDTH * 3) matrix
+
+        sync_positions are the (fractional) sync starts of each line and scale
+        the ratio of the received line period to the nominal one.
+        """
+        if self.demod == 'fm':
+            frequencies = self.demodulate_lines_fm(audio_buffer, sync_positions, scale)
+        else:
+            frequencies = self.demodulate_lines_bank(audio_buffer, sync_positions, scale)
+        if self.stats.enabled:
+            out_of_range = (frequencies < self.FREQ_MIN) | (frequencies > self.FREQ_MAX)
+            self.stats.count('frequencies_out_of_range', np.count_nonzero(out_of_range))
+        return frequencies
+
+    def demodulate_lines_bank(self, audio_buffer, sync_positions, scale=1.0):
+        """Pixel tones from the correlator bank, one batched estimate per line"""
+        window = int(self.DURATION_PIXEL * self.SAMPLE_RATE * scale)
+        bank = self.tone_bank(window)
+        starts, ends = self.tone_spans(sync_positions, scale)
+
+        # Centre a whole-sample window on each fractional tone span
+        window_starts = np.rint((starts + ends - window) / 2).astype(np.int64)
+        valid = (window_starts >= 0) & (window_starts + window <= len(audio_buffer))
+
+        # Tones missing at the end of the recording decode as black
+        frequencies = np.full(starts.shape, float(self.FREQ_MIN))
+        for y in range(len(starts)):
+            line_valid = valid[y]
+            if np.any(line_valid):
+                windows = gather_windows(audio_buffer, window_starts[y, line_valid], window)
+                frequencies[y, line_valid] = bank.estimate(windows)
+        return frequencies
+
+    def demodulate_lines_fm(self, audio_buffer, sync_positions, scale=1.0):
+        """Pixel tones from a whole-buffer FM discriminator, averaged per pixel span"""
+        # One analytic signal for the whole recording; the band is kept wide
+        # because 12-sample tones spread the signal well past 1500-2300 Hz
+        band = (self.FREQ_SYNC - 1000, self.FREQ_MAX + 4000)
+        analytic = analytic_signal(audio_buffer, self.SAMPLE_RATE, band)
+        inst_freq = instantaneous_frequency(analytic, self.SAMPLE_RATE)
+
+        # Average the inner part of each pixel span, skipping tone transitions
+        starts, ends = self.tone_spans(sync_positions, scale)
+        guard = (ends - starts) / 6
+        return self.kernels.span_means(inst_freq, np.rint(starts + guard), np.rint(ends - guard),
+                                       fill=float(self.FREQ_MIN))
+
+    def vis_detector(self):
+        """Return a fresh incremental VIS leader detector, for files or live audio"""
+        window = int(self.DURATION_SYNC * self.SAMPLE_RATE)
+        return LeaderDetector(self.FREQ_VIS, self.DURATION_VIS, self.SAMPLE_RATE, window)
+
+    def detect_vis(self, audio_buffer):
+        """Find the VIS leader in the first 2 seconds; returns (index, confidence)"""
+        vis_samples = int(self.DURATION_VIS * self.SAMPLE_RATE)
+        search = audio_buffer[:int(2 * self.SAMPLE_RATE) + vis_samples]
+
+        # One streaming pass over the search region; the detector lags by a window
+        detector = self.vis_detector()
+        detection = detector.process(search)
+        if detection is None:
+            detection = detector.process(np.zeros(detector.window))
+        if detection is None:
+            return -1, 0.0
+
+        start, confidence = detection
+        return max(0, int(round(start))), confidence
+
+    def find_vis_code(self, audio_buffer):
+        """Find VIS code in audio buffer"""
+        index, _ = self.detect_vis(audio_buffer)
+        return index
+
+    def build_sync_index(self, audio_buffer, threshold=0.5):
+        """Locate every sync pulse in one matched-filter pass; returns (indices, scores)"""
+        sync_samples = int(self.DURATION_SYNC * self.SAMPLE_RATE)
+        score = self.kernels.tone_correlation(audio_buffer, self.FREQ_SYNC, sync_samples, self.SAMPLE_RATE)
+
+        # Sync pulses are a full line apart, so anything closer is the same pulse
+        return self.kernels.pick_peaks(score, threshold, int(self.line_period() / 2))
+
+    def fit_timing(self, sync_indices, start_index):
+        """Fit the line clock to indexed sync pulses; returns (first sync, line period, pulses used)"""
+        tolerance = 0.002 * self.SAMPLE_RATE
+        first, period, inliers = fit_line_clock(sync_indices, start_index, self.line_period(),
+                                                self.HEIGHT, tolerance)
+        if self.stats.enabled and np.any(inliers):
+            # Distance of each matched pulse from the fitted clock
+            syncs = np.asarray(sync_indices, dtype=np.float64)[inliers]
+            jitter = syncs - first - np.rint((syncs - first) / period) * period
+            self.stats.observe('sync_jitter_samples', jitter)
+        return first, period, int(np.sum(inliers))
+
+    def find_sync_pulse(self, audio_buffer, start_index, tolerance=100):
+        """Find sync pulse in audio buffer"""
+        sync_samples = int(self.DURATION_SYNC * self.SAMPLE_RATE)
+        search_range = int(0.3 * self.SAMPLE_RATE)  # 300ms search window
+
+        for i in range(start_index, min(start_index + search_range, len(audio_buffer) - sync_samples), int(0.001 * self.SAMPLE_RATE)):  # 1ms steps
+            segment = audio_buffer[i:i + sync_samples]
+            frequency = self.detect_frequency(segment)
+
+            if abs(frequency - self.FREQ_SYNC) < tolerance:
+                return i
+
+        return -1
+
+    def analyze_samples(self, audio_buffer, progress_callback=None, rows_callback=None, cancel=None,
+                        lines=None):
+        """Locate one frame in a sample buffer and demodulate its pixel frequencies
+
+        Returns the analysis as a dict of arrays, ready for render_frame or for
+        saving with np.savez: 'frequencies' (float32, one row of WIDTH * 3 per
+        line), 'lines' ([start, end) of those rows), 'timing' (first sync and
+        line period), 'vis' (index and confidence), 'sync_indices' and
+        'sync_used'. lines=(start, end) demodulates just that range; the VIS
+        search and line clock still cover the whole frame.
+
+        progress_callback(percent, message) follows the decode stages. With
+        rows_callback or a cancel token (sstv_jobs.CancelToken), lines are
+        demodulated BLOCK_LINES at a time: rows_callback(start, rows) gets each
+        block of (n, WIDTH, 3) pixels as soon as it is ready, and the token is
+        checked between stages and blocks.
+        """
+        report = progress_callback or (lambda progress, message: None)
+        check = cancel.check if cancel is not None else (lambda: None)
+        first_line, last_line = lines if lines is not None else (0, self.HEIGHT)
+        if not 0 <= first_line < last_line <= self.HEIGHT:
+            raise ValueError(f"Lines {first_line}-{last_line} are outside the frame (0-{self.HEIGHT})")
+
+        # Find VIS code
+        report(0, "Searching for VIS code...")
+        with self.stats.timer('vis_search'):
+            vis_index, vis_confidence = self.detect_vis(audio_buffer)
+        if vis_index == -1:
+            report(0, "No VIS code found, starting from first sync pulse")
+            start_index = 0
+        else:
+            start_index = vis_index + int(self.DURATION_VIS * self.SAMPLE_RATE)
+            report(5, f"VIS code found at {vis_index/self.SAMPLE_RATE:.2f}s")
+        check()
+
+        # Index every sync pulse and fit the line clock to them
+        report(5, "Indexing sync pulses...")
+        with self.stats.timer('sync_index'):
+            sync_indices, _ = self.build_sync_index(audio_buffer)
+        if vis_index == -1 and len(sync_indices):
+            # No VIS: fall back to anchoring the frame at the first sync pulse
+            self.stats.count('vis_fallbacks')
+            start_index = int(sync_indices[0])
+        check()
+        with self.stats.timer('line_clock'):
+            first_sync, period, used = self.fit_timing(sync_indices, start_index)
+        skew_ppm = float(period / self.line_period() - 1) * 1e6
+        report(15, f"Line clock fitted to {used} sync pulses (skew {skew_ppm:+.0f} ppm)")
+
+        # Decode the requested lines directly from the fitted clock
+        report(20, "Demodulating pixels...")
+        sync_positions = first_sync + np.arange(first_line, last_line) * period
+        scale = period / self.line_period()
+        count = last_line - first_line
+        if self.jobs > 1:
+            # Lines are independent once the clock is known; spread them over a pool
+            from sstv_parallel import demodulate_parallel
+            with self.stats.timer('demod'):
+                frequencies = demodulate_parallel(self, audio_buffer, sync_positions, scale, self.jobs, self.pool)
+        else:
+            if rows_callback is None and cancel is None:
+                ranges = [(0, count)]
+            else:
+                ranges = line_ranges(count, -(-count // BLOCK_LINES))
+            frequencies = np.empty((count, self.WIDTH * 3), dtype=np.float32)
+            for start, end in ranges:
+                check()
+                with self.stats.timer('demod'):
+                    if len(ranges) == 1:
+                        frequencies[:] = self.demodulate_lines(audio_buffer, sync_positions, scale)
+                    else:
+                        frequencies[start:end] = demodulate_range(self, audio_buffer, sync_positions, scale,
+                                                                  start, end)
+                if rows_callback is not None:
+                    pixels = self.frequency_to_pixel(frequencies[start:end]).reshape(-1, self.WIDTH, 3)
+                    rows_callback(first_line + start, pixels)
+                if end < count:
+                    report(20 + 80 * end / count, f"Demodulated line {first_line + end}/{self.HEIGHT}")
+
+        # Lines without a matched pulse are placed by the fitted clock alone
+        self.stats.count('frames')
+        self.stats.count('sync_pulses', used)
+        self.stats.count('sync_misses', self.HEIGHT - used)
+        report(100, "Decoding complete!")
+
+        return {
+            'frequencies': frequencies,
+            'lines': np.array([first_line, last_line]),
+            'timing': np.array([first_sync, period], dtype=np.float64),
+            'vis': np.array([vis_index, vis_confidence], dtype=np.float64),
+            'sync_indices': np.asarray(sync_indices, dtype=np.int64),
+            'sync_used': np.array(used),
+        }
+
+    def render_frame(self, analysis, lines=None):
+        """Map an analysis from analyze_samples to pixels; returns the image and decode statistics
+
+        lines=(start, end) renders just that range, which must lie within the
+        lines the analysis holds.
+        """
+        held_first, held_last = (int(n) for n in analysis['lines'])
+        first_line, last_line = lines if lines is not None else (held_first, held_last)
+        if not held_first <= first_line < last_line <= held_last:
+            raise ValueError(f"Lines {first_line}-{last_line} were not demodulated "
+                             f"(have {held_first}-{held_last})")
+
+        frequencies = analysis['frequencies'][first_line - held_first:last_line - held_first]
+        image_data = self.frequency_to_pixel(frequencies).reshape(-1, self.WIDTH, 3)
+
+        vis_index, vis_confidence = analysis['vis']
+        period = float(analysis['timing'][1])
+        used = int(analysis['sync_used'])
+        info = {
+            'vis_found': bool(vis_index != -1),
+            'vis_index': int(vis_index),
+            'vis_confidence': round(float(vis_confidence), 3),
+            'sync_pulses': int(len(analysis['sync_indices'])),
+            'sync_used': used,
+            'sync_hit_rate': round(used / self.HEIGHT, 3),
+            'skew_ppm': round((period / self.line_period() - 1) * 1e6, 1),
+        }
+        if (first_line, last_line) != (0, self.HEIGHT):
+            info['lines'] = [first_line, last_line]
+        return Image.fromarray(image_data), info
+
+    def decode_samples(self, audio_buffer, progress_callback=None, rows_callback=None, cancel=None,
+                       lines=None):
+        """Decode one frame from a sample buffer, returning the image and decode statistics
+
+        Takes the same hooks as analyze_samples. lines=(start, end) decodes
+        just those lines into an image (end - start) rows high.
+        """
+        analysis = self.analyze_samples(audio_buffer, progress_callback, rows_callback, cancel, lines)
+        return self.render_frame(analysis)
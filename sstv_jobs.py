@@ -0,0 +1,210 @@
+"""
+Pigeon70 SSTV - Background jobs
+Bounded, prioritized worker pool with cancellation and per-job status
+"""
+
+import heapq
+import itertools
+import threading
+
+# Lower runs first: live audio must not wait behind file work
+PRIORITY_LIVE = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 2
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its cancellation token is set"""
+
+
+class CancelToken(threading.Event):
+    """Cancellation flag shared by a job and the code it runs
+
+    Being an Event, a token can be passed anywhere a stop_event is accepted,
+    such as receive_stream and transmit_stream.
+    """
+
+    def cancel(self):
+        self.set()
+
+    @property
+    def cancelled(self):
+        return self.is_set()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self.is_set():
+            raise JobCancelled()
+
+
+class Job:
+    """One unit of background work and its current status
+
+    fn(job) runs on a worker thread; it reads job.token to stop early and
+    calls job.report(progress, message) to publish progress.
+    """
+
+    def __init__(self, job_id, name, fn, priority, key, group, manager):
+        self.id = job_id
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.key = key
+        self.group = group
+        self.token = CancelToken()
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.finished = threading.Event()
+        self._manager = manager
+
+    def report(self, progress, message):
+        """Publish progress (a percentage, or None to keep the last one) and a status message"""
+        if progress is not None:
+            self.progress = progress
+        self.message = message
+        self._manager._publish(self)
+
+    def cancel(self):
+        self._manager.cancel(self.id)
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout"""
+        return self.finished.wait(timeout)
+
+    def snapshot(self):
+        """Current status as a structured event"""
+        event = {'type': 'job', 'id': self.id, 'name': self.name, 'status': self.status,
+                 'priority': self.priority, 'progress': self.progress, 'message': self.message}
+        if self.status == 'done':
+            event['result'] = self.result
+        elif self.status == 'failed':
+            event['error'] = self.error
+        return event
+
+
+class JobManager:
+    """Runs jobs on a fixed number of worker threads, highest priority first
+
+    Submitting a job whose key matches an unfinished job returns that job
+    instead of queueing a duplicate. Submitting into a group cancels the
+    group's earlier jobs, so only the latest request of its kind survives.
+    Every status change is published to subscribers as a snapshot event,
+    from whichever thread made it.
+    """
+
+    def __init__(self, workers=2):
+        self.condition = threading.Condition()
+        self.queue = []
+        self.active = {}
+        self.listeners = []
+        self.closed = False
+        self._ids = itertools.count(1)
+        self.threads = [threading.Thread(target=self._work, name=f"sstv-job-{n}", daemon=True)
+                        for n in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def subscribe(self, callback):
+        """Call callback(event) for every job status change"""
+        self.listeners.append(callback)
+
+    def submit(self, name, fn, priority=PRIORITY_INTERACTIVE, key=None, group=None):
+        """Queue fn(job) to run in the background; returns its Job"""
+        superseded = []
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Job manager has been shut down")
+            if key is not None:
+                for job in self.active.values():
+                    if job.key == key and not job.token.cancelled:
+                        return job
+            if group is not None:
+                superseded = [job for job in self.active.values() if job.group == group]
+            job = Job(next(self._ids), name, fn, priority, key, group, self)
+            self.active[job.id] = job
+            heapq.heappush(self.queue, (priority, job.id, job))
+            self.condition.notify()
+        for old in superseded:
+            self.cancel(old.id)
+        self._publish(job)
+        return job
+
+    def cancel(self, job_id=None):
+        """Cancel one job, or every unfinished job when job_id is None
+
+        A queued job finishes as cancelled at once; a running job is told to
+        stop and finishes when its code next checks the token.
+        """
+        with self.condition:
+            jobs = list(self.active.values()) if job_id is None else [self.active.get(job_id)]
+            dropped = []
+            for job in jobs:
+                if job is None:
+                    continue
+                job.token.cancel()
+                if job.status == 'queued':
+                    self._mark_finished(job, 'cancelled')
+                    dropped.append(job)
+        for job in dropped:
+            self._publish(job)
+
+    def jobs(self):
+        """Snapshots of every unfinished job, in submission order"""
+        with self.condition:
+            return [job.snapshot() for job in sorted(self.active.values(), key=lambda job: job.id)]
+
+    def shutdown(self, cancel=True, wait=True):
+        """Stop accepting jobs, optionally cancel the unfinished ones, and let the workers exit"""
+        if cancel:
+            self.cancel()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                _, _, job = heapq.heappop(self.queue)
+                if job.status != 'queued':
+                    # Cancelled while waiting
+                    continue
+                job.status = 'running'
+            self._publish(job)
+
+            try:
+                job.result = job.fn(job)
+                status = 'cancelled' if job.token.cancelled else 'done'
+            except JobCancelled:
+                status = 'cancelled'
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                status = 'failed'
+            self._finish(job, status)
+
+    def _mark_finished(self, job, status):
+        # Caller holds the condition
+        job.status = status
+        self.active.pop(job.id, None)
+        job.finished.set()
+
+    def _finish(self, job, status):
+        with self.condition:
+            self._mark_finished(job, status)
+        self._publish(job)
+
+    def _publish(self, job):
+        event = job.snapshot()
+        for callback in self.listeners:
+            callback(event)
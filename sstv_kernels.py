@@ -0,0 +1,182 @@
+"""
+Pigeon70 SSTV - Compiled decoder kernels
+Loop versions of the decoder hot spots, compiled with numba when it is installed
+
+The numpy versions in sstv_dsp stay the reference and the fallback. Each
+kernel here computes the same result in one pass, without their full-length
+temporaries: the sync correlation as a sliding single-bin DFT instead of
+three FFTs the size of the recording, peak picking without a mask of the
+whole score, and pixel span means without a cumulative sum of the whole
+buffer. numba is imported, and the kernels compiled or loaded from its
+on-disk cache, the first time one of them runs.
+"""
+
+import importlib.util
+import math
+import sys
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+import sstv_dsp
+
+KERNEL_MODES = ('auto', 'numpy', 'numba')
+
+# Windows between exact recomputations of the sliding DFT, so rounding in the
+# running sums cannot build up over a long recording
+TONE_REFRESH = 1 << 16
+
+
+def sliding_tone_score(audio, omega, length, refresh, score):
+    """Fill score with the normalized tone correlation of every window of audio
+
+    score[i] covers audio[i:i + length], as in sstv_dsp.tone_correlation. The
+    tone sum and the window energy are updated by one sample in and one out
+    per step, with the tone phasors advanced by rotation, and recomputed
+    directly every `refresh` windows.
+    """
+    rotate_re = math.cos(omega)
+    rotate_im = -math.sin(omega)
+    floor = 1e-12 * length
+    tone_re = tone_im = energy = 0.0
+    in_re = in_im = out_re = out_im = 0.0
+    for i in range(len(score)):
+        if i % refresh == 0:
+            tone_re = tone_im = energy = 0.0
+            for k in range(length):
+                x = float(audio[i + k])
+                tone_re += x * math.cos(omega * (i + k))
+                tone_im -= x * math.sin(omega * (i + k))
+                energy += x * x
+            out_re, out_im = math.cos(omega * i), -math.sin(omega * i)
+            in_re, in_im = math.cos(omega * (i + length)), -math.sin(omega * (i + length))
+        elif energy < 0.0:
+            energy = 0.0
+
+        if energy > floor:
+            score[i] = math.sqrt(tone_re * tone_re + tone_im * tone_im) / math.sqrt(energy * (length / 2))
+        else:
+            score[i] = 0.0
+
+        # Slide by one sample: audio[i] leaves the window, audio[i + length] enters
+        if i + 1 < len(score):
+            old = float(audio[i])
+            new = float(audio[i + length])
+            tone_re += new * in_re - old * out_re
+            tone_im += new * in_im - old * out_im
+            energy += new * new - old * old
+            out_re, out_im = out_re * rotate_re - out_im * rotate_im, out_re * rotate_im + out_im * rotate_re
+            in_re, in_im = in_re * rotate_re - in_im * rotate_im, in_re * rotate_im + in_im * rotate_re
+
+
+def peak_runs(score, threshold, min_distance, indices):
+    """Write the peaks sstv_dsp.pick_peaks would pick into indices; returns how many"""
+    count = 0
+    i = 0
+    n = len(score)
+    while i < n:
+        if score[i] < threshold:
+            i += 1
+            continue
+        peak = i
+        i += 1
+        while i < n and score[i] >= threshold:
+            if score[i] > score[peak]:
+                peak = i
+            i += 1
+        if count > 0 and peak - indices[count - 1] < min_distance:
+            if score[peak] > score[indices[count - 1]]:
+                indices[count - 1] = peak
+        else:
+            indices[count] = peak
+            count += 1
+    return count
+
+
+def span_sums(values, starts, ends, fill, means):
+    """Fill means with the mean of values over each [start, end), or fill outside the buffer"""
+    n = len(values)
+    for s in range(len(starts)):
+        start, end = starts[s], ends[s]
+        if start < 0 or end > n or end <= start:
+            means[s] = fill
+            continue
+        total = 0.0
+        for i in range(start, end):
+            total += values[i]
+        means[s] = total / (end - start)
+
+
+KERNELS = (sliding_tone_score, peak_runs, span_sums)
+
+_compiled = None
+_compile_lock = threading.Lock()
+
+
+def available():
+    """Whether numba can be imported"""
+    return importlib.util.find_spec('numba') is not None
+
+
+def compiled():
+    """The kernels compiled by numba, by name; compiled or loaded from cache on first call"""
+    global _compiled
+    with _compile_lock:
+        if _compiled is None:
+            import numba
+            jit = numba.njit(cache=True, nogil=True)
+            _compiled = {kernel.__name__: jit(kernel) for kernel in KERNELS}
+    return _compiled
+
+
+def tone_correlation(audio, frequency, length, sample_rate):
+    """sstv_dsp.tone_correlation as a compiled sliding DFT"""
+    audio = np.asarray(audio)
+    n = len(audio)
+    if n < length:
+        return np.zeros(0)
+    score = np.empty(n - length + 1)
+    compiled()['sliding_tone_score'](audio, sstv_dsp.TWO_PI * frequency / sample_rate, length,
+                                     TONE_REFRESH, score)
+    return score
+
+
+def pick_peaks(score, threshold, min_distance):
+    """sstv_dsp.pick_peaks as one compiled pass over score"""
+    score = np.asarray(score)
+    # Kept peaks are at least min_distance apart, which bounds their number
+    indices = np.empty(len(score) // max(1, min_distance) + 1, dtype=np.int64)
+    count = compiled()['peak_runs'](score, float(threshold), int(min_distance), indices)
+    indices = indices[:count].copy()
+    return indices, score[indices]
+
+
+def span_means(values, starts, ends, fill=0.0):
+    """sstv_dsp.span_means summing each span directly, with no cumulative sum of values"""
+    starts, ends = np.broadcast_arrays(np.asarray(starts, dtype=np.int64),
+                                       np.asarray(ends, dtype=np.int64))
+    means = np.empty(starts.shape, dtype=np.float64)
+    compiled()['span_sums'](np.asarray(values), np.ascontiguousarray(starts).ravel(),
+                            np.ascontiguousarray(ends).ravel(), float(fill), means.reshape(-1))
+    return means
+
+
+def kernel_set(mode='auto'):
+    """The hot-spot functions for a kernel mode, with sstv_dsp's signatures
+
+    'auto' uses the compiled kernels when numba is installed and the numpy
+    ones otherwise; 'numba' insists on them. The returned namespace's `mode`
+    is the one actually used.
+    """
+    if mode not in KERNEL_MODES:
+        raise ValueError(f"Unknown kernel mode '{mode}', expected one of {KERNEL_MODES}")
+    if mode == 'numba' and not available():
+        raise ValueError("Kernel mode 'numba' needs numba, which is not installed")
+    source = sstv_dsp
+    if mode == 'numba' or (mode == 'auto' and available()):
+        source = sys.modules[__name__]
+    return SimpleNamespace(mode='numpy' if source is sstv_dsp else 'numba',
+                           tone_correlation=source.tone_correlation,
+                           pick_peaks=source.pick_peaks,
+                           span_means=source.span_means)
@@ -0,0 +1,68 @@
+"""
+Pigeon70 SSTV - Intra-frame parallel decoding
+Demodulates independent line ranges of one frame on a thread or process pool
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import sstv_batch
+from sstv_batch import SharedTables, _init_decode_worker
+from sstv_engine import POOL_KINDS, demodulate_range, line_ranges
+
+
+def _decode_range(sstv, audio_buffer, sync_positions, scale, start, end, out):
+    """Demodulate the frequencies of lines [start, end) into rows of `out`"""
+    out[start:end] = demodulate_range(sstv, audio_buffer, sync_positions, scale, start, end)
+
+
+def _decode_shared_range(spec, sync_positions, scale, start, end):
+    """Process worker: decode a line range from the shared audio into the shared frequency matrix"""
+    blocks, arrays = SharedTables.attach(spec, writeable=True)
+    try:
+        # The engine is the one the batch pool initializer built for this worker
+        _decode_range(sstv_batch._worker_sstv, arrays['audio'], sync_positions, scale, start, end,
+                      arrays['frequencies'])
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def demodulate_parallel(sstv, audio_buffer, sync_positions, scale=1.0, jobs=None, pool='thread'):
+    """Decode every line on `jobs` workers; returns a (lines, WIDTH * 3) float32 frequency matrix
+
+    Lines are independent once their sync positions are known. The thread pool
+    shares the buffers directly and relies on numpy releasing the GIL in its
+    kernels; the process pool places the audio and the output matrix in shared
+    memory, so workers read and write them without copies.
+    """
+    if pool not in POOL_KINDS:
+        raise ValueError(f"Unknown pool '{pool}', expected one of {POOL_KINDS}")
+    jobs = jobs or os.cpu_count() or 1
+    sync_positions = np.asarray(sync_positions, dtype=np.float64)
+    ranges = line_ranges(len(sync_positions), jobs)
+    shape = (len(sync_positions), sstv.WIDTH * 3)
+
+    if pool == 'thread':
+        frequencies = np.zeros(shape, dtype=np.float32)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_decode_range, sstv, audio_buffer, sync_positions, scale,
+                                       start, end, frequencies) for start, end in ranges]
+            for future in futures:
+                future.result()
+        return frequencies
+
+    tables = {'audio': np.asarray(audio_buffer, dtype=sstv.work_dtype),
+              'frequencies': np.zeros(shape, dtype=np.float32)}
+    with SharedTables(tables) as shared, \
+            ProcessPoolExecutor(max_workers=jobs, initializer=_init_decode_worker,
+                                initargs=(sstv.demod, sstv.dtype.name, sstv.SAMPLE_RATE,
+                                          sstv.kernels.mode)) as executor:
+        futures = [executor.submit(_decode_shared_range, shared.spec, sync_positions, scale, start, end)
+                   for start, end in ranges]
+        for future in futures:
+            future.result()
+        return shared.arrays['frequencies'].copy()
@@ -0,0 +1,401 @@
+"""
+Pigeon70 SSTV - Block processing pipeline
+Composable decoding stages (band-pass, AGC, FM discriminator, sync detector,
+pixel slicer) that carry their state from one block to the next, so the
+same graph decodes a file read in blocks or live sound card audio
+
+scipy.signal is imported when the filtering stages are built, so modules
+that never build a pipeline do not pay for it.
+"""
+
+import numpy as np
+
+from sstv_dsp import TWO_PI
+from sstv_stats import NULL_STATS
+from sstv_stream import FrameAssembler, RingBuffer
+
+
+class Stage:
+    """One step of a Pipeline
+
+    process() takes each block together with the absolute sample position
+    of its first sample and the events list of the current feed, and returns
+    the block for the next stage: the same array, a view of it or a new
+    array the stage owns. Every stage keeps one output sample per input
+    sample, so positions mean the same thing all along the pipeline. Stages
+    may append events, which later stages see in the same call.
+    """
+
+    name = 'stage'
+
+    def reset(self):
+        """Forget all carried state, as if the stream were starting again"""
+
+    def process(self, block, position, events):
+        return block
+
+    def finish(self, events):
+        """End of the stream: flush anything still held"""
+
+
+class BandPass(Stage):
+    """Butterworth band-pass as second-order sections, filter state carried across blocks"""
+
+    name = 'bandpass'
+
+    def __init__(self, sample_rate, low, high, order=4, dtype=np.float32):
+        import scipy.signal
+        self.sos = scipy.signal.butter(order, (low, high), btype='bandpass', fs=sample_rate,
+                                       output='sos').astype(dtype)
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros((len(self.sos), 2), dtype=self.sos.dtype)
+
+    def process(self, block, position, events):
+        import scipy.signal
+        filtered, self.zi = scipy.signal.sosfilt(self.sos, block, zi=self.zi)
+        return filtered
+
+
+class AGC(Stage):
+    """Automatic gain control holding the signal's running RMS at `level`
+
+    Power is followed by a one-pole smoother with the given time constant,
+    its state carried across blocks. The gain is capped at max_gain, so
+    silence and weak noise are not blown up to full level.
+    """
+
+    name = 'agc'
+
+    def __init__(self, sample_rate, level=0.5, time_constant=0.02, max_gain=100.0, dtype=np.float32):
+        self.level = level
+        self.max_gain = max_gain
+        self.dtype = np.dtype(dtype)
+        alpha = np.exp(-1.0 / (time_constant * sample_rate))
+        self.b = np.array([1 - alpha], dtype=self.dtype)
+        self.a = np.array([1, -alpha], dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros(1, dtype=self.dtype)
+
+    def process(self, block, position, events):
+        import scipy.signal
+        power, self.zi = scipy.signal.lfilter(self.b, self.a, np.square(block), zi=self.zi)
+
+        # Gain, then output, computed in the power buffer
+        np.sqrt(power, out=power)
+        np.maximum(power, self.level / self.max_gain, out=power)
+        np.divide(self.level, power, out=power)
+        power *= block
+        return power
+
+
+class FMDiscriminator(Stage):
+    """Instantaneous frequency of every sample, from a streaming band-limited analytic signal
+
+    The analytic signal comes from a single linear-phase complex FIR: a
+    Kaiser-windowed low-pass (2 * half + 1 taps) shifted up to the middle
+    of `band`, which passes positive frequencies within the band (edges at
+    half amplitude) and rejects negative ones. Its in-phase and quadrature
+    parts match across the band, so the track does not ripple with each
+    tone's phase, and every frequency is delayed by the same `half`
+    samples. The phase step from each analytic sample to the next gives
+    its frequency. The last 2 * half input samples and the last analytic
+    sample are carried across blocks, so block boundaries are invisible.
+    """
+
+    name = 'fm_demod'
+
+    def __init__(self, sample_rate, band=(0.0, 3500.0), half=64, dtype=np.float32):
+        import scipy.signal
+        self.dtype = np.dtype(dtype)
+        lowpass = scipy.signal.firwin(2 * half + 1, (band[1] - band[0]) / 2, window=('kaiser', 8.0),
+                                      fs=sample_rate)
+        shift = np.exp(1j * TWO_PI * (band[0] + band[1]) / 2 / sample_rate * np.arange(-half, half + 1))
+        self.taps = (lowpass * shift).astype(np.result_type(self.dtype, np.complex64))
+        self.half = half
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        self.tail = np.zeros(2 * self.half, dtype=self.dtype)
+        self.last = None
+
+    def process(self, block, position, events):
+        import scipy.signal
+        n = len(block)
+        extended = np.concatenate((self.tail, block))
+        self.tail = extended[n:]
+        if n == 0:
+            return np.zeros(0, dtype=self.dtype)
+        analytic = scipy.signal.convolve(extended, self.taps, 'valid')
+
+        # Phase step into each sample; the first looks back to the previous block
+        previous = np.empty_like(analytic)
+        previous[0] = analytic[0] if self.last is None else self.last
+        previous[1:] = analytic[:-1]
+        self.last = analytic[-1]
+        np.conjugate(previous, out=previous)
+        previous *= analytic
+        frequency = np.angle(previous)
+        frequency *= self.sample_rate / TWO_PI
+        return frequency.astype(self.dtype, copy=False)
+
+
+class RunTracker:
+    """Runs of True in a boolean stream, delivered block by block
+
+    update() returns the (starts, ends) of every run that ended within the
+    block and whose length lies within [min_length, max_length]; a run still
+    open at the end of a block carries over into the next.
+    """
+
+    def __init__(self, min_length, max_length):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.start = None
+
+    def update(self, mask, position):
+        padded = np.concatenate(([self.start is not None], mask))
+        change = np.flatnonzero(padded[1:] != padded[:-1])
+        rises = change[mask[change]] + position
+        falls = change[~mask[change]] + position
+        if self.start is not None:
+            rises = np.concatenate(([self.start], rises))
+
+        # Runs alternate, so every fall closes the rise just before it
+        closed = len(falls)
+        starts = rises[:closed]
+        self.start = int(rises[closed]) if len(rises) > closed else None
+        lengths = falls - starts
+        keep = (lengths >= self.min_length) & (lengths <= self.max_length)
+        return starts[keep], falls[keep]
+
+
+class SyncDetector(Stage):
+    """Finds sync pulses and VIS leaders in a frequency track and adds them as events
+
+    The track is smoothed by a moving average carried across blocks. A VIS
+    leader is a run within `tolerance` Hz of the leader tone, and the median
+    of its inner part gives the receiver's frequency offset. A sync pulse is
+    a run below the midpoint between the sync and black tones, moved by the
+    last leader's offset; its end, against the separator tone that always
+    follows it, is a clean edge, so the pulse is placed back from there.
+    Without the offset, a mistuned signal would cross the midpoint early or
+    late and every pulse would be placed off by a fraction of the smoothing
+    window. Events, in order of position:
+      {'type': 'sync', 'position': p}  (start of the pulse, in track samples)
+      {'type': 'vis', 'index': p, 'end': q, 'confidence': ..., 'frequency_offset': Hz}
+    The frequency track is passed through unchanged.
+    """
+
+    name = 'sync_detect'
+
+    def __init__(self, sstv, tolerance=100.0):
+        sample_rate = sstv.SAMPLE_RATE
+        self.sync_samples = sstv.DURATION_SYNC * sample_rate
+        self.vis_samples = sstv.DURATION_VIS * sample_rate
+        self.sync_threshold = (sstv.FREQ_SYNC + sstv.FREQ_MIN) / 2
+        self.vis_frequency = sstv.FREQ_VIS
+        self.tolerance = tolerance
+        self.smoothing = max(1, int(self.sync_samples / 4))
+        self.delay = (self.smoothing - 1) / 2
+        self.syncs = RunTracker(self.sync_samples / 2, self.sync_samples * 2)
+        self.leaders = RunTracker(self.vis_samples * 0.8, self.vis_samples * 1.5)
+        self.reset()
+
+    def reset(self):
+        self.tail = None
+        self.syncs.start = None
+        self.leaders.start = None
+        self.offset = 0.0
+        # Smoothed track of earlier blocks, back to the start of the longest leader
+        self.history = RingBuffer(int(self.vis_samples * 1.5) + 1)
+
+    def leader_offset(self, smooth, position, start, end):
+        """Median frequency of a leader's inner part, less the nominal leader tone"""
+        start, end = int(start) + self.smoothing, int(end) - self.smoothing
+        earlier = self.history.read(start, position) if start < position else None
+        values = smooth[max(0, start - position):max(0, end - position)]
+        if earlier is not None:
+            values = np.concatenate((earlier, values))
+        return float(np.median(values)) - self.vis_frequency if len(values) else 0.0
+
+    def process(self, block, position, events):
+        # Moving average over the last `smoothing` samples, continued from the previous block
+        if self.tail is None:
+            self.tail = np.full(self.smoothing - 1, block[0] if len(block) else 0.0)
+        extended = np.concatenate((self.tail, block))
+        self.tail = extended[len(extended) - (self.smoothing - 1):]
+        csum = np.concatenate(([0.0], np.cumsum(extended, dtype=np.float64)))
+        smooth = (csum[self.smoothing:] - csum[:-self.smoothing]) / self.smoothing
+
+        # Leaders first, as each one retunes the sync threshold from its end onwards
+        found = []
+        offsets = np.full(len(smooth), self.offset)
+        starts, ends = self.leaders.update(np.abs(smooth - self.vis_frequency) < self.tolerance, position)
+        for start, end in zip(starts, ends):
+            self.offset = self.leader_offset(smooth, position, start, end)
+            offsets[end - position:] = self.offset
+            found.append({'type': 'vis', 'index': float(start - self.delay), 'end': float(end - self.delay),
+                          'confidence': round(min(1.0, (end - start) / self.vis_samples), 3),
+                          'frequency_offset': round(self.offset, 2)})
+        self.history.write(smooth)
+
+        _, ends = self.syncs.update(smooth - offsets < self.sync_threshold, position)
+        for end in ends:
+            found.append({'type': 'sync', 'position': float(end - self.delay - self.sync_samples)})
+        events.extend(sorted(found, key=lambda event: event.get('position', event.get('index'))))
+        return block
+
+    def finish(self, events):
+        self.reset()
+
+
+class PixelSlicer(Stage):
+    """Turns a frequency track plus sync and VIS events into lines and frames
+
+    After a VIS leader, each line's pixels are the mean frequency over the
+    inner part of every tone span (all but `guard` of it at either end),
+    less the frequency offset measured on the leader. Lines are placed and
+    reported by a FrameAssembler, as in the streaming decoder: by a line
+    clock fitted to the sync pulses seen so far in the frame (lines whose
+    pulse was missed are placed by the clock alone), with the same 'line',
+    'frame' and 'lost' events.
+    """
+
+    name = 'slicer'
+
+    def __init__(self, sstv, history_seconds=4.0, max_missed_syncs=20, guard=1 / 6):
+        self.sstv = sstv
+        self.history = RingBuffer(int(history_seconds * sstv.SAMPLE_RATE), dtype=np.float32)
+        self.tolerance = 0.002 * sstv.SAMPLE_RATE
+        self.guard = guard
+        self.frame = FrameAssembler(sstv, max_missed_syncs)
+        self.reset()
+
+    @property
+    def idle(self):
+        return self.frame.frame_start is None
+
+    def reset(self):
+        self.frame.start(None)
+        self.offset = 0.0
+
+    def add_sync(self, position):
+        """Match a detected pulse to a line of the frame in progress"""
+        frame = self.frame
+        first, period = frame.line_clock()
+        line = int(round((position - first) / period))
+        if line >= frame.line and abs(position - first - line * period) <= self.tolerance * max(1, line - frame.line):
+            frame.add_sync(line, position)
+
+    def process(self, block, position, events):
+        self.history.write(block)
+        for event in [event for event in events if event['type'] in ('vis', 'sync')]:
+            if event['type'] == 'vis':
+                if self.idle:
+                    self.frame.start(event['end'])
+                    self.offset = event.get('frequency_offset', 0.0)
+            elif not self.idle:
+                self.add_sync(event['position'])
+
+        while not self.idle and self.slice_line(events):
+            pass
+        return block
+
+    def slice_line(self, events):
+        """Slice the next line if all of its audio has arrived; returns whether it did"""
+        frame = self.frame
+        first, period = frame.line_clock()
+        sync_position = first + frame.line * period
+        segment_start = int(np.floor(sync_position))
+        segment_end = int(np.ceil(sync_position + period)) + 1
+        if segment_end > self.history.total:
+            return False
+
+        found = frame.line in frame.measured_lines
+        if not frame.sync_result(found, events):
+            self.reset()
+            return False
+
+        segment = self.history.read(segment_start, segment_end)
+        frequencies = None
+        if segment is not None:
+            starts, ends = self.sstv.tone_spans([sync_position - segment_start], period / frame.nominal_period)
+            guard = (ends - starts) * self.guard
+            frequencies = self.sstv.kernels.span_means(segment, np.rint(starts + guard), np.rint(ends - guard),
+                                                       fill=float(self.sstv.FREQ_MIN) + self.offset) - self.offset
+        if not frame.add_line(frequencies, found, events):
+            return True
+        self.reset()
+        return False
+
+    def finish(self, events):
+        self.frame.flush(events)
+        self.reset()
+
+
+class Pipeline:
+    """Stages run in order on every block, each timed under its name
+
+    feed() and finish() return event lists, like StreamingDecoder, so either
+    can drive sstv_stream.file_stream and receive_stream. Stage timings go
+    to `stats` (wall and CPU time per stage). finish() first feeds `flush`
+    samples of silence, to push out the audio still held inside filters.
+    """
+
+    def __init__(self, stages, stats=None, flush=0):
+        self.stages = list(stages)
+        self.stats = stats if stats is not None else NULL_STATS
+        self.flush = flush
+        self.position = 0
+
+    @property
+    def idle(self):
+        """Whether no stage is part way through a frame"""
+        return all(getattr(stage, 'idle', True) for stage in self.stages)
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+        self.position = 0
+
+    def feed(self, block):
+        """Run one block through every stage; returns the events they added"""
+        events = []
+        position = self.position
+        self.position += len(block)
+        for stage in self.stages:
+            with self.stats.timer(stage.name):
+                block = stage.process(block, position, events)
+        return events
+
+    def finish(self):
+        """End of audio: flush every stage; returns the events they added"""
+        events = self.feed(np.zeros(self.flush, dtype=np.float32)) if self.flush else []
+        for stage in self.stages:
+            stage.finish(events)
+        self.position = 0
+        return events
+
+
+def decoding_pipeline(sstv):
+    """The standard decoder: AGC, FM discriminator, sync detector and pixel slicer
+
+    The discriminator's complex FIR is the band-pass: being linear phase, it
+    delays every tone alike, where an IIR band-pass in front of it smears
+    the 12-sample pixel tones into their neighbours.
+    """
+    sample_rate = sstv.SAMPLE_RATE
+    dtype = sstv.work_dtype
+    # Wide enough to keep pixel edges sharp, narrow enough to leave out most of the noise
+    band = (0.0, min(sstv.FREQ_MAX + 2200, 0.45 * sample_rate))
+    return Pipeline([
+        AGC(sample_rate, dtype=dtype),
+        FMDiscriminator(sample_rate, band, dtype=dtype),
+        SyncDetector(sstv),
+        PixelSlicer(sstv),
+    ], sstv.stats, flush=int(0.01 * sample_rate))
@@ -0,0 +1,145 @@
+"""
+Pigeon70 SSTV - Instrumentation
+Per-stage timers, counters and histograms for the encoder and decoder
+"""
+
+import contextlib
+import threading
+import time
+
+import numpy as np
+
+
+class Stats:
+    """Collects stage timings, event counters and value histograms
+
+    Stages are timed with `with stats.timer('name'):`, recording wall time
+    and process CPU time (which includes any worker threads). Every finished
+    stage is also published as a structured event to subscribed callbacks:
+      {'type': 'stage', 'stage': name, 'wall': seconds, 'cpu': seconds}
+    Updates are thread-safe.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+            self.histograms = {}
+
+    def subscribe(self, callback):
+        """Call callback(event) for every stage event"""
+        self.listeners.append(callback)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time the enclosed block as one run of stage `name`"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            with self.lock:
+                entry = self.timers.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += wall
+                entry[2] += cpu
+            event = {'type': 'stage', 'stage': name, 'wall': wall, 'cpu': cpu}
+            for callback in self.listeners:
+                callback(event)
+
+    def count(self, name, n=1):
+        """Add n to counter `name`"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def observe(self, name, values):
+        """Add one value or an array of values to histogram `name`"""
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64)).ravel()
+        with self.lock:
+            self.histograms.setdefault(name, []).append(values)
+
+    def summary(self, bins=10):
+        """Everything recorded, as a JSON-serializable dict"""
+        with self.lock:
+            timers = {name: {'count': count, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+                      for name, (count, wall, cpu) in self.timers.items()}
+            counters = dict(self.counters)
+            histograms = {}
+            for name, chunks in self.histograms.items():
+                values = np.concatenate(chunks)
+                if not len(values):
+                    continue
+                counts, edges = np.histogram(values, bins=bins)
+                histograms[name] = {
+                    'count': int(len(values)),
+                    'mean': round(float(np.mean(values)), 4),
+                    'std': round(float(np.std(values)), 4),
+                    'min': round(float(np.min(values)), 4),
+                    'p50': round(float(np.percentile(values, 50)), 4),
+                    'p95': round(float(np.percentile(values, 95)), 4),
+                    'max': round(float(np.max(values)), 4),
+                    'edges': [round(float(e), 4) for e in edges],
+                    'counts': counts.tolist(),
+                }
+        return {'timers': timers, 'counters': counters, 'histograms': histograms}
+
+    def format(self):
+        """Human-readable summary table"""
+        summary = self.summary()
+        lines = []
+        if summary['timers']:
+            lines.append(f"{'stage':24s} {'runs':>6s} {'wall ms':>10s} {'cpu ms':>10s}")
+            for name, timer in summary['timers'].items():
+                lines.append(f"{name:24s} {timer['count']:6d} {timer['wall_s'] * 1e3:10.1f} "
+                             f"{timer['cpu_s'] * 1e3:10.1f}")
+        for name, value in summary['counters'].items():
+            lines.append(f"{name:24s} {value:6d}")
+        for name, hist in summary['histograms'].items():
+            lines.append(f"{name:24s} n={hist['count']} mean={hist['mean']:.2f} std={hist['std']:.2f} "
+                         f"p50={hist['p50']:.2f} p95={hist['p95']:.2f} max={hist['max']:.2f}")
+        return '\n'.join(lines)
+
+
+class NullStats:
+    """Disabled instrumentation: every call is a no-op
+
+    Hot paths guard any extra measurement work with `stats.enabled`, so an
+    engine without instrumentation pays only an attribute lookup per stage.
+    """
+
+    enabled = False
+    _timer = contextlib.nullcontext()
+
+    def reset(self):
+        pass
+
+    def subscribe(self, callback):
+        pass
+
+    def timer(self, name):
+        return self._timer
+
+    def count(self, name, n=1):
+        pass
+
+    def observe(self, name, values):
+        pass
+
+    def summary(self, bins=10):
+        return {'timers': {}, 'counters': {}, 'histograms': {}}
+
+    def format(self):
+        return ''
+
+
+NULL_STATS = NullStats()
@@ -0,0 +1,518 @@
+"""
+Pigeon70 SSTV - Streaming reception and transmission
+Line-by-line decoding and encoding of live audio with bounded memory
+"""
+
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+from PIL import Image
+
+from sstv_dsp import frequency_track, peak_frequency, synthesize, synthesize_table
+
+# Output level of streamed audio (sine peak), matching encode_image's normalization
+STREAM_AMPLITUDE = 0.8
+
+
+class RingBuffer:
+    """Preallocated ring buffer addressed by absolute sample position
+
+    Safe for one writer (such as an audio callback) and one reader thread.
+    Only the most recent `capacity` samples are kept.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.total = 0
+        self.condition = threading.Condition()
+
+    @property
+    def oldest(self):
+        """Absolute position of the oldest sample still held"""
+        return max(0, self.total - self.capacity)
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones when full"""
+        samples = np.asarray(samples).ravel()
+        skipped = max(0, len(samples) - self.capacity)
+        samples = samples[skipped:]
+        n = len(samples)
+
+        with self.condition:
+            start = (self.total + skipped) % self.capacity
+            first = min(n, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.buffer[:n - first] = samples[first:]
+            self.total += skipped + n
+            self.condition.notify_all()
+
+    def read(self, start, end):
+        """Return a copy of samples [start, end), or None if they are not all held"""
+        with self.condition:
+            if start < self.oldest or end > self.total or end < start:
+                return None
+            first = start % self.capacity
+            n = end - start
+            if first + n <= self.capacity:
+                return self.buffer[first:first + n].copy()
+            split = self.capacity - first
+            return np.concatenate((self.buffer[first:], self.buffer[:n - split]))
+
+    def wait(self, position, timeout=None):
+        """Block until samples up to position have been written; returns whether they have"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.total >= position, timeout)
+
+
+class FrameAssembler:
+    """The frame a streaming decoder is part way through: its line clock and image
+
+    Lines are placed by a clock fitted to the sync pulses measured so far in
+    the frame (the nominal period until two pulses are in), rows are filled
+    in as they are demodulated, and the 'line', 'frame' and 'lost' events
+    are reported the same way whichever decoder drives it.
+    """
+
+    def __init__(self, sstv, max_missed_syncs=20):
+        self.sstv = sstv
+        self.nominal_period = sstv.line_period()
+        self.max_missed_syncs = max_missed_syncs
+        self.stats = sstv.stats
+        self.start(None)
+
+    def start(self, frame_start):
+        """Begin a new frame whose first sync pulse is expected at frame_start"""
+        self.frame_start = frame_start
+        self.line = 0
+        self.measured_lines = []
+        self.measured_syncs = []
+        self.missed_syncs = 0
+        self.image = np.zeros((self.sstv.HEIGHT, self.sstv.WIDTH, 3), dtype=np.uint8)
+
+    def line_clock(self):
+        """Current (first sync, line period) estimate from the pulses measured so far"""
+        if len(self.measured_lines) >= 2:
+            period, first = np.polyfit(self.measured_lines, self.measured_syncs, 1)
+            low, high = self.nominal_period * 0.98, self.nominal_period * 1.02
+            if low <= period <= high:
+                return first, period
+        if self.measured_lines:
+            return self.measured_syncs[-1] - self.measured_lines[-1] * self.nominal_period, self.nominal_period
+        return self.frame_start, self.nominal_period
+
+    def add_sync(self, line, position):
+        """Record the measured sync pulse of a line"""
+        self.measured_lines.append(line)
+        self.measured_syncs.append(position)
+
+    def sync_result(self, found, events):
+        """Count the current line's pulse as found or missed; returns False once the frame is lost"""
+        if found:
+            self.missed_syncs = 0
+            return True
+        self.stats.count('sync_misses')
+        self.missed_syncs += 1
+        if self.missed_syncs <= self.max_missed_syncs:
+            return True
+        self.stats.count('lost_frames')
+        events.append({'type': 'lost', 'line': self.line})
+        return False
+
+    def add_line(self, frequencies, sync_found, events):
+        """Fill the current row from its pixel frequencies and report it; returns whether the frame is complete
+
+        frequencies of None leave the row black, for audio no longer held.
+        """
+        if frequencies is not None:
+            self.image[self.line] = self.sstv.frequency_to_pixel(frequencies).reshape(self.sstv.WIDTH, 3)
+        events.append({'type': 'line', 'line': self.line, 'pixels': self.image[self.line].copy(),
+                       'sync_found': sync_found})
+        self.line += 1
+        if self.line < self.sstv.HEIGHT:
+            return False
+        self.stats.count('frames')
+        events.append(self.frame_event())
+        return True
+
+    def frame_event(self):
+        """The frame so far, as a 'frame' event"""
+        return {'type': 'frame', 'image': Image.fromarray(self.image.copy()),
+                'start': self.frame_start, 'lines': self.line}
+
+    def flush(self, events):
+        """End of audio: report the partial frame, if any, with its missing lines black"""
+        if self.frame_start is not None and self.line > 0:
+            events.append(self.frame_event())
+
+
+class StreamingDecoder:
+    """Incremental Pigeon70 decoder: feed audio blocks, get each row as soon as it arrives
+
+    A small state machine runs on the incoming audio: idle (listening for a
+    VIS leader) -> sync (locating the next line's sync pulse) -> pixels
+    (waiting for the line's pixel tones) -> sync ... and back to idle after
+    the last line, ready for the next frame. Only a few seconds of history
+    are kept, however long the stream runs.
+
+    feed() returns a list of event dicts:
+      {'type': 'vis', 'index': ..., 'confidence': ...}
+      {'type': 'line', 'line': y, 'pixels': (WIDTH, 3) uint8 array, 'sync_found': bool}
+      {'type': 'frame', 'image': PIL.Image, 'start': ..., 'lines': n}
+      {'type': 'lost', 'line': y}  (too many sync pulses missed; back to idle)
+
+    finish() decodes the line in progress and flushes a frame cut short by the
+    end of the audio.
+    """
+
+    IDLE = 'idle'
+    SYNC = 'sync'
+    PIXELS = 'pixels'
+
+    def __init__(self, sstv, history_seconds=4.0, max_missed_syncs=20, threshold=0.5):
+        self.sstv = sstv
+        sample_rate = sstv.SAMPLE_RATE
+        self.history = RingBuffer(int(history_seconds * sample_rate), dtype=sstv.work_dtype)
+        self.detector = sstv.vis_detector()
+        self.sync_samples = int(sstv.DURATION_SYNC * sample_rate)
+        self.search = int(0.01 * sample_rate)
+        self.frame = FrameAssembler(sstv, max_missed_syncs)
+        self.threshold = threshold
+        self.stats = sstv.stats
+        self.reset()
+
+    @property
+    def idle(self):
+        """Whether the decoder is listening for a frame rather than part way through one"""
+        return self.state == self.IDLE
+
+    def reset(self, position=None):
+        """Go back to idle, listening for a VIS leader from position onwards"""
+        self.state = self.IDLE
+        self.detector.reset()
+        self.detector_base = self.history.total if position is None else position
+        self.detector_position = self.detector_base
+        self.frame.start(None)
+        self.sync_position = None
+        self.sync_found = False
+
+    def feed(self, block):
+        """Consume an audio block; returns the events it completed"""
+        self.history.write(block)
+        events = []
+        while self.step(events):
+            pass
+        return events
+
+    def step(self, events):
+        """Advance the state machine once; returns False when more audio is needed"""
+        if self.state == self.IDLE:
+            return self.step_idle(events)
+        if self.state == self.SYNC:
+            return self.step_sync(events)
+        return self.step_pixels(events)
+
+    def step_idle(self, events):
+        # Catch up with audio that arrived while a frame was being decoded
+        start = max(self.detector_position, self.history.oldest)
+        if start >= self.history.total:
+            return False
+        if start != self.detector_position:
+            self.reset(start)
+        block = self.history.read(start, self.history.total)
+        self.detector_position = self.history.total
+
+        with self.stats.timer('vis_search'):
+            detection = self.detector.process(block)
+        if detection is None:
+            return False
+
+        vis_start, confidence = detection
+        vis_start += self.detector_base
+        events.append({'type': 'vis', 'index': vis_start, 'confidence': confidence})
+        self.frame.start(vis_start + self.sstv.DURATION_VIS * self.sstv.SAMPLE_RATE)
+        self.state = self.SYNC
+        return True
+
+    def step_sync(self, events):
+        frame = self.frame
+        first, period = frame.line_clock()
+        predicted = first + frame.line * period
+        region_start = int(predicted) - self.search
+        region_end = int(predicted) + self.search + self.sync_samples
+        if region_end > self.history.total:
+            return False
+
+        # Look for the pulse around its predicted position
+        region = self.history.read(region_start, region_end)
+        found = False
+        if region is not None:
+            with self.stats.timer('sync_search'):
+                score = self.sstv.kernels.tone_correlation(region, self.sstv.FREQ_SYNC, self.sync_samples,
+                                                           self.sstv.SAMPLE_RATE)
+            best = int(np.argmax(score))
+            found = score[best] >= self.threshold
+            if found:
+                frame.add_sync(frame.line, region_start + best)
+                self.stats.observe('sync_jitter_samples', region_start + best - predicted)
+
+        if not frame.sync_result(found, events):
+            self.reset(region_end)
+            return True
+        if found:
+            first, period = frame.line_clock()
+            self.sync_position = first + frame.line * period
+        else:
+            # Fall back to the position predicted by the line clock
+            self.sync_position = predicted
+
+        self.sync_found = found
+        self.state = self.PIXELS
+        return True
+
+    def step_pixels(self, events, final=False):
+        _, period = self.frame.line_clock()
+        scale = period / self.frame.nominal_period
+        segment_start = int(np.floor(self.sync_position))
+        segment_end = int(np.ceil(self.sync_position + period)) + 1
+        if segment_end > self.history.total:
+            if not final:
+                return False
+            # End of audio: decode the line from what is held, tones cut off decode as black
+            segment_end = self.history.total
+
+        segment = self.history.read(segment_start, segment_end)
+        frequencies = None
+        if segment is not None:
+            with self.stats.timer('demod'):
+                frequencies = self.sstv.demodulate_lines(segment, [self.sync_position - segment_start], scale)
+        if not self.frame.add_line(frequencies, self.sync_found, events):
+            self.state = self.SYNC
+            return True
+        self.reset(segment_end)
+        return True
+
+    def finish(self):
+        """End of audio: returns the line and frame in progress, if any, with missing lines black"""
+        events = []
+        if self.state == self.PIXELS:
+            self.step_pixels(events, final=True)
+        self.frame.flush(events)
+        self.reset()
+        return events
+
+
+def receive_stream(sstv, duration=None, stop_event=None, device=None, blocksize=2048,
+                   capture_seconds=10.0, make_decoder=StreamingDecoder):
+    """Decode live audio from the sound card, yielding decoder events as they happen
+
+    Listens for new frames for `duration` seconds (forever if None); a frame
+    that has already started is always received to the end. Setting
+    stop_event ends reception early. The audio callback only copies samples
+    into a preallocated ring buffer; decoding runs in the consuming thread,
+    through make_decoder(sstv): a StreamingDecoder or anything with the same
+    feed() and idle, such as sstv_pipeline.decoding_pipeline.
+    """
+    # Only live reception needs an audio device
+    import sounddevice as sd
+
+    capture = RingBuffer(int(capture_seconds * sstv.SAMPLE_RATE), dtype=np.float32)
+    decoder = make_decoder(sstv)
+
+    def callback(indata, frames, time_info, status):
+        capture.write(indata[:, 0])
+
+    position = 0
+    started = time.monotonic()
+    with sd.InputStream(samplerate=sstv.SAMPLE_RATE, channels=1, dtype='float32',
+                        blocksize=blocksize, device=device, callback=callback):
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if duration is not None and time.monotonic() - started >= duration and decoder.idle:
+                break
+            if not capture.wait(position + 1, timeout=0.1):
+                continue
+
+            # Fell behind the sound card: drop the lost audio and start over
+            if position < capture.oldest:
+                events = [{'type': 'overrun', 'samples': capture.oldest - position}]
+                position = capture.oldest
+                decoder = make_decoder(sstv)
+            else:
+                events = []
+
+            end = capture.total
+            block = capture.read(position, end)
+            position = end
+            if block is not None:
+                events.extend(decoder.feed(block))
+            for event in events:
+                yield event
+
+
+def file_stream(sstv, path, blocksize=32768, make_decoder=StreamingDecoder):
+    """Decode a recording of any length block by block, yielding decoder events
+
+    Audio is read with SoundFile.blocks in the engine's working dtype, and
+    the decoder keeps its own few seconds of history across block boundaries,
+    so peak memory depends only on the block size, not on the length of the
+    recording. make_decoder(sstv) builds the decoder, as for receive_stream.
+    Only the first channel of multi-channel files is used.
+    """
+    decoder = make_decoder(sstv)
+    with sf.SoundFile(path) as source:
+        for block in source.blocks(blocksize, dtype=sstv.work_dtype.name, always_2d=True):
+            yield from decoder.feed(block[:, 0])
+    yield from decoder.finish()
+
+
+def scan_leaders(sstv, path, blocksize=32768):
+    """One linear pass over a recording, returning every VIS leader found in it
+
+    Each leader is a dict with its sample 'offset', 'time' in seconds,
+    detection 'confidence' and 'frequency_offset': how far the received
+    leader tone sits from its nominal frequency, in Hz. Memory is bounded by
+    the block size and a short history used to measure each leader.
+    """
+    sample_rate = sstv.SAMPLE_RATE
+    vis_samples = int(sstv.DURATION_VIS * sample_rate)
+    detector = sstv.vis_detector()
+    history = RingBuffer(4 * vis_samples + blocksize, dtype=sstv.work_dtype)
+    guard = detector.window
+
+    leaders = []
+    pending = []
+    with sstv.stats.timer('scan'), sf.SoundFile(path) as source:
+        for block in source.blocks(blocksize, dtype=sstv.work_dtype.name, always_2d=True):
+            history.write(block[:, 0])
+            detection = detector.process(block[:, 0])
+            if detection is not None:
+                start, confidence = detection
+                offset = max(0, int(round(start)))
+                pending.append({'offset': offset, 'time': round(offset / sample_rate, 4),
+                                'confidence': round(float(confidence), 3)})
+
+            # Measure the tone of each leader once all of it has been read
+            while pending and pending[0]['offset'] + vis_samples <= history.total:
+                leader = pending.pop(0)
+                tone = history.read(leader['offset'] + guard, leader['offset'] + vis_samples - guard)
+                if tone is not None:
+                    frequency = peak_frequency(tone, sample_rate, sstv.FREQ_VIS - 100, sstv.FREQ_VIS + 100)
+                    leader['frequency_offset'] = round(frequency - sstv.FREQ_VIS, 2)
+                leaders.append(leader)
+
+        # Leaders cut off by the end of the file are reported unmeasured
+        leaders.extend(pending)
+    return leaders
+
+
+def encode_blocks(sstv, img_array, blocksize=4096):
+    """Yield an encoded frame as blocks of blocksize samples (the last may be short)
+
+    Blocks are in the engine's dtype; int16 lines go straight to 16-bit
+    samples through its phase-accumulator sine table, as synthesize_frame
+    does. The frame is synthesized one line at a time with the phase carried
+    across lines, so at most one line plus one block is held in memory and
+    the first block is ready almost immediately.
+    """
+    frequencies, counts = sstv.frame_tones(img_array)
+    tones_per_line = 2 + sstv.WIDTH * 3
+    table = sstv.int16_sine_table() if sstv.dtype == np.int16 else None
+
+    # VIS leader, then one line at a time
+    bounds = [0, 1] + [1 + (y + 1) * tones_per_line for y in range(sstv.HEIGHT)]
+    block = np.empty(blocksize, dtype=sstv.dtype)
+    filled = 0
+    phase = 0
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        if table is not None:
+            samples, phase = synthesize_table(frequencies[first:last], counts[first:last], table,
+                                              sstv.SAMPLE_RATE, phase)
+        else:
+            track = frequency_track(frequencies[first:last], counts[first:last])
+            samples, phase = synthesize(track, sstv.SAMPLE_RATE, phase)
+            samples *= STREAM_AMPLITUDE
+
+        while len(samples):
+            take = min(blocksize - filled, len(samples))
+            block[filled:filled + take] = samples[:take]
+            filled += take
+            samples = samples[take:]
+            if filled == blocksize:
+                yield block.copy()
+                filled = 0
+    if filled:
+        yield block[:filled].copy()
+
+
+def array_blocks(audio, blocksize=4096):
+    """Yield an existing audio array as float32 blocks of blocksize samples"""
+    for start in range(0, len(audio), blocksize):
+        yield np.asarray(audio[start:start + blocksize], dtype=np.float32)
+
+
+def write_blocks(path, blocks, sample_rate, subtype=None):
+    """Write audio blocks to a sound file as they are produced; returns the sample count"""
+    written = 0
+    with sf.SoundFile(path, 'w', samplerate=sample_rate, channels=1, subtype=subtype) as out:
+        for block in blocks:
+            out.write(block)
+            written += len(block)
+    return written
+
+
+def transmit_stream(sstv, blocks, blocksize=4096, device=None, prefetch=16, stop_event=None):
+    """Play audio blocks through the sound card while they are still being generated
+
+    A producer thread keeps a short queue of blocks ahead of the
+    sounddevice.OutputStream callback, which only copies a ready block into
+    the output buffer. Blocks must be blocksize samples long (the last may
+    be short), as encode_blocks makes them: the stream is opened as int16
+    for an int16 engine, so its blocks reach the device unconverted, and as
+    float32 otherwise. Returns when playback has finished or stop_event is set.
+    """
+    # Only live transmission needs an audio device
+    import sounddevice as sd
+
+    pending = queue.Queue(maxsize=prefetch)
+    finished = threading.Event()
+
+    def produce():
+        for block in itertools.chain(blocks, [None]):
+            # Give up once playback has ended or been stopped
+            while not finished.is_set():
+                try:
+                    pending.put(block, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            else:
+                return
+
+    def callback(outdata, frames, time_info, status):
+        try:
+            block = pending.get_nowait()
+        except queue.Empty:
+            # Producer fell behind: send silence rather than stall the device
+            outdata.fill(0)
+            return
+        if block is None:
+            outdata.fill(0)
+            raise sd.CallbackStop
+        outdata[:len(block), 0] = block
+        outdata[len(block):] = 0
+
+    threading.Thread(target=produce, daemon=True).start()
+    dtype = 'int16' if sstv.dtype == np.int16 else 'float32'
+    with sd.OutputStream(samplerate=sstv.SAMPLE_RATE, channels=1, dtype=dtype,
+                         blocksize=blocksize, device=device, callback=callback,
+                         finished_callback=finished.set):
+        while not finished.wait(0.1):
+            if stop_event is not None and stop_event.is_set():
+                break
+    finished.set()
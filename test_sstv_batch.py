@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for Pigeon70 SSTV batch processing
+Run with: python -m pytest test_sstv_batch.py
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile as sf
+from PIL import Image
+
+from real_sstv import Pigeon70SSTV
+from sstv_batch import SharedTables, decode_batch, decode_frames, encode_batch, expand_inputs, output_paths
+from sstv_stream import scan_leaders
+
+
+def gradient_recording(directory):
+    """Encode a gradient test card to directory/gradient.wav; returns (path, image array)"""
+    sstv = Pigeon70SSTV()
+    img = np.zeros((sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    img[..., 0] = np.linspace(0, 255, sstv.WIDTH)
+    img[..., 1] = np.linspace(0, 255, sstv.HEIGHT)[:, None]
+    img[..., 2] = 128
+    Image.fromarray(img).save(directory / 'gradient.png')
+    sstv.encode_image(str(directory / 'gradient.png'), str(directory / 'gradient.wav'))
+    return directory / 'gradient.wav', img
+
+
+def test_expand_inputs_mixes_directories_globs_and_files(tmp_path):
+    """Directories are filtered by extension and overlapping patterns are not repeated"""
+    for name in ('b.wav', 'a.flac', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+    inputs = expand_inputs([str(tmp_path), str(tmp_path / '*.wav'), str(tmp_path / 'notes.txt')])
+    assert [p.name for p in inputs] == ['a.flac', 'b.wav', 'notes.txt']
+
+
+def test_output_paths_do_not_clash():
+    """Inputs sharing a stem get distinct output names"""
+    outputs = output_paths([Path('x/a.wav'), Path('y/a.wav'), Path('b.flac')], 'out', '.png')
+    assert outputs == [Path('out/a.png'), Path('out/a_2.png'), Path('out/b.png')]
+
+
+def test_decode_batch_isolates_failures(tmp_path):
+    """A corrupt recording fails on its own; the good one still decodes and both are summarized"""
+    good, img = gradient_recording(tmp_path)
+    corrupt = tmp_path / 'corrupt.wav'
+    corrupt.write_bytes(b'RIFF not really a wav file')
+    output_dir = tmp_path / 'decoded'
+
+    records = sorted(decode_batch([corrupt, good], output_dir, jobs=2), key=lambda record: record['index'])
+    assert [record['ok'] for record in records] == [False, True]
+    assert records[0]['input'] == str(corrupt) and records[0]['error']
+
+    decoded = np.asarray(Image.open(records[1]['output'])).astype(int)
+    assert np.abs(decoded - img.astype(int)).mean() < 2.0
+    with open(output_dir / 'summary.jsonl') as summary:
+        assert sorted(json.loads(line)['ok'] for line in summary) == [False, True]
+
+
+def test_shared_tables_attach_read_only_views():
+    """Attached tables alias the owner's shared memory and cannot be written"""
+    with SharedTables({'sine': np.arange(8, dtype=np.int16), 'counts': np.array([3, 4])}) as tables:
+        blocks, arrays = SharedTables.attach(tables.spec)
+        assert list(arrays['sine']) == list(range(8))
+        assert list(arrays['counts']) == [3, 4]
+        assert not arrays['sine'].flags.writeable
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+@pytest.mark.parametrize('sample_rate', (44100, 48000))
+def test_encode_batch_writes_decodable_files(tmp_path, sample_rate):
+    """Images encode on the process pool to 16-bit files at the given rate that decode back; a bad image fails alone"""
+    _, img = gradient_recording(tmp_path)
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not an image')
+    output_dir = tmp_path / 'encoded'
+
+    records = sorted(encode_batch([tmp_path / 'gradient.png', broken], output_dir, 'flac', jobs=2,
+                                  sample_rate=sample_rate), key=lambda record: record['index'])
+    assert [record['ok'] for record in records] == [True, False]
+    assert records[1]['error']
+
+    info = sf.info(records[0]['output'])
+    assert (info.samplerate, info.subtype, info.frames) == (sample_rate, 'PCM_16', records[0]['samples'])
+    decoded, _ = Pigeon70SSTV(sample_rate=sample_rate).decode_samples(sf.read(records[0]['output'])[0])
+    assert np.abs(np.asarray(decoded).astype(int) - img.astype(int)).mean() < 2.0
+
+
+def test_scan_and_decode_frames(tmp_path):
+    """Leaders are found in one pass and each frame decodes from its own stretch of the recording"""
+    good, img = gradient_recording(tmp_path)
+    frame, sample_rate = sf.read(good, dtype='float32')
+    gap = np.zeros(sample_rate)
+    recording = tmp_path / 'monitor.wav'
+    sf.write(recording, np.concatenate((gap, frame, gap, frame, gap)), sample_rate, subtype='FLOAT')
+    expected = [len(gap), 2 * len(gap) + len(frame)]
+
+    sstv = Pigeon70SSTV()
+    leaders = scan_leaders(sstv, recording)
+    assert [abs(leader['offset'] - offset) < 100 for leader, offset in zip(leaders, expected)] == [True, True]
+    assert all(abs(leader['frequency_offset']) < 5 for leader in leaders)
+    assert all(leader['time'] == round(leader['offset'] / sample_rate, 4) for leader in leaders)
+
+    # A leader right at the start of the file is not placed before it
+    first = scan_leaders(sstv, good)
+    assert len(first) == 1 and first[0]['offset'] == 0 and first[0]['time'] == 0.0
+
+    # A third "leader" half-way through the first frame has no VIS in its stretch
+    leaders.append({'offset': len(gap) + len(frame) // 2})
+    records = sorted(decode_frames(recording, leaders, tmp_path / 'frames', jobs=2),
+                     key=lambda record: record['frame'])
+    assert [record['ok'] for record in records] == [True, True, True]
+    for record, offset in zip(records, expected):
+        assert record['vis_found'] and abs(record['vis_index'] - offset) < 100
+        decoded = np.asarray(Image.open(record['output'])).astype(int)
+        assert np.abs(decoded - img.astype(int)).mean() < 2.0
+    assert not records[2]['vis_found'] and records[2]['vis_index'] == -1
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for Pigeon70 SSTV beacon transmission
+Run with: python -m pytest test_sstv_beacon.py
+"""
+
+import queue
+
+import numpy as np
+from PIL import Image
+
+from sstv_beacon import FrameLibrary, Playout, beacon_schedule
+
+
+def test_library_renders_once_and_maps(tmp_path):
+    """A frame is stored as int16 on first use and memory-mapped afterwards"""
+    path = tmp_path / 'card.png'
+    Image.new('RGB', (320, 240), (200, 40, 90)).save(path)
+    library = FrameLibrary(tmp_path / 'frames')
+
+    samples, cached = library.frame(path)
+    again, cached_again = library.frame(path)
+    assert not cached and cached_again
+    assert isinstance(again, np.memmap) and again.dtype == np.int16
+    assert np.array_equal(again, samples)
+    assert len(samples) == int(round(library.encoder.frame_duration() * library.encoder.SAMPLE_RATE))
+
+
+def test_schedule_pads_to_interval(tmp_path):
+    """Frames start on interval boundaries; no silence before the first or after the last"""
+    path = tmp_path / 'card.png'
+    Image.new('RGB', (320, 240), (10, 10, 10)).save(path)
+    library = FrameLibrary(tmp_path / 'frames')
+
+    items = list(beacon_schedule(library, [path], cycles=3, interval=80))
+    assert [item['type'] for item in items] == ['frame', 'silence', 'frame', 'silence', 'frame']
+    assert items[0]['length'] + items[1]['length'] == 80 * library.encoder.SAMPLE_RATE
+    assert [item['cycle'] for item in items if item['type'] == 'frame'] == [0, 1, 2]
+
+
+def test_playout_is_gapless_across_blocks():
+    """Items run back to back whatever the callback size, then playout ends"""
+    first = np.arange(1, 1001, dtype=np.int16)
+    second = -np.arange(1, 501, dtype=np.int16)
+    pending = queue.Queue()
+    for item in ({'type': 'frame', 'name': 'a', 'cycle': 0, 'samples': first, 'length': len(first)},
+                 {'type': 'silence', 'samples': None, 'length': 300},
+                 {'type': 'frame', 'name': 'b', 'cycle': 0, 'samples': second, 'length': len(second)},
+                 None):
+        pending.put(item)
+    events = queue.SimpleQueue()
+    playout = Playout(pending, events, sample_rate=100)
+
+    blocks = []
+    while True:
+        block = np.full(333, 99, dtype=np.int16)
+        more = playout.fill(block)
+        blocks.append(block)
+        if not more:
+            break
+    output = np.concatenate(blocks)
+    expected = np.concatenate((first, np.zeros(300, np.int16), second))
+    assert np.array_equal(output[:len(expected)], expected)
+    assert not output[len(expected):].any()
+
+    starts = [events.get() for _ in range(events.qsize())]
+    assert [(event['name'], event['time']) for event in starts] == [('a', 0.0), ('b', 13.0)]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the Pigeon70 SSTV decode cache
+Run with: python -m pytest test_sstv_cache.py
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pytest
+
+from sstv_cache import FrameCache, samples_digest
+from real_sstv import line_range
+from sstv_engine import Pigeon70Engine
+
+
+def test_store_load_and_key_settings(tmp_path):
+    """Entries round-trip exactly and are keyed by content and demodulator"""
+    cache = FrameCache(tmp_path)
+    digest = samples_digest(np.arange(100, dtype=np.float32))
+    assert digest != samples_digest(np.arange(100, dtype=np.float64))
+
+    bank, fm = Pigeon70Engine(demod='bank'), Pigeon70Engine(demod='fm')
+    assert cache.key(bank, digest) != cache.key(fm, digest)
+    assert cache.load(cache.key(bank, digest)) is None
+
+    analysis = {'frequencies': np.full((2, 960), 1900, np.float32), 'lines': np.array([0, 2])}
+    cache.store(cache.key(bank, digest), analysis)
+    loaded = cache.load(cache.key(bank, digest))
+    assert set(loaded) == set(analysis)
+    assert all(np.array_equal(loaded[name], analysis[name]) for name in analysis)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Past max_bytes the oldest-used entries go first; loading an entry refreshes it"""
+    entry = {'frequencies': np.zeros(10_000, np.float32)}
+    cache = FrameCache(tmp_path, max_bytes=10 ** 9)
+    for n, key in enumerate('abc'):
+        cache.store(key, entry)
+        os.utime(cache.path(key), (n, n))
+    cache.load('a')
+
+    cache.max_bytes = 2 * cache.path('a').stat().st_size
+    assert cache.evict() == 1
+    assert sorted(path.stem for path in tmp_path.glob('*.npz')) == ['a', 'c']
+
+
+def test_cached_analysis_renders_line_ranges(tmp_path):
+    """A stored analysis renders any line range identically to a fresh partial decode"""
+    sstv = Pigeon70Engine()
+    img = np.zeros((sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    img[..., 1] = np.linspace(0, 255, sstv.WIDTH)
+    audio = sstv.encode_frame(img)
+
+    cache = FrameCache(tmp_path)
+    key = cache.key(sstv, samples_digest(audio))
+    cache.store(key, sstv.analyze_samples(audio))
+    image, info = sstv.render_frame(cache.load(key), (100, 140))
+    partial, _ = sstv.decode_samples(audio, lines=(100, 140))
+    assert image.size == (sstv.WIDTH, 40) and info['lines'] == [100, 140]
+    assert np.array_equal(np.asarray(image), np.asarray(partial))
+
+
+def test_line_range_bounds():
+    """--lines takes START-END within the frame and rejects anything else as a usage error"""
+    assert line_range('100-140') == (100, 140)
+    assert line_range('0-240') == (0, 240)
+    for text in ('100', '140-100', '-5-10', '100-300'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            line_range(text)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the Pigeon70 SSTV channel simulator
+Run with: python -m pytest test_sstv_channel.py
+"""
+
+import numpy as np
+
+from sstv_channel import Channel, awgn, clock_skew, fading_gain, frequency_offset
+from sstv_dsp import peak_frequency
+
+SAMPLE_RATE = 44100
+
+
+def tone(frequency, seconds=0.5):
+    return np.sin(2 * np.pi * frequency * np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE)
+
+
+def test_awgn_hits_requested_snr():
+    """Added noise power matches the requested ratio, in full band or a passband"""
+    audio = tone(1500, 2.0)
+    noise = awgn(audio, 10, rng=1) - audio
+    assert abs(10 * np.log10(np.mean(audio ** 2) / np.mean(noise ** 2)) - 10) < 0.1
+
+    noise = awgn(audio, 10, rng=1, bandwidth=2400, sample_rate=SAMPLE_RATE) - audio
+    in_band = np.mean(noise ** 2) * 2400 / (SAMPLE_RATE / 2)
+    assert abs(10 * np.log10(np.mean(audio ** 2) / in_band) - 10) < 0.1
+
+
+def test_frequency_offset_shifts_tone():
+    """A mistuned channel moves the tone by the offset"""
+    shifted = frequency_offset(tone(1500), 25.0, SAMPLE_RATE)
+    assert abs(peak_frequency(shifted, SAMPLE_RATE, 1000, 2000) - 1525) < 1
+
+
+def test_clock_skew_stretches_signal():
+    """A fast receiver clock lengthens the signal and lowers its pitch"""
+    audio = tone(2000)
+    skewed = clock_skew(audio, 1000)
+    assert len(skewed) == int(len(audio) * 1.001)
+    assert abs(peak_frequency(skewed, SAMPLE_RATE, 1500, 2500) - 2000 / 1.001) < 0.5
+
+
+def test_fading_gain_has_unit_power():
+    """Fading redistributes power over time but keeps its mean"""
+    gain = fading_gain(60 * SAMPLE_RATE, SAMPLE_RATE, doppler_hz=2.0, rng=3)
+    assert len(gain) == 60 * SAMPLE_RATE
+    assert 0.7 < np.mean(np.abs(gain) ** 2) < 1.3
+    assert np.std(np.abs(gain)) > 0.1
+
+
+def test_channel_is_reproducible():
+    """The same seed gives the same realisation; another seed does not"""
+    channel = Channel(snr_db=10, offset_hz=5, skew_ppm=50, doppler_hz=1, band=(300, 2700))
+    audio = tone(1900).astype(np.float32)
+    first = channel.apply(audio, SAMPLE_RATE, seed=4)
+    assert first.dtype == np.float32
+    assert np.array_equal(first, channel.apply(audio, SAMPLE_RATE, seed=4))
+    assert not np.array_equal(first, channel.apply(audio, SAMPLE_RATE, seed=5))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared Pigeon70 SSTV DSP kernels
+Run with: python -m pytest test_sstv_dsp.py
+"""
+
+import numpy as np
+
+from sstv_dsp import (LeaderDetector, ToneBank, analytic_signal, fast_length, fit_line_clock,
+                      frequency_track, gather_windows, instantaneous_frequency, peak_frequency,
+                      pick_peaks, resample, sine_table, span_means, synthesize, synthesize_table,
+                      tone_correlation)
+
+SAMPLE_RATE = 44100
+
+
+def test_frequency_track_layout():
+    """Each tone is repeated for exactly its sample count"""
+    track = frequency_track([1900, 1200, 1500], [5, 3, 2])
+    assert len(track) == 10
+    assert np.all(track[:5] == 1900)
+    assert np.all(track[5:8] == 1200)
+    assert np.all(track[8:] == 1500)
+
+
+def test_synthesize_matches_single_tone():
+    """A constant track reproduces a plain sine started at t=0"""
+    n = 441
+    samples, _ = synthesize(np.full(n, 1200.0), SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    assert np.allclose(samples, np.sin(2 * np.pi * 1200 * t))
+
+
+def test_synthesize_is_phase_continuous():
+    """Tone changes and chained calls never jump the waveform"""
+    track = frequency_track([1500, 2300, 1900], [13, 12, 12])
+    whole, _ = synthesize(track, SAMPLE_RATE)
+
+    first, phase = synthesize(track[:20], SAMPLE_RATE)
+    second, _ = synthesize(track[20:], SAMPLE_RATE, phase)
+    assert np.allclose(whole, np.concatenate((first, second)))
+
+    # Single-precision output matches, block by block
+    narrow, _ = synthesize(np.tile(track, 5000), SAMPLE_RATE, dtype=np.float32)
+    assert narrow.dtype == np.float32
+    assert np.allclose(narrow, synthesize(np.tile(track, 5000), SAMPLE_RATE)[0], atol=1e-5)
+
+    # Sample-to-sample steps stay bounded by the highest tone
+    max_step = 2 * np.pi * 2300 / SAMPLE_RATE
+    assert np.max(np.abs(np.diff(whole))) <= max_step + 1e-9
+
+
+def test_table_synthesis_matches_float_synthesis():
+    """The phase-accumulator synthesizer tracks synthesize() to within the table resolution"""
+    frequencies = [1900, 1200, 1500, 2300, 1733.3]
+    counts = [441, 441, 13, 12, 5000]
+    reference, _ = synthesize(frequency_track(frequencies, counts), SAMPLE_RATE)
+    samples, _ = synthesize_table(frequencies, counts, sine_table(18), SAMPLE_RATE)
+    assert len(samples) == len(reference)
+    assert np.max(np.abs(samples - reference)) < 1e-4
+
+    table = sine_table(18, 0.8 * 32767, np.int16)
+    assert table.dtype == np.int16
+    whole, _ = synthesize_table(frequencies, counts, table, SAMPLE_RATE)
+    assert whole.dtype == np.int16
+
+    # Chaining through the returned accumulator gives exactly the same samples
+    head, phase = synthesize_table(frequencies[:3], counts[:3], table, SAMPLE_RATE)
+    tail, _ = synthesize_table(frequencies[3:], counts[3:], table, SAMPLE_RATE, phase)
+    assert np.array_equal(np.concatenate((head, tail)), whole)
+
+
+def test_tone_bank_resolves_short_windows():
+    """12-sample pixel windows are resolved to well under one pixel step"""
+    bank = ToneBank(np.arange(1400, 2401, 10.0), 12, SAMPLE_RATE)
+    rng = np.random.default_rng(0)
+    freqs = rng.uniform(1500, 2300, 500)
+    phases = rng.uniform(0, 2 * np.pi, 500)
+    n = np.arange(12)
+    windows = np.sin(2 * np.pi * freqs[:, None] * n / SAMPLE_RATE + phases[:, None])
+    assert np.max(np.abs(bank.estimate(windows) - freqs)) < 1.0
+
+
+def test_gather_windows_picks_arbitrary_starts():
+    """Windows can start anywhere, including overlapping positions"""
+    audio = np.arange(100.0)
+    windows = gather_windows(audio, [0, 13, 25, 88], 12)
+    assert windows.shape == (4, 12)
+    assert list(windows[:, 0]) == [0, 13, 25, 88]
+    assert windows[3, -1] == 99
+
+
+def test_fast_length_is_5_smooth():
+    """FFT lengths are padded to the next 2^a * 3^b * 5^c"""
+    assert fast_length(1) == 1
+    assert fast_length(7) == 8
+    assert fast_length(3135509) == 3145728
+
+
+def test_resample_keeps_tones_and_dtype():
+    """Rational resampling moves a tone to the new rate unchanged and matches scipy's polyphase design"""
+    from scipy.signal import resample_poly
+
+    t = np.arange(SAMPLE_RATE // 2) / SAMPLE_RATE
+    audio = np.sin(2 * np.pi * 1900 * t).astype(np.float32)
+    for rate in (48000, 11025, 8000):
+        up, down = rate // np.gcd(rate, SAMPLE_RATE), SAMPLE_RATE // np.gcd(rate, SAMPLE_RATE)
+        converted = resample(audio, up, down)
+        assert converted.dtype == np.float32 and len(converted) == -(-len(audio) * up // down)
+        assert abs(peak_frequency(converted, rate, 1800, 2000) - 1900) < 1
+        assert np.max(np.abs(converted - resample_poly(audio, up, down))) < 1e-3
+
+
+def test_fm_discriminator_tracks_steady_tones():
+    """Instantaneous frequency averaged per span recovers each tone"""
+    counts = [4410] * 3
+    track = frequency_track([1500, 1900, 2300], counts)
+    audio, _ = synthesize(track, SAMPLE_RATE)
+    inst = instantaneous_frequency(analytic_signal(audio, SAMPLE_RATE), SAMPLE_RATE)
+    starts = np.array([1000, 5410, 9820])
+    means = span_means(inst, starts, starts + 2000, fill=-1.0)
+    assert np.allclose(means, [1500, 1900, 2300], atol=1.0)
+
+    # Spans past the end of the buffer get the fill value
+    assert span_means(inst, [len(inst) - 10], [len(inst) + 10], fill=-1.0)[0] == -1.0
+
+
+def test_sync_matched_filter_finds_every_pulse():
+    """Phase-independent correlation peaks on each 1200 Hz pulse"""
+    line = [1200, 1500, 1900, 2300]
+    counts = [441, 441, 3000, 3000]
+    track = frequency_track(line * 5, counts * 5)
+    audio, _ = synthesize(track, SAMPLE_RATE, phase=1.0)
+    score = tone_correlation(audio, 1200, 441, SAMPLE_RATE)
+    indices, values = pick_peaks(score, 0.5, 3000)
+    expected = np.arange(5) * sum(counts)
+    assert len(indices) == 5
+    assert np.max(np.abs(indices - expected)) <= 2
+    assert np.all(values > 0.99)
+
+
+def test_peak_frequency_measures_tone_offset():
+    """A noisy 300 ms leader's frequency is measured to a small fraction of a hertz"""
+    n = np.arange(13230)
+    rng = np.random.default_rng(1)
+    for frequency in (1900.0, 1912.3, 1873.7):
+        tone = np.sin(2 * np.pi * frequency * n / SAMPLE_RATE + 1.0) + rng.normal(0, 0.1, len(n))
+        assert abs(peak_frequency(tone, SAMPLE_RATE, 1800, 2000) - frequency) < 0.1
+
+
+def test_leader_detector_locates_vis_in_chunks():
+    """The VIS leader start is found to well under a millisecond, chunk size independent"""
+    track = frequency_track([1500, 1900, 1200, 2000], [1234, 13230, 441, 5000])
+    audio, _ = synthesize(track, SAMPLE_RATE)
+
+    for chunk in (len(audio), 1000, 333):
+        detector = LeaderDetector(1900, 0.3, SAMPLE_RATE, 441)
+        detections = [detector.process(audio[i:i + chunk]) for i in range(0, len(audio), chunk)]
+        found = [d for d in detections if d is not None]
+        assert len(found) == 1
+        start, confidence = found[0]
+        assert abs(start - 1234) < 0.001 * SAMPLE_RATE
+        assert confidence > 0.9
+
+
+def test_line_clock_fit_recovers_skew():
+    """Pulses from a skewed clock are numbered and fitted, ignoring a missing pulse and an outlier"""
+    nominal = 13009.5
+    true_period = nominal * (1 + 0.004)
+    syncs = 13230.0 + np.arange(240) * true_period
+    syncs = np.delete(syncs, [5, 100])
+    syncs = np.sort(np.append(syncs, 13230.0 + 50.5 * true_period))
+    first, period, inliers = fit_line_clock(syncs, 13300.0, nominal, 240, 88.0)
+    assert abs(period - true_period) < 0.01
+    assert abs(first - 13230.0) < 1.0
+    assert inliers.sum() == 238
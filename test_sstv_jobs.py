@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the Pigeon70 SSTV background job manager
+Run with: python -m pytest test_sstv_jobs.py
+"""
+
+import threading
+
+import pytest
+
+from sstv_jobs import PRIORITY_BATCH, PRIORITY_LIVE, JobManager
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def blocker(manager):
+    """Occupy the only worker until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold(job):
+        started.set()
+        release.wait(5)
+
+    manager.submit('hold', hold)
+    started.wait(5)
+    return release
+
+
+def test_higher_priority_runs_first(manager):
+    """Queued live work overtakes batch work submitted before it"""
+    release = blocker(manager)
+    order = []
+    batch = manager.submit('batch', lambda job: order.append('batch'), PRIORITY_BATCH)
+    live = manager.submit('live', lambda job: order.append('live'), PRIORITY_LIVE)
+    release.set()
+    assert batch.wait(5) and live.wait(5)
+    assert order == ['live', 'batch']
+
+
+def test_duplicate_requests_coalesce(manager):
+    """A request matching an unfinished job's key returns that job"""
+    release = blocker(manager)
+    first = manager.submit('decode', lambda job: 1, key=('decode', 7))
+    second = manager.submit('decode', lambda job: 2, key=('decode', 7))
+    other = manager.submit('decode', lambda job: 3, key=('decode', 8))
+    release.set()
+    assert second is first and other is not first
+    assert first.wait(5) and other.wait(5)
+    assert (first.result, other.result) == (1, 3)
+
+
+def test_group_keeps_latest_and_cancels_queued_at_once(manager):
+    """A newer job in a group cancels the older one before it ever runs"""
+    release = blocker(manager)
+    old = manager.submit('decode', lambda job: 'old', group='decode')
+    new = manager.submit('decode', lambda job: 'new', group='decode')
+    assert old.status == 'cancelled' and old.wait(0)
+    release.set()
+    assert new.wait(5) and new.result == 'new'
+
+
+def test_running_job_stops_at_next_check():
+    """Cancelling a running job raises JobCancelled at its next token check"""
+    manager = JobManager(workers=1)
+    events = []
+    manager.subscribe(events.append)
+    started = threading.Event()
+
+    def lines(job):
+        for line in range(1000):
+            job.token.check()
+            job.report(line / 10, f"line {line}")
+            started.set()
+            job.token.wait(0.01)
+        return 'finished'
+
+    job = manager.submit('lines', lines)
+    started.wait(5)
+    job.cancel()
+    assert job.wait(5)
+    manager.shutdown()
+    assert job.status == 'cancelled' and job.result is None
+    statuses = [e['status'] for e in events if e['id'] == job.id]
+    assert statuses[0] == 'queued' and 'running' in statuses and statuses[-1] == 'cancelled'
+
+
+def test_failures_are_reported(manager):
+    """An exception fails the job with its message instead of killing the worker"""
+    def fail(job):
+        raise ValueError("no sync")
+
+    failed = manager.submit('fail', fail)
+    assert failed.wait(5)
+    assert failed.status == 'failed' and failed.error == 'ValueError: no sync'
+    assert failed.snapshot()['error'] == 'ValueError: no sync'
+    assert manager.submit('after', lambda job: 'ok').wait(5)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the Pigeon70 SSTV compiled decoder kernels
+Run with: python -m pytest test_sstv_kernels.py
+
+The loop kernels are checked against the numpy versions in sstv_dsp as plain
+Python, so parity holds whether or not numba is installed; the compiled
+versions are checked too when it is.
+"""
+
+import argparse
+
+import numpy as np
+import pytest
+
+import sstv_dsp
+import sstv_kernels
+from sstv_engine import Pigeon70Engine
+
+SAMPLE_RATE = 44100
+
+needs_numba = pytest.mark.skipif(not sstv_kernels.available(), reason='numba is not installed')
+
+
+def sync_like_audio(n=6000, seed=0):
+    """Bursts of the sync tone in noise, with a stretch of digital silence"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    audio = np.sin(2 * np.pi * 1200 * t / SAMPLE_RATE) * (t % 1500 < 600) + rng.normal(0, 0.2, n)
+    audio[3000:3600] = 0
+    return audio.astype(np.float32)
+
+
+def test_sliding_tone_score_matches_fft_correlation():
+    """The sliding DFT scores every window as the FFT correlation does, across refreshes"""
+    audio = sync_like_audio()
+    # float64, so the reference is not limited by a single-precision FFT
+    reference = sstv_dsp.tone_correlation(audio.astype(np.float64), 1200, 441, SAMPLE_RATE)
+    score = np.empty(len(reference))
+    sstv_kernels.sliding_tone_score(audio, 2 * np.pi * 1200 / SAMPLE_RATE, 441, 1000, score)
+    assert np.allclose(score, reference, atol=1e-9)
+    assert np.all(score[3000:3600 - 441] == 0)
+
+
+def test_peak_runs_matches_pick_peaks():
+    """Peaks, merging and ties come out as sstv_dsp.pick_peaks picks them"""
+    rng = np.random.default_rng(1)
+    score = np.repeat(rng.random(400), rng.integers(1, 6, 400))
+    score[50:53] = 0.9
+    indices = np.empty(len(score) + 1, dtype=np.int64)
+    for threshold, min_distance in ((0.5, 1), (0.7, 10), (0.95, 40), (2.0, 5)):
+        count = sstv_kernels.peak_runs(score, threshold, min_distance, indices)
+        expected, _ = sstv_dsp.pick_peaks(score, threshold, min_distance)
+        assert list(indices[:count]) == list(expected)
+
+
+def test_span_sums_matches_span_means():
+    """Span means agree, including empty spans and spans outside the buffer"""
+    values = np.random.default_rng(2).normal(1900, 300, 500).astype(np.float32)
+    starts = np.array([0, 10, 37, 499, -1, 400, 20])
+    ends = np.array([5, 11, 120, 500, 4, 501, 20])
+    means = np.empty(len(starts))
+    sstv_kernels.span_sums(values, starts, ends, 1500.0, means)
+    assert np.allclose(means, sstv_dsp.span_means(values, starts, ends, fill=1500.0))
+
+
+def test_kernel_modes():
+    """auto falls back to numpy without numba; unknown modes and a missing numba are errors"""
+    assert sstv_kernels.kernel_set('numpy').tone_correlation is sstv_dsp.tone_correlation
+    expected = 'numba' if sstv_kernels.available() else 'numpy'
+    assert Pigeon70Engine().kernels.mode == expected
+    assert Pigeon70Engine(kernels='numpy').at_rate(48000).kernels.mode == 'numpy'
+    with pytest.raises(ValueError):
+        sstv_kernels.kernel_set('cuda')
+    if not sstv_kernels.available():
+        with pytest.raises(ValueError):
+            Pigeon70Engine(kernels='numba')
+
+
+@needs_numba
+def test_compiled_kernels_match_numpy():
+    """The compiled kernels agree with numpy on a whole frame, from every dtype"""
+    sstv = Pigeon70Engine()
+    img = np.random.default_rng(3).integers(0, 256, (sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    audio = sstv.encode_frame(img)
+    for dtype in (np.float32, np.float64):
+        samples = audio.astype(dtype)
+        reference = sstv_dsp.tone_correlation(samples, 1200, 441, SAMPLE_RATE)
+        score = sstv_kernels.tone_correlation(samples, 1200, 441, SAMPLE_RATE)
+        assert np.allclose(score, reference, atol=1e-5 if dtype == np.float32 else 1e-9)
+
+        for a, b in zip(sstv_kernels.pick_peaks(reference, 0.5, 1000), sstv_dsp.pick_peaks(reference, 0.5, 1000)):
+            assert np.array_equal(a, b)
+
+        starts, ends = sstv.tone_spans(np.arange(sstv.HEIGHT) * sstv.line_period() + 13250.0)
+        starts, ends = np.rint(starts), np.rint(ends)
+        assert np.allclose(sstv_kernels.span_means(samples, starts, ends, fill=-1.0),
+                           sstv_dsp.span_means(samples, starts, ends, fill=-1.0))
+
+
+@needs_numba
+def test_compiled_decode_matches_numpy_decode():
+    """Both demodulators decode as accurately with either kernel set
+
+    Sync peaks a fraction of a sample from the middle of two windows score
+    the same to within float32 rounding, so the two sets may pick neighbouring
+    samples; the line clock fit makes that a sub-sample difference.
+    """
+    sstv = Pigeon70Engine()
+    img = np.random.default_rng(4).integers(0, 256, (sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    audio = sstv.encode_frame(img).astype(np.float32)
+    for demod in ('bank', 'fm'):
+        errors = []
+        for kernels in ('numpy', 'numba'):
+            decoded = Pigeon70Engine(demod=demod, kernels=kernels).decode_samples(audio)[0]
+            errors.append(np.abs(np.asarray(decoded).astype(int) - img.astype(int)).mean())
+        assert abs(errors[0] - errors[1]) < 0.5
+
+
+def test_cli_keeps_single_decodes_on_numpy():
+    """Loading numba costs about what it saves on one frame, so only longer runs default to it"""
+    from real_sstv import default_kernels
+    assert default_kernels(argparse.Namespace(mode='decode', stream=False)) == 'numpy'
+    for mode, stream in (('decode', True), ('decode-batch', False), ('scan', False), ('receive', False)):
+        assert default_kernels(argparse.Namespace(mode=mode, stream=stream)) == 'auto'
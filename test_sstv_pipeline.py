@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the Pigeon70 SSTV block processing pipeline
+Run with: python -m pytest test_sstv_pipeline.py
+"""
+
+import itertools
+
+import numpy as np
+
+from sstv_channel import frequency_offset
+from sstv_engine import Pigeon70Engine
+from sstv_pipeline import AGC, BandPass, FMDiscriminator, Pipeline, RunTracker, Stage, decoding_pipeline
+from sstv_stats import Stats
+
+SAMPLE_RATE = 44100
+
+
+def feed_blocks(pipeline, audio, sizes):
+    """Feed audio through pipeline in blocks cycling through `sizes`, then finish"""
+    events = []
+    start = 0
+    for size in itertools.cycle(sizes):
+        if start >= len(audio):
+            break
+        events.extend(pipeline.feed(audio[start:start + size]))
+        start += size
+    return events + pipeline.finish()
+
+
+def test_stage_state_carries_across_blocks():
+    """Filtering, gain and discriminator output do not depend on how the stream is cut up"""
+    rng = np.random.default_rng(0)
+    audio = (np.sin(2 * np.pi * 1900 * np.arange(20000) / SAMPLE_RATE)
+             + rng.normal(0, 0.3, 20000)).astype(np.float32)
+
+    class Capture(Stage):
+        name = 'capture'
+
+        def __init__(self):
+            self.blocks = []
+
+        def process(self, block, position, events):
+            self.blocks.append(block.copy())
+            return block
+
+    outputs = []
+    for sizes in ([len(audio)], [1, 7, 300, 4096]):
+        capture = Capture()
+        pipeline = Pipeline([BandPass(SAMPLE_RATE, 500, 3500), AGC(SAMPLE_RATE),
+                             FMDiscriminator(SAMPLE_RATE), capture])
+        feed_blocks(pipeline, audio, sizes)
+        outputs.append(np.concatenate(capture.blocks))
+    assert np.allclose(outputs[0], outputs[1], atol=0.5)
+    assert abs(np.median(outputs[0][1000:]) - 1900) < 10
+
+
+def test_run_tracker_spans_blocks():
+    """Runs crossing block boundaries are joined, and runs outside the length limits dropped"""
+    mask = np.zeros(100, dtype=bool)
+    mask[10:20] = mask[30:33] = mask[45:75] = True
+    tracker = RunTracker(5, 20)
+    starts, ends = [], []
+    for position in range(0, 100, 16):
+        run_starts, run_ends = tracker.update(mask[position:position + 16], position)
+        starts.extend(run_starts)
+        ends.extend(run_ends)
+    assert (starts, ends) == ([10], [20])
+
+
+def test_pipeline_decodes_frame_with_stage_timings():
+    """A frame fed in small blocks decodes line by line, with every stage timed"""
+    stats = Stats()
+    sstv = Pigeon70Engine(stats=stats)
+    img = np.zeros((sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    img[..., 0] = np.linspace(0, 255, sstv.WIDTH)
+    img[..., 1] = np.linspace(0, 255, sstv.HEIGHT)[:, None]
+    img[..., 2] = 128
+    audio = np.concatenate((np.zeros(5000, np.float32), sstv.encode_frame(img)))
+
+    events = feed_blocks(decoding_pipeline(sstv), audio, [2048, 333])
+    types = [event['type'] for event in events]
+    assert types.count('vis') == 1 and types.count('line') == sstv.HEIGHT and types.count('frame') == 1
+    assert all(event['sync_found'] for event in events if event['type'] == 'line')
+
+    frame = next(event for event in events if event['type'] == 'frame')
+    assert frame['lines'] == sstv.HEIGHT
+    # Pixel tones smear into their neighbours a little, as with --demod fm
+    error = np.abs(np.asarray(frame['image']).astype(int) - img.astype(int))
+    assert error.mean() < 8
+    assert {'agc', 'fm_demod', 'sync_detect', 'slicer'} <= set(stats.summary()['timers'])
+
+
+def test_pipeline_corrects_frequency_offset():
+    """A mistuned frame decodes as well as an exact one: the leader's offset moves the sync threshold and pixels"""
+    sstv = Pigeon70Engine()
+    img = np.zeros((sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    img[..., 0] = np.linspace(0, 255, sstv.WIDTH)
+    img[..., 1] = np.linspace(0, 255, sstv.HEIGHT)[:, None]
+    audio = np.concatenate((np.zeros(5000), sstv.encode_frame(img), np.zeros(5000)))
+
+    errors = []
+    for offset in (0.0, 25.0):
+        events = feed_blocks(decoding_pipeline(sstv),
+                             frequency_offset(audio, offset, sstv.SAMPLE_RATE).astype(np.float32), [4096])
+        vis = next(event for event in events if event['type'] == 'vis')
+        assert abs(vis['frequency_offset'] - offset) < 2
+        frame = next(event for event in events if event['type'] == 'frame')
+        errors.append(np.abs(np.asarray(frame['image']).astype(int) - img.astype(int)).mean())
+    assert errors[1] < errors[0] + 2
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for Pigeon70 SSTV instrumentation
+Run with: python -m pytest test_sstv_stats.py
+"""
+
+import json
+
+from sstv_stats import NULL_STATS, Stats
+
+
+def test_timers_accumulate_and_publish_events():
+    """Each timed block adds a run and is published as a stage event"""
+    stats = Stats()
+    events = []
+    stats.subscribe(events.append)
+    for _ in range(3):
+        with stats.timer('demod'):
+            sum(range(1000))
+    timer = stats.summary()['timers']['demod']
+    assert timer['count'] == 3
+    assert timer['wall_s'] >= 0 and timer['cpu_s'] >= 0
+    assert [e['stage'] for e in events] == ['demod'] * 3
+    assert events[0]['type'] == 'stage'
+
+
+def test_counters_and_histograms_summarize_to_json():
+    """Counters add up and histograms report order statistics"""
+    stats = Stats()
+    stats.count('sync_misses')
+    stats.count('sync_misses', 4)
+    stats.observe('sync_jitter_samples', [-2.0, 0.0, 2.0])
+    stats.observe('sync_jitter_samples', 4.0)
+    summary = json.loads(json.dumps(stats.summary()))
+    assert summary['counters'] == {'sync_misses': 5}
+    jitter = summary['histograms']['sync_jitter_samples']
+    assert jitter['count'] == 4
+    assert jitter['min'] == -2.0 and jitter['max'] == 4.0
+    assert sum(jitter['counts']) == 4
+    assert 'sync_misses' in stats.format()
+
+
+def test_null_stats_records_nothing():
+    """The disabled collector accepts every call and keeps nothing"""
+    with NULL_STATS.timer('demod'):
+        NULL_STATS.count('frames')
+        NULL_STATS.observe('sync_jitter_samples', 1.0)
+    assert not NULL_STATS.enabled
+    assert NULL_STATS.summary() == {'timers': {}, 'counters': {}, 'histograms': {}}
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for Pigeon70 SSTV streaming reception
+Run with: python -m pytest test_sstv_stream.py
+"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+from PIL import Image
+
+from real_sstv import Pigeon70SSTV
+from sstv_dsp import frequency_track, synthesize
+from sstv_stream import STREAM_AMPLITUDE, RingBuffer, StreamingDecoder, encode_blocks, file_stream, write_blocks
+
+
+def gradient(sstv):
+    """Test card with smooth ramps in every channel"""
+    img = np.zeros((sstv.HEIGHT, sstv.WIDTH, 3), dtype=np.uint8)
+    img[..., 0] = np.linspace(0, 255, sstv.WIDTH)
+    img[..., 1] = np.linspace(0, 255, sstv.HEIGHT)[:, None]
+    img[..., 2] = 128
+    return img
+
+
+def test_ring_buffer_wraps_and_keeps_latest():
+    """Reads use absolute positions across the wrap point"""
+    ring = RingBuffer(10)
+    ring.write(np.arange(7))
+    ring.write(np.arange(7, 15))
+    assert ring.total == 15
+    assert ring.oldest == 5
+    assert list(ring.read(5, 15)) == list(range(5, 15))
+    assert list(ring.read(8, 12)) == [8, 9, 10, 11]
+
+
+def test_ring_buffer_refuses_missing_samples():
+    """Samples already overwritten or not yet written are not returned"""
+    ring = RingBuffer(10)
+    ring.write(np.arange(25))
+    assert ring.read(10, 20) is None
+    assert ring.read(20, 26) is None
+    assert list(ring.read(15, 25)) == list(range(15, 25))
+    assert ring.wait(25, timeout=0)
+    assert not ring.wait(26, timeout=0)
+
+
+def img_path(tmp_path, img):
+    """Save a test card for the path-based encoders"""
+    path = tmp_path / 'card.png'
+    Image.fromarray(img).save(path)
+    return path
+
+
+def encode(sstv, img):
+    """Frame audio as encode_image builds it, without writing a file"""
+    frequencies, counts = sstv.frame_tones(img)
+    tones, _ = synthesize(frequency_track(frequencies, counts), sstv.SAMPLE_RATE)
+    return STREAM_AMPLITUDE * tones
+
+
+def feed_blocks(decoder, audio, blocksize=4096):
+    """Feed audio to decoder block by block; returns all events"""
+    events = []
+    for start in range(0, len(audio), blocksize):
+        events.extend(decoder.feed(audio[start:start + blocksize]))
+    return events
+
+
+def test_streaming_decoder_frame_cycle():
+    """VIS, then every line in order, then the frame, and back to idle for the next one"""
+    sstv = Pigeon70SSTV()
+    img = gradient(sstv)
+    frame = encode(sstv, img)
+    gap = np.zeros(sstv.SAMPLE_RATE // 2)
+    decoder = StreamingDecoder(sstv)
+
+    events = feed_blocks(decoder, np.concatenate((gap, frame, gap, frame, gap)))
+    assert decoder.state == decoder.IDLE
+    assert [event['type'] for event in events if event['type'] != 'line'] == ['vis', 'frame', 'vis', 'frame']
+    lines = [event['line'] for event in events if event['type'] == 'line']
+    assert lines == list(range(sstv.HEIGHT)) * 2
+
+    frames = [event for event in events if event['type'] == 'frame']
+    assert frames[1]['start'] - frames[0]['start'] == pytest.approx(len(gap) + len(frame), abs=50)
+    for event in frames:
+        error = np.abs(np.asarray(event['image']).astype(int) - img.astype(int))
+        assert error.mean() < 2.0
+
+
+def test_streaming_decoder_gives_up_on_truncated_frame():
+    """A frame cut off mid-way is reported lost once its sync pulses stop, and decoding goes idle"""
+    sstv = Pigeon70SSTV()
+    frame = encode(sstv, gradient(sstv))
+    cut = int(sstv.DURATION_VIS * sstv.SAMPLE_RATE + 100 * sstv.line_period())
+    decoder = StreamingDecoder(sstv, max_missed_syncs=5)
+
+    events = feed_blocks(decoder, np.concatenate((frame[:cut], np.zeros(3 * sstv.SAMPLE_RATE))))
+    types = [event['type'] for event in events]
+    assert 'frame' not in types and types.count('lost') == 1
+    lost = events[types.index('lost')]
+    assert lost['line'] == 100 + 5
+    assert decoder.state == decoder.IDLE
+
+
+def test_encode_blocks_match_whole_frame(tmp_path):
+    """Blocks synthesized line by line join up into the whole-frame encoding, and are written as is"""
+    sstv = Pigeon70SSTV()
+    img = gradient(sstv)
+    expected = encode(sstv, img)
+
+    blocks = list(encode_blocks(sstv, img, blocksize=5000))
+    assert all(len(block) == 5000 for block in blocks[:-1]) and 0 < len(blocks[-1]) <= 5000
+    joined = np.concatenate(blocks)
+    assert len(joined) == len(expected)
+    # Phase summed line by line rounds a little differently from one sum over
+    # the frame; the difference stays below one 16-bit step
+    assert np.abs(joined - expected).max() < 1 / 32768
+
+    path = tmp_path / 'frame.wav'
+    assert write_blocks(path, iter(blocks), sstv.SAMPLE_RATE, subtype='FLOAT') == len(joined)
+    written, rate = sf.read(path, dtype='float32')
+    assert rate == sstv.SAMPLE_RATE
+    assert np.array_equal(written, joined)
+
+
+def test_encode_blocks_in_int16(tmp_path):
+    """An int16 engine streams exactly its whole-frame 16-bit samples, written to PCM_16 as is"""
+    sstv = Pigeon70SSTV(dtype='int16')
+    img = gradient(sstv)
+    expected = sstv.synthesize_frame(img)
+
+    blocks = list(encode_blocks(sstv, img, blocksize=5000))
+    assert all(block.dtype == np.int16 for block in blocks)
+    assert np.array_equal(np.concatenate(blocks), expected)
+
+    path = tmp_path / 'frame.wav'
+    sstv.encode_to_file(img_path(tmp_path, img), path)
+    written, _ = sf.read(path, dtype='int16')
+    assert sf.info(path).subtype == 'PCM_16'
+    assert np.array_equal(written, expected)
+
+
+def test_file_stream_decodes_every_frame_and_flushes_the_last(tmp_path):
+    """A recording is decoded block by block; a frame cut off by the end of file comes out of finish()"""
+    sstv = Pigeon70SSTV()
+    img = gradient(sstv)
+    frame = encode(sstv, img)
+    cut = int(sstv.DURATION_VIS * sstv.SAMPLE_RATE + 150.5 * sstv.line_period())
+    path = tmp_path / 'recording.wav'
+    sf.write(path, np.concatenate((frame, np.zeros(sstv.SAMPLE_RATE // 2), frame[:cut])), sstv.SAMPLE_RATE,
+             subtype='FLOAT')
+
+    events = list(file_stream(sstv, path, blocksize=10000))
+    assert [event['type'] for event in events if event['type'] != 'line'] == ['vis', 'frame', 'vis', 'frame']
+    complete, partial = [event for event in events if event['type'] == 'frame']
+    error = np.abs(np.asarray(complete['image']).astype(int) - img.astype(int))
+    assert error.mean() < 2.0
+
+    # The half-received line is decoded as far as it goes, the rest is black
+    assert partial['lines'] == 151
+    decoded = np.asarray(partial['image']).astype(int)
+    assert np.abs(decoded[:150] - img[:150].astype(int)).mean() < 2.0
+    third = sstv.WIDTH // 3
+    assert np.abs(decoded[150, :third] - img[150, :third].astype(int)).mean() < 2.0
+    assert not decoded[150, -third:].any()
+    assert not decoded[151:].any()
+
+
+def test_file_stream_decodes_last_line_at_end_of_file(tmp_path):
+    """A frame that ends exactly at the end of the file, as encode writes it, is complete"""
+    sstv = Pigeon70SSTV()
+    img = gradient(sstv)
+    frame = encode(sstv, img)
+    path = tmp_path / 'recording.wav'
+    sf.write(path, np.concatenate((frame, frame, frame)), sstv.SAMPLE_RATE, subtype='FLOAT')
+
+    events = list(file_stream(sstv, path, blocksize=10000))
+    frames = [event for event in events if event['type'] == 'frame']
+    assert [event['lines'] for event in frames] == [sstv.HEIGHT] * 3
+    for event in frames:
+        error = np.abs(np.asarray(event['image']).astype(int) - img.astype(int))
+        assert error.mean() < 2.0 and error[-1].mean() < 2.0